@@ -0,0 +1,557 @@
+# Benchmarks for the timesheet pipeline, run with: python benchmarks.py [name ...]
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import main
+
+RESULTS_FILE = 'benchmark_results.jsonl'
+REGRESSION_THRESHOLD = 0.2  # Slowdown against the previous recorded run that counts as a regression
+MONTH_SCALES = [1, 12, 120]  # One month to ten years of history
+USER_SCALES = [1, 100, 1000]
+
+def generate_mygrid_html(days=365, seed=0, end=None):
+    # Synthetic SDMataClick 'mygrid' table: weekends and the odd absence are empty rows
+    rng = random.Random(seed)
+    end = end or date.today()
+    rows = ['<table id="mygrid"><tr><th>Date</th><th>First In</th><th>Last Out</th>'
+            '<th>In</th><th>Out</th><th>Total</th></tr>']
+    for offset in range(days):
+        day = end - timedelta(days=offset)
+        if day.weekday() >= 5 or rng.random() < 0.05:
+            rows.append(f'<tr><td>{day:%m/%d/%Y}</td><td>     </td><td>     </td>'
+                        '<td>00:00</td><td>00:00</td><td></td></tr>')
+            continue
+        arrive = 7 * 60 + rng.randint(0, 120)
+        leave = arrive + rng.randint(7 * 60, 10 * 60)
+        first_in = f'{arrive // 60:02d}:{arrive % 60:02d}'
+        last_out = f'{leave // 60:02d}:{leave % 60:02d}'
+        rows.append(f'<tr><td>{day:%m/%d/%Y}</td><td>{first_in}</td><td>{last_out}</td>'
+                    f'<td>{first_in}</td><td>{last_out}</td><td>{(leave - arrive) / 60:.2f}</td></tr>')
+    rows.append('</table>')
+    return ''.join(rows)
+
+CLOCKIFY_PROJECTS = 12
+CLOCKIFY_TASKS_PER_PROJECT = 6
+CLOCKIFY_DESCRIPTIONS = ['Code review', 'Standup', 'Planning', 'Support ticket', 'Deployment',
+                         'Design discussion', 'Bug fix', 'Documentation', 'Customer call', '']
+
+def format_duration(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return 'PT' + (f'{hours}H' if hours else '') + (f'{minutes}M' if minutes else '') + (f'{seconds}S' if seconds else '')
+
+def generate_clockify_entries(days=365, seed=0, end=None):
+    # Clockify time-entry JSON as the API returns it: a few entries per workday, most with a
+    # project and some with a task, durations in ISO 8601 and a running entry on the last day
+    rng = random.Random(seed)
+    end = end or date.today()
+    entries = []
+    for offset in range(days - 1, -1, -1):
+        day = end - timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        start = datetime(day.year, day.month, day.day, 8) + timedelta(minutes=rng.randint(0, 90))
+        for _ in range(rng.randint(2, 8)):
+            seconds = rng.randint(5 * 60, 3 * 3600)
+            project = rng.randrange(CLOCKIFY_PROJECTS) if rng.random() < 0.9 else None
+            task = rng.randrange(CLOCKIFY_TASKS_PER_PROJECT) if project is not None and rng.random() < 0.6 else None
+            finish = start + timedelta(seconds=seconds)
+            entries.append({
+                'id': f'{day:%Y%m%d}{len(entries):08d}',
+                'description': rng.choice(CLOCKIFY_DESCRIPTIONS),
+                'projectId': f'p{project}' if project is not None else None,
+                'taskId': f'p{project}t{task}' if task is not None else None,
+                'timeInterval': {
+                    'start': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'end': finish.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'duration': format_duration(seconds)
+                }
+            })
+            start = finish + timedelta(minutes=rng.randint(0, 30))
+    if entries:
+        entries[-1]['timeInterval'].update(end=None, duration=None)
+    return entries
+
+def generate_team_timesheets(users=100, days=365, seed=0, end=None):
+    # Long-format timesheet rows (the load_team_timesheets columns) for many users at once,
+    # built with numpy rather than through HTML
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or date.today())
+    dates = pd.date_range(end=end, periods=days, freq='D')
+    id_numbers = np.repeat([f'{100000 + user}' for user in range(users)], days)
+    arrive = rng.integers(7 * 60, 9 * 60, size=users * days)
+    worked = rng.integers(7 * 60, 10 * 60, size=users * days)
+    absent = (np.tile(dates.dayofweek.to_numpy() >= 5, users)) | (rng.random(users * days) < 0.05)
+    first_in = pd.Series(arrive).map(lambda m: f'{m // 60:02d}:{m % 60:02d}')
+    last_out = pd.Series(arrive + worked).map(lambda m: f'{m // 60:02d}:{m % 60:02d}')
+    return pd.DataFrame({
+        'IdNumber': id_numbers,
+        'Date': np.tile(dates.to_numpy(), users),
+        'FirstIn': first_in.where(~absent, '     '),
+        'LastOut': last_out.where(~absent, '     '),
+        'ClockIn': first_in.where(~absent, '00:00'),
+        'ClockOut': last_out.where(~absent, '00:00'),
+        'Hours': np.where(absent, 0, np.round(worked / 60, 2))
+    })
+
+def generate_team_intervals(users=100, days=365, seed=0, entries_per_day=5):
+    # Badge punches (a morning and an afternoon punch per workday) and back-to-back Clockify entries
+    # that start around arrival, as load_team_intervals returns them
+    rng = np.random.default_rng(seed)
+    day_numbers = np.arange(days) + (date.today().toordinal() - main.EPOCH_ORDINAL - days)
+    workdays = day_numbers[(day_numbers + 3) % 7 < 5]  # 1970-01-01 was a Thursday
+    id_numbers = np.repeat([f'{100000 + user}' for user in range(users)], len(workdays))
+    midnight = np.tile(workdays, users).astype(np.int64) * 86400
+    arrive = midnight + rng.integers(7 * 3600, 9 * 3600, size=len(midnight)) // 60 * 60
+    lunch = arrive + rng.integers(3 * 3600, 5 * 3600, size=len(midnight)) // 60 * 60
+    leave = lunch + rng.integers(4 * 3600, 5 * 3600, size=len(midnight)) // 60 * 60
+    punches = pd.DataFrame({
+        'IdNumber': np.concatenate([id_numbers, id_numbers]),
+        'Start': np.concatenate([arrive, lunch + 30 * 60]),
+        'End': np.concatenate([lunch, leave])
+    })
+    durations = rng.integers(5 * 60, 3 * 3600, size=(len(midnight), entries_per_day))
+    starts = (arrive + rng.integers(-30 * 60, 30 * 60, size=len(midnight)))[:, None] + np.cumsum(durations, axis=1) - durations
+    entries = pd.DataFrame({
+        'IdNumber': np.repeat(id_numbers, entries_per_day),
+        'Start': starts.ravel(),
+        'End': (starts + durations).ravel(),
+        'ClockifyHours': durations.ravel() / 3600
+    })
+    return punches, entries
+
+def get_pairwise_overlap(punches, entries):
+    # Reference for reconcile_intervals: every entry against every punch of the same user, which is
+    # exact while a user's punches do not overlap each other
+    overlap = []
+    by_user = {id_number: list(zip(group['Start'], group['End'])) for id_number, group in punches.groupby('IdNumber')}
+    for id_number, start, end in zip(entries['IdNumber'], entries['Start'], entries['End']):
+        overlap.append(sum(max(0, min(end, punch_end) - max(start, punch_start))
+                           for punch_start, punch_end in by_user.get(id_number, ())))
+    return np.array(overlap) / 3600
+
+def bench_intervals(user_scales=(10, 100, 1000), days=365):
+    # reconcile_intervals over a year of punches and Clockify entries for a growing team; the time
+    # per entry should stay flat. The smallest scale is checked against comparing every pair.
+    print(f"{'users':>6} {'punches':>9} {'entries':>9} {'seconds':>9} {'us/entry':>9} {'pairwise':>9}")
+    for users in user_scales:
+        punches, entries = generate_team_intervals(users, days)
+        results = main.reconcile_intervals(punches, entries)
+        pairwise = ''
+        if users == user_scales[0]:
+            started = time.perf_counter()
+            expected = get_pairwise_overlap(punches, entries)
+            pairwise = f"{time.perf_counter() - started:.2f}"
+            np.testing.assert_allclose(results['entries']['OverlapHours'].to_numpy(), expected)
+        seconds = best_time(lambda: main.reconcile_intervals(punches, entries), repeat=3)
+        print(f"{users:>6} {len(punches):>9} {len(entries):>9} {seconds:>9.3f} {seconds / len(entries) * 1e6:>9.2f} {pairwise:>9}")
+
+class StubClockifyHandler(BaseHTTPRequestHandler):
+    # The endpoints ClockifyClient uses: /user, paginated and date-filtered time entries, and
+    # paginated project and task listings
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        page = int(query.get('page', ['1'])[0])
+        page_size = int(query.get('page-size', ['50'])[0])
+        entries = self.server.entries
+        
+        if url.path.endswith('/user'):
+            body = {'id': 'stub-user'}
+        elif url.path.endswith('/time-entries'):
+            start = query.get('start', [''])[0][:19]
+            finish = query.get('end', ['9999'])[0][:19]
+            items = [entry for entry in entries if start <= entry['timeInterval']['start'][:19] <= finish]
+            body = items[(page - 1) * page_size:page * page_size]
+        elif url.path.endswith('/tasks'):
+            project = url.path.split('/')[-2]
+            items = [{'id': f'{project}t{task}', 'name': f'Task {task}'} for task in range(CLOCKIFY_TASKS_PER_PROJECT)]
+            body = items[(page - 1) * page_size:page * page_size]
+        elif url.path.endswith('/projects'):
+            items = [{'id': f'p{project}', 'name': f'Project {project}'} for project in range(CLOCKIFY_PROJECTS)]
+            body = items[(page - 1) * page_size:page * page_size]
+        else:
+            self.send_error(404)
+            return
+        
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class StubClockifyServer:
+    # Local Clockify API serving generated entries on a free port, for ClockifyClient(base_url=...)
+    def __init__(self, entries):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubClockifyHandler)
+        self.server.entries = entries
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/api/v1'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+def best_time(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def measure(func, repeat=3):
+    # Best wall time over a few plain runs, then one run under tracemalloc for the peak of
+    # memory allocated while it ran (tracing slows things down, so it is kept out of the timing)
+    seconds = best_time(func, repeat)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+def load_previous_results(results_file=RESULTS_FILE):
+    # Latest recorded result for each (benchmark, stage, scale)
+    previous = {}
+    if os.path.exists(results_file):
+        with open(results_file, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                previous[(record['benchmark'], record['stage'], record['scale'])] = record
+    return previous
+
+class ResultTracker:
+    # Prints each stage result next to the last recorded one, appends it to the results file
+    # and keeps the regressions (slower than the threshold allows) for the exit code
+    def __init__(self, results_file=RESULTS_FILE, threshold=REGRESSION_THRESHOLD):
+        self.results_file = results_file
+        self.threshold = threshold
+        self.previous = load_previous_results(results_file)
+        self.commit = get_git_commit()
+        self.regressions = []
+        print(f"{'benchmark':>9} {'stage':>15} {'scale':>18} {'seconds':>9} {'peak MB':>8} {'vs last':>8}")
+
+    def record(self, benchmark, stage, scale, seconds, peak):
+        last = self.previous.get((benchmark, stage, scale))
+        change = ''
+        if last:
+            ratio = seconds / last['seconds'] - 1 if last['seconds'] else 0
+            change = f'{ratio:+.0%}'
+            if ratio > self.threshold:
+                self.regressions.append(f"{benchmark}/{stage} at {scale}: {last['seconds']:.4f}s -> {seconds:.4f}s")
+        print(f"{benchmark:>9} {stage:>15} {scale:>18} {seconds:>9.4f} {peak / 2 ** 20:>8.1f} {change:>8}")
+        record = {
+            'benchmark': benchmark, 'stage': stage, 'scale': scale, 'seconds': round(seconds, 6),
+            'peak_bytes': peak, 'commit': self.commit, 'python': sys.version.split()[0],
+            'recorded_at': datetime.now().isoformat(timespec='seconds')
+        }
+        with open(self.results_file, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+def bench_pipeline(tracker, month_scales=MONTH_SCALES):
+    # One user's pipeline stage by stage, from the saved page to the written report
+    for months in month_scales:
+        days = months * 365 // 12
+        scale = f'{months} months'
+        html_content = generate_mygrid_html(days)
+        clockify_days = main.group_clockify_entries([
+            {'EntryId': entry['id'], 'Date': datetime.fromisoformat(entry['timeInterval']['start'][:-1]).date(),
+             'ClockifyHours': 1.0, 'ClockifyDescription': entry['description'], 'Project': entry['projectId'],
+             'Task': entry['taskId']}
+            for entry in generate_clockify_entries(days)
+        ])
+        
+        tracker.record('pipeline', 'parse', scale, *measure(lambda: main.parse_timesheet(html_content)))
+        df = main.parse_timesheet(html_content)
+        tracker.record('pipeline', 'analyze', scale, *measure(lambda: main.analyze_timesheet(df, 9, clockify_days)))
+        results = main.analyze_timesheet(df, 9, clockify_days, formatted=False)
+        tracker.record('pipeline', 'render', scale, *measure(lambda: main.generate_html_report(results, 'Benchmark')))
+        with tempfile.TemporaryDirectory() as directory:
+            store = main.open_store(os.path.join(directory, 'store.db'))
+            try:
+                def store_and_load():
+                    main.store_timesheet(store, 'bench', df)
+                    return main.load_timesheet(store, 'bench')
+                tracker.record('pipeline', 'store', scale, *measure(store_and_load))
+            finally:
+                store.close()
+
+def bench_clockify(tracker, month_scales=MONTH_SCALES):
+    # get_clockify_data against the stub server with a cold name cache: pagination, name
+    # lookups and entry processing, without the client's rate limiting
+    for months in month_scales:
+        days = months * 365 // 12
+        entries = generate_clockify_entries(days)
+        end = datetime.combine(date.today(), datetime.max.time())
+        with StubClockifyServer(entries) as stub, tempfile.TemporaryDirectory() as directory, \
+                main.ClockifyClient('stub', base_url=stub.url, requests_per_second=None) as client:
+            cache_file = os.path.join(directory, main.CLOCKIFY_CACHE_FILE)
+            
+            def fetch():
+                if os.path.exists(cache_file):
+                    os.remove(cache_file)
+                return main.get_clockify_data('stub', 'workspace', 'stub-user', client,
+                                              end - timedelta(days=days), end)
+            
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                tracker.record('clockify', 'fetch', f'{months} months', *measure(fetch))
+            finally:
+                os.chdir(cwd)
+
+def bench_team(tracker, user_scales=USER_SCALES, days=365):
+    # analyze_team over one year of history for a growing team, from plain and compact frames
+    for users in user_scales:
+        scale = f'{users} users'
+        df = generate_team_timesheets(users, days)
+        tracker.record('team', 'analyze', scale, *measure(lambda: main.analyze_team(df, 9), repeat=1))
+        compact = main.compact_timesheet(df)
+        tracker.record('team', 'analyze_compact', scale, *measure(lambda: main.analyze_team(compact, 9), repeat=1))
+
+def bench_parse(day_counts=(31, 365, 3650)):
+    # Every backend must produce the same frame as BeautifulSoup's html.parser (the original
+    # implementation); the speedup is reported against it
+    backends = [backend for backend in main.PARSER_BACKENDS
+                if backend == 'bs4' or main.importlib.util.find_spec(backend) is not None]
+    print(f"{'days':>6} {'backend':>10} {'seconds':>10} {'speedup':>8}")
+    for days in day_counts:
+        html_content = generate_mygrid_html(days)
+        reference = main.parse_timesheet(html_content, 'bs4')
+        baseline = best_time(lambda: main.parse_timesheet(html_content, 'bs4'))
+        for backend in backends:
+            pd.testing.assert_frame_equal(main.parse_timesheet(html_content, backend), reference)
+            seconds = best_time(lambda: main.parse_timesheet(html_content, backend))
+            print(f"{days:>6} {backend:>10} {seconds:>10.4f} {baseline / seconds:>7.1f}x")
+
+def parse_clockify_entry(entry, zone=None):
+    # One entry at a time with the standard library alone, for checking ClockifyTimeParser
+    interval = entry['timeInterval']
+    started = datetime.fromisoformat(interval['start'].replace('Z', '+00:00')).astimezone(zone)
+    parts = main.CLOCKIFY_DURATION_PATTERN.fullmatch(interval['duration']).groupdict()
+    seconds = sum(float(parts[name] or 0) * factor for name, factor in main.CLOCKIFY_DURATION_SECONDS.items())
+    local_start = (started.replace(tzinfo=None) - datetime(1970, 1, 1)) // timedelta(seconds=1)
+    return started.toordinal() - main.EPOCH_ORDINAL, seconds / 3600, local_start
+
+def bench_durations(entry_counts=(1000, 100000), time_zones=(None, 'America/New_York', 'Asia/Kolkata')):
+    # ClockifyTimeParser against parsing every entry with datetime and the regex; both must agree,
+    # and the hours must match the generated start/end times to the second. None is the system zone.
+    from zoneinfo import ZoneInfo
+    
+    print(f"{'entries':>8} {'time zone':>16} {'per entry':>10} {'parser':>9} {'speedup':>8}")
+    for count in entry_counts:
+        # About three years of entries from as many users as it takes (~3,500 entries each)
+        entries = []
+        while len(entries) < count:
+            entries.extend(entry for entry in generate_clockify_entries(1000, seed=len(entries)) if entry['timeInterval']['duration'])
+        entries = entries[:count]
+        starts = [entry['timeInterval']['start'] for entry in entries]
+        durations = [entry['timeInterval']['duration'] for entry in entries]
+        actual_seconds = [(datetime.fromisoformat(entry['timeInterval']['end'][:-1]) -
+                           datetime.fromisoformat(entry['timeInterval']['start'][:-1])).total_seconds() for entry in entries]
+        for time_zone in time_zones:
+            zone = ZoneInfo(time_zone) if time_zone else None
+            days, hours, local_starts = main.ClockifyTimeParser(time_zone).parse(starts, durations)
+            expected_days, expected_hours, expected_starts = zip(*(parse_clockify_entry(entry, zone) for entry in entries))
+            np.testing.assert_array_equal(days, expected_days)
+            np.testing.assert_array_equal(local_starts, expected_starts)
+            np.testing.assert_allclose(hours, expected_hours)
+            np.testing.assert_allclose(np.array(hours) * 3600, actual_seconds)
+            baseline = best_time(lambda: [parse_clockify_entry(entry, zone) for entry in entries], repeat=3)
+            seconds = best_time(lambda: main.ClockifyTimeParser(time_zone).parse(starts, durations), repeat=3)
+            print(f"{count:>8} {time_zone or 'system':>16} {baseline:>10.4f} {seconds:>9.4f} {baseline / seconds:>7.1f}x")
+
+def bench_memory(years=(1, 10)):
+    # Bytes per user-year of timesheet rows as parsed (strings in object columns, as on
+    # pandas < 3) against the compact columns used for long histories
+    print(f"{'years':>6} {'parsed':>10} {'compact':>10} {'ratio':>7}")
+    for count in years:
+        df = main.parse_timesheet(generate_mygrid_html(365 * count))
+        parsed = df.astype({column: object for column in main.CLOCK_COLUMNS}).memory_usage(deep=True).sum()
+        compact_df = main.compact_timesheet(df)
+        pd.testing.assert_series_equal(main.expand_timesheet(compact_df)['Hours'], df['Hours'].reset_index(drop=True))
+        compact = compact_df.memory_usage(deep=True).sum()
+        print(f"{count:>6} {parsed / count:>10.0f} {compact / count:>10.0f} {parsed / compact:>6.1f}x")
+
+def bench_reports(users=32, years=3):
+    # render_team_reports with a growing process pool against rendering in-process; every
+    # report is rendered (force=True). Work runs in a temporary directory with its own store.
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, *(2 ** power for power in range(1, cpus.bit_length())), cpus})
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            store = main.open_store('store.db')
+            id_numbers = [f'{300000 + user}' for user in range(users)]
+            for user, id_number in enumerate(id_numbers):
+                main.store_timesheet(store, id_number, main.parse_timesheet(generate_mygrid_html(365 * years, seed=user)))
+            config = {'store_file': 'store.db'}
+            print(f"{users} users, {years} years each, {cpus} CPUs")
+            print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+            baseline = None
+            for workers in worker_counts:
+                started = time.perf_counter()
+                main.render_team_reports(config, store, id_numbers, 'reports', 9, workers, force=True)
+                seconds = time.perf_counter() - started
+                baseline = baseline or seconds
+                print(f"{workers:>8} {seconds:>10.2f} {baseline / seconds:>7.1f}x")
+            store.close()
+        finally:
+            os.chdir(previous_dir)
+
+STARTUP_BUDGET_MS = 200
+HEAVY_MODULES = ['pandas', 'numpy', 'bs4', 'selenium', 'requests', 'lxml', 'selectolax']
+
+def get_import_time_ms(module):
+    # Cumulative import time of module (including everything it imports), from -X importtime
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+def time_cli_ms(argv, cwd, repeat=5):
+    # Best wall time of a main.py run in a fresh interpreter, as the user sees it
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'), *argv],
+                       capture_output=True, check=True, cwd=cwd)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+def prepare_current_report(work_dir, days=365):
+    # A store and config in work_dir whose report is already rendered, so the next
+    # 'main.py report --config config.json' there takes the "up to date" path
+    store = main.open_store(os.path.join(work_dir, 'store.db'))
+    try:
+        main.store_timesheet(store, 'bench', main.parse_timesheet(generate_mygrid_html(days)))
+    finally:
+        store.close()
+    with open(os.path.join(work_dir, 'config.json'), 'w') as f:
+        json.dump({'id_number': 'bench', 'store_file': 'store.db'}, f)
+    result = subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'),
+                             'report', '--config', 'config.json'], capture_output=True, text=True, check=True, cwd=work_dir)
+    if 'HTML report saved' not in result.stdout:
+        raise RuntimeError(f"Could not render the report: {result.stdout.strip()}")
+    return ['report', '--config', 'config.json']
+
+def bench_startup():
+    # Fails (exit code 1) when the CLI blows its startup budget or imports a heavy module eagerly
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    failures = []
+    
+    result = subprocess.run([sys.executable, '-c', f'import sys, main; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'],
+                            capture_output=True, text=True, check=True, cwd=script_dir)
+    eager = result.stdout.strip()
+    if eager:
+        failures.append(f"'import main' loads heavy modules: {eager}")
+    
+    import_ms = min(get_import_time_ms('main') for _ in range(3))
+    print(f"import main: {import_ms:.1f} ms")
+    
+    help_ms = time_cli_ms(['--help'], script_dir)
+    print(f"main.py --help: {help_ms:.1f} ms (budget {STARTUP_BUDGET_MS} ms)")
+    if help_ms > STARTUP_BUDGET_MS:
+        failures.append(f"main.py --help took {help_ms:.1f} ms, over the {STARTUP_BUDGET_MS} ms budget")
+    
+    # Re-running report when nothing changed only hashes the store, so it gets the same budget
+    with tempfile.TemporaryDirectory() as work_dir:
+        report_ms = time_cli_ms(prepare_current_report(work_dir), work_dir)
+    print(f"main.py report (up to date): {report_ms:.1f} ms (budget {STARTUP_BUDGET_MS} ms)")
+    if report_ms > STARTUP_BUDGET_MS:
+        failures.append(f"main.py report on an up-to-date store took {report_ms:.1f} ms, over the {STARTUP_BUDGET_MS} ms budget")
+    
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+# Benchmarks that take a ResultTracker; their timings are recorded in RESULTS_FILE
+TRACKED_BENCHMARKS = {
+    'pipeline': bench_pipeline,
+    'clockify': bench_clockify,
+    'team': bench_team
+}
+
+QUICK_SCALES = {
+    'pipeline': {'month_scales': MONTH_SCALES[:2]},
+    'clockify': {'month_scales': MONTH_SCALES[:2]},
+    'team': {'user_scales': USER_SCALES[:2]}
+}
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'parse': bench_parse,
+    'durations': bench_durations,
+    'memory': bench_memory,
+    'reports': bench_reports,
+    'intervals': bench_intervals
+}
+
+def main_cli(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmarks for the timesheet pipeline")
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"benchmarks to run: {', '.join([*BENCHMARKS, *TRACKED_BENCHMARKS])} (default: all)")
+    parser.add_argument('--results', default=RESULTS_FILE, help=f"file the tracked timings are appended to (default: {RESULTS_FILE})")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f"slowdown against the last recorded run that fails the run (default: {REGRESSION_THRESHOLD})")
+    parser.add_argument('--quick', action='store_true', help="only the smallest scales")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS and name not in TRACKED_BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    
+    tracker = None
+    for name in args.names or [*BENCHMARKS, *TRACKED_BENCHMARKS]:
+        print(f"== {name} ==")
+        if name in BENCHMARKS:
+            BENCHMARKS[name]()
+            continue
+        if tracker is None:
+            tracker = ResultTracker(args.results, args.threshold)
+        TRACKED_BENCHMARKS[name](tracker, **(QUICK_SCALES[name] if args.quick else {}))
+    
+    if tracker and tracker.regressions:
+        for regression in tracker.regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_cli()
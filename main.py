@@ -1,24 +1,195 @@
 import os
-from bs4 import BeautifulSoup
-import pandas as pd
-from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-import webbrowser
+import io
+import importlib.util
+from datetime import datetime, timedelta, timezone
+import hashlib
 import json
+import math
 import logging
-import requests
-from selenium.webdriver.remote.remote_connection import LOGGER
+import re
+import shutil
+import sqlite3
+from string import Template
+from urllib.parse import urljoin
+import queue
+from array import array
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Heavy dependencies (pandas, numpy, bs4, selenium, requests) are imported inside the functions
+# that use them, so commands that never touch them start quickly
 
 # Configure logging
-LOGGER.setLevel(logging.WARNING)
+logging.getLogger('selenium.webdriver.remote.remote_connection').setLevel(logging.WARNING)
 logging.basicConfig(level=logging.WARNING)
+metrics_logger = logging.getLogger('timesheet.metrics')
+
+METRICS_FORMATS = ['jsonl', 'openmetrics']
+
+def configure_metrics(metrics_file=None, metrics_format='jsonl', memory=False):
+    # Metrics are JSON lines on the 'timesheet.metrics' logger, written to metrics_file if given.
+    # With metrics_format='openmetrics' the file instead gets the run totals as OpenMetrics text
+    # (see write_metrics). memory=True traces allocations so stages also report peak memory.
+    if metrics_format not in METRICS_FORMATS:
+        raise ValueError(f"Unknown metrics_format {metrics_format!r}, expected one of {METRICS_FORMATS}")
+    if metrics_file and metrics_format == 'jsonl' and not metrics_logger.handlers:
+        handler = logging.FileHandler(metrics_file, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        metrics_logger.addHandler(handler)
+        metrics_logger.setLevel(logging.INFO)
+        metrics_logger.propagate = False
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def get_error_status(error):
+    # Selenium's TimeoutException and requests' Timeout/ReadTimeout/... all count as timeouts
+    return 'timeout' if 'Timeout' in type(error).__name__ else 'error'
+
+class RunMetrics:
+    # Totals per stage (and label set) for the whole process: count, seconds, failures and the
+    # largest peak of traced memory. Fed by stage() and StepMetrics, read by format_openmetrics.
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, status='ok', peak_bytes=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            totals = self.stages.setdefault(key, {'count': 0, 'seconds': 0.0, 'failures': 0, 'peak_bytes': None})
+            totals['count'] += 1
+            totals['seconds'] += seconds
+            if status != 'ok':
+                totals['failures'] += 1
+            if peak_bytes is not None:
+                totals['peak_bytes'] = max(totals['peak_bytes'] or 0, peak_bytes)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(totals) for key, totals in self.stages.items()}
+
+    def merge(self, stages):
+        # Adds totals recorded in another process (a snapshot() from a report worker)
+        with self._lock:
+            for key, other in stages.items():
+                totals = self.stages.setdefault(key, {'count': 0, 'seconds': 0.0, 'failures': 0, 'peak_bytes': None})
+                totals['count'] += other['count']
+                totals['seconds'] += other['seconds']
+                totals['failures'] += other['failures']
+                if other['peak_bytes'] is not None:
+                    totals['peak_bytes'] = max(totals['peak_bytes'] or 0, other['peak_bytes'])
+
+run_metrics = RunMetrics()
+
+# Open stages on the main thread, for attributing traced peak memory to nested stages
+_memory_frames = []
+
+@contextmanager
+def stage(name, **labels):
+    # Times one pipeline stage, logs it as a JSON line and adds it to run_metrics. While
+    # tracemalloc is tracing, stages on the main thread also record the peak memory allocated
+    # while they ran; stages on worker threads (Clockify pages, batch fetches) only record time.
+    tracing = tracemalloc.is_tracing() and threading.current_thread() is threading.main_thread()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if _memory_frames:
+            _memory_frames[-1]['peak'] = max(_memory_frames[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        _memory_frames.append({'start': current, 'peak': current})
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except Exception as e:
+        status = get_error_status(e)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        peak_bytes = None
+        if tracing:
+            frame = _memory_frames.pop()
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            if _memory_frames:
+                _memory_frames[-1]['peak'] = max(_memory_frames[-1]['peak'], peak)
+            peak_bytes = peak - frame['start']
+        run_metrics.add(name, seconds, status, peak_bytes, **labels)
+        if metrics_logger.isEnabledFor(logging.INFO):
+            record = {'stage': name, **labels, 'seconds': round(seconds, 4), 'status': status}
+            if peak_bytes is not None:
+                record['peak_bytes'] = peak_bytes
+            metrics_logger.info(json.dumps(record))
+
+def format_metric_labels(labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+def format_openmetrics(metrics=run_metrics):
+    # OpenMetrics text exposition of the run totals, e.g. for a node_exporter textfile
+    # collector or the daemon's /metrics endpoint
+    stages = sorted(metrics.snapshot().items())
+    lines = [
+        '# TYPE timesheet_stage_seconds summary',
+        '# UNIT timesheet_stage_seconds seconds',
+        '# HELP timesheet_stage_seconds Time spent in each pipeline stage.'
+    ]
+    for (name, labels), totals in stages:
+        label_text = format_metric_labels({'stage': name, **dict(labels)})
+        lines.append(f"timesheet_stage_seconds_count{label_text} {totals['count']}")
+        lines.append(f"timesheet_stage_seconds_sum{label_text} {totals['seconds']:.6f}")
+    lines += ['# TYPE timesheet_stage_failures counter',
+              '# HELP timesheet_stage_failures Stage runs that raised an error.']
+    for (name, labels), totals in stages:
+        lines.append(f"timesheet_stage_failures_total{format_metric_labels({'stage': name, **dict(labels)})} {totals['failures']}")
+    peaks = [(key, totals) for key, totals in stages if totals['peak_bytes'] is not None]
+    if peaks:
+        lines += ['# TYPE timesheet_stage_peak_memory_bytes gauge',
+                  '# UNIT timesheet_stage_peak_memory_bytes bytes',
+                  '# HELP timesheet_stage_peak_memory_bytes Largest traced allocation peak during the stage.']
+        for (name, labels), totals in peaks:
+            lines.append(f"timesheet_stage_peak_memory_bytes{format_metric_labels({'stage': name, **dict(labels)})} {totals['peak_bytes']}")
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
 
-def get_config_values():
-    config_file = 'timesheet_config.json'
+def write_metrics(metrics_file, metrics_format='jsonl'):
+    # JSON lines are written as they happen; OpenMetrics totals are written once, at the end
+    if metrics_file and metrics_format == 'openmetrics':
+        with open(metrics_file, 'w', encoding='utf-8') as f:
+            f.write(format_openmetrics())
+
+class StepMetrics:
+    # Per-step latencies for one operation, emitted as a single JSON line when finished
+    def __init__(self, operation, **labels):
+        self.record = {'operation': operation, **labels, 'started_at': datetime.now().isoformat(), 'steps': {}}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except Exception as e:
+            status = get_error_status(e)
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self.record['steps'][name] = {'seconds': round(seconds, 4), 'status': status}
+            labels = {key: self.record[key] for key in ('backend',) if key in self.record}
+            run_metrics.add(name, seconds, status, operation=self.record['operation'], **labels)
+
+    def emit(self, status='ok'):
+        self.record['status'] = status
+        self.record['seconds'] = round(time.perf_counter() - self._started, 4)
+        metrics_logger.info(json.dumps(self.record))
+        return self.record
+
+CONFIG_FILE = 'timesheet_config.json'
+DEFAULT_DAILY_TARGET = 9
+
+def load_config(config_file=CONFIG_FILE):
+    # Read the saved config without prompting for anything missing
     config = {}
     if os.path.exists(config_file):
         try:
@@ -26,6 +197,10 @@ def get_config_values():
                 config = json.load(f)
         except Exception as e:
             print(f"Error reading config: {e}")
+    return config
+
+def get_config_values(config_file=CONFIG_FILE):
+    config = load_config(config_file)
     
     # Get ID number
     if 'id_number' not in config:
@@ -50,213 +225,917 @@ def get_config_values():
     
     return config
 
-def get_clockify_data(api_key, workspace_id, user_id=None):
+CLOCKIFY_BASE_URL = "https://api.clockify.me/api/v1"
+CLOCKIFY_CACHE_FILE = 'clockify_cache.json'
+CLOCKIFY_CACHE_TTL = 24 * 60 * 60  # Seconds before cached project/task names are refreshed
+CLOCKIFY_LIST_PAGE_SIZE = 500
+CLOCKIFY_ENTRIES_PAGE_SIZE = 1000
+CLOCKIFY_INITIAL_DAYS = 30  # Days fetched on the first sync, before there is a high-water mark
+
+def load_clockify_cache(cache_file=CLOCKIFY_CACHE_FILE):
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not read Clockify cache ({e}), rebuilding it")
+    return {}
+
+def save_clockify_cache(cache, cache_file=CLOCKIFY_CACHE_FILE):
+    try:
+        with open(cache_file, 'w') as f:
+            json.dump(cache, f)
+    except Exception as e:
+        print(f"Warning: Could not save Clockify cache ({e}), continuing without saving")
+
+def invalidate_clockify_cache(workspace_id=None, cache_file=CLOCKIFY_CACHE_FILE):
+    # Drop one workspace, or the whole cache when no workspace is given
+    if workspace_id is None:
+        save_clockify_cache({}, cache_file)
+        return
+    cache = load_clockify_cache(cache_file)
+    if cache.pop(workspace_id, None) is not None:
+        save_clockify_cache(cache, cache_file)
+
+class ClockifyClient:
+    # One keep-alive session shared by every Clockify call. Pages and metadata listings are
+    # fetched on a small thread pool, 429/5xx responses are retried with exponential backoff
+    # (honouring Retry-After), and requests are spaced to stay under the API rate limit.
+    def __init__(self, api_key, base_url=CLOCKIFY_BASE_URL, max_workers=4, max_retries=5,
+                 backoff=0.5, requests_per_second=20, timeout=30, pool_size=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.session = requests.Session()
+        self.session.headers.update({
+            "X-Api-Key": api_key,
+            "Content-Type": "application/json"
+        })
+        # pool_size is for callers that run requests on threads of their own
+        pool_size = pool_size or max_workers
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        self._cancelled = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def cancel(self):
+        # For callers that stopped waiting: every further request (or retry wait) fails fast
+        self._cancelled.set()
+
+    def _wait_for_slot(self):
+        # Space requests out across all threads; a 429 pushes the next slot further back
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def _delay_all(self, delay):
+        with self._rate_lock:
+            self._next_request_at = max(self._next_request_at, time.monotonic() + delay)
+
+    def get(self, path, params=None):
+        import requests
+        
+        url = f"{self.base_url}{path}"
+        # IDs are replaced so requests to the same endpoint are timed together
+        endpoint = re.sub(r'/(workspaces|projects|user)/[^/]+', r'/\1/{id}', path)
+        for attempt in range(self.max_retries + 1):
+            if self._cancelled.is_set():
+                raise RuntimeError("Clockify requests were cancelled")
+            self._wait_for_slot()
+            delay = self.backoff * (2 ** attempt)
+            try:
+                with stage('clockify_request', endpoint=endpoint):
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                retry_after = response.headers.get('Retry-After')
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                if response.status_code == 429:
+                    self._delay_all(delay)
+            self._cancelled.wait(delay)
+
+    def iter_pages(self, path, params=None, page_size=CLOCKIFY_LIST_PAGE_SIZE):
+        # Yield the pages of a listing endpoint as they arrive. The first page is fetched alone; if it
+        # is full, the following pages are requested max_workers at a time until a short page shows up,
+        # so at most max_workers pages are held at once.
+        def fetch_page(page):
+            page_params = dict(params or {})
+            page_params.update({"page": page, "page-size": page_size})
+            return self.get(path, page_params)
+
+        items = fetch_page(1)
+        yield items
+        if len(items) < page_size:
+            return
+        next_page = 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                pages = list(range(next_page, next_page + self.max_workers))
+                for batch in executor.map(fetch_page, pages):
+                    yield batch
+                    if len(batch) < page_size:
+                        return
+                next_page += self.max_workers
+
+    def get_pages(self, path, params=None, page_size=CLOCKIFY_LIST_PAGE_SIZE):
+        return [item for page in self.iter_pages(path, params, page_size) for item in page]
+
+    def map(self, func, items):
+        # Run func over items on the client's bounded thread pool, preserving order
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    def get_user_id(self):
+        # The user behind an API key never changes, so long-lived clients only ask once
+        if getattr(self, '_user_id', None) is None:
+            self._user_id = self.get("/user")["id"]
+        return self._user_id
+
+    def iter_time_entries(self, workspace_id, user_id, start, end, time_zone=None):
+        params = {
+            "start": to_clockify_time(start, time_zone),
+            "end": to_clockify_time(end, time_zone)
+        }
+        return self.iter_pages(f"/workspaces/{workspace_id}/user/{user_id}/time-entries", params,
+                               page_size=CLOCKIFY_ENTRIES_PAGE_SIZE)
+
+    def get_time_entries(self, workspace_id, user_id, start, end, time_zone=None):
+        return [entry for page in self.iter_time_entries(workspace_id, user_id, start, end, time_zone) for entry in page]
+
+    def get_projects(self, workspace_id):
+        return self.get_pages(f"/workspaces/{workspace_id}/projects")
+
+    def get_tasks(self, workspace_id, project_id):
+        return self.get_pages(f"/workspaces/{workspace_id}/projects/{project_id}/tasks")
+
+def get_clockify_names(client, workspace_id, task_refs, cache_file=CLOCKIFY_CACHE_FILE, ttl=CLOCKIFY_CACHE_TTL):
+    # task_refs maps each project ID seen in the entries to the set of task IDs used under it.
+    # Names are looked up in the on-disk cache first; a listing is only re-downloaded when the
+    # workspace entry has expired or an ID is missing from it (e.g. a project created since).
+    cache = load_clockify_cache(cache_file)
+    workspace = cache.get(workspace_id)
+    now = time.time()
+    if not workspace or now - workspace.get('fetched_at', 0) > ttl:
+        workspace = {'fetched_at': now, 'projects': {}, 'tasks': {}}
+    changed = False
+
+    if any(project_id not in workspace['projects'] for project_id in task_refs):
+        try:
+            projects = client.get_projects(workspace_id)
+            workspace['projects'] = {project['id']: project['name'] for project in projects}
+            changed = True
+        except Exception as e:
+            print(f"Warning: Could not list Clockify projects: {e}")
+
+    stale_projects = [
+        project_id for project_id, task_ids in task_refs.items()
+        if any(task_id not in workspace['tasks'].get(project_id, {}) for task_id in task_ids)
+    ]
+
+    def fetch_tasks(project_id):
+        try:
+            return client.get_tasks(workspace_id, project_id)
+        except Exception as e:
+            print(f"Warning: Could not list Clockify tasks for project {project_id}: {e}")
+            return None
+
+    for project_id, tasks in zip(stale_projects, client.map(fetch_tasks, stale_projects)):
+        if tasks is not None:
+            workspace['tasks'][project_id] = {task['id']: task['name'] for task in tasks}
+            changed = True
+
+    if changed:
+        cache[workspace_id] = workspace
+        save_clockify_cache(cache, cache_file)
+
+    return workspace['projects'], workspace['tasks']
+
+def get_entry_ref(entry, kind):
+    # Time entries carry plain projectId/taskId fields, or nested objects when hydrated
+    if entry.get(kind) and entry[kind].get('id'):
+        return entry[kind]['id']
+    return entry.get(f'{kind}Id')
+
+def to_clockify_time(moment, time_zone=None):
+    # The API filters on UTC timestamps; naive datetimes (the sync window) are local time in
+    # time_zone, or in the system's time zone when none is configured
+    from zoneinfo import ZoneInfo
+    
+    if moment.tzinfo is None and time_zone:
+        moment = moment.replace(tzinfo=ZoneInfo(time_zone))
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# ISO 8601 durations as Clockify writes them (PT8H30M, PT45S, P1DT2H); every part is optional
+CLOCKIFY_DURATION_PATTERN = re.compile(
+    r'P(?:(?P<weeks>\d+(?:\.\d+)?)W)?(?:(?P<days>\d+(?:\.\d+)?)D)?'
+    r'(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?'
+)
+CLOCKIFY_DURATION_SECONDS = {'weeks': 7 * 86400, 'days': 86400, 'hours': 3600, 'minutes': 60, 'seconds': 1}
+
+class ClockifyTimeParser:
+    # Local start day (days since 1970-01-01), local start time (wall-clock seconds since 1970-01-01)
+    # and hours of time entries, in time_zone or the system's time zone. Durations repeat a lot, so
+    # each distinct one goes through the regex once. Start times in the API's usual form
+    # (2024-05-01T07:30:00Z) need one offset lookup per UTC day, after which the local time is the
+    # UTC time of day plus that day's offset. Other forms (offsets, fractions) and days with a DST
+    # change go through datetime.
+    def __init__(self, time_zone=None):
+        from zoneinfo import ZoneInfo
+        
+        self.zone = ZoneInfo(time_zone) if time_zone else None
+        self._hours = {}
+        self._utc_days = {}
+
+    def get_hours(self, duration):
+        hours = self._hours.get(duration)
+        if hours is None:
+            match = CLOCKIFY_DURATION_PATTERN.fullmatch(duration)
+            seconds = 0
+            if match:
+                for value, factor in zip(match.groups(), CLOCKIFY_DURATION_SECONDS.values()):
+                    if value:
+                        seconds += float(value) * factor
+            hours = self._hours[duration] = seconds / 3600
+        return hours
+
+    def get_utc_offset(self, moment):
+        if self.zone:
+            return int(moment.astimezone(self.zone).utcoffset().total_seconds())
+        return time.localtime(moment.timestamp()).tm_gmtoff
+
+    def get_utc_day(self, date_text):
+        # Local time at 00:00 UTC on that day in seconds since 1970-01-01, or None when the offset
+        # changes during the day
+        midnight = datetime.fromisoformat(date_text).replace(tzinfo=timezone.utc)
+        offset = self.get_utc_offset(midnight)
+        base = None
+        if offset == self.get_utc_offset(midnight + timedelta(days=1)):
+            base = (midnight.toordinal() - EPOCH_ORDINAL) * 86400 + offset
+        self._utc_days[date_text] = base
+        return base
+
+    def get_local_start(self, start):
+        # Any ISO 8601 timestamp, through datetime
+        started = datetime.fromisoformat(start.replace('Z', '+00:00')).astimezone(self.zone)
+        return (started.toordinal() - EPOCH_ORDINAL) * 86400 + started.hour * 3600 + started.minute * 60 + started.second
+
+    def parse(self, starts, durations):
+        # A whole batch of entries at once: (day numbers, hours, local start times). The loop is
+        # kept inline since it runs once per entry.
+        days = array('i')
+        local_starts = array('q')
+        utc_days = self._utc_days
+        for start in starts:
+            # 2024-05-01T07:30:00Z: 20 characters ending in Z
+            if len(start) == 20 and start[19] == 'Z':
+                date_text = start[:10]
+                base = utc_days[date_text] if date_text in utc_days else self.get_utc_day(date_text)
+                if base is not None:
+                    local_start = base + int(start[11:13]) * 3600 + int(start[14:16]) * 60 + int(start[17:19])
+                    local_starts.append(local_start)
+                    days.append(local_start // 86400)
+                    continue
+            local_start = self.get_local_start(start)
+            local_starts.append(local_start)
+            days.append(local_start // 86400)
+        
+        known = self._hours
+        hours = array('d', [known[duration] if duration in known else self.get_hours(duration) for duration in durations])
+        return days, hours, local_starts
+
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+CLOCKIFY_TEXT_COLUMNS = ('ClockifyDescription', 'Project', 'Task')
+
+class ClockifyEntries:
+    # Finished Clockify entries in columnar form, filled one entry at a time: day numbers (days since
+    # 1970-01-01), local start times (wall-clock seconds since 1970-01-01, -1 when unknown) and hours
+    # in typed arrays, and descriptions/project/task names as codes into one list of interned labels
+    # (-1 for None), so each distinct string is kept once however many entries use it. Iterating
+    # gives the same row dicts fetch_clockify_entries used to return, with the start time added.
+    def __init__(self):
+        self.entry_ids = []
+        self.days = array('i')
+        self.starts = array('q')
+        self.hours = array('d')
+        self.codes = {column: array('i') for column in CLOCKIFY_TEXT_COLUMNS}
+        self.labels = []
+        self._label_codes = {}
+
+    def __len__(self):
+        return len(self.entry_ids)
+
+    def get_code(self, label):
+        if label is None:
+            return -1
+        code = self._label_codes.get(label)
+        if code is None:
+            code = self._label_codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def add(self, entry_id, date, hours, description, project, task, start=None):
+        self.entry_ids.append(entry_id)
+        self.days.append(date.toordinal() - EPOCH_ORDINAL)
+        self.starts.append(-1 if start is None else start)
+        self.hours.append(hours)
+        for column, label in zip(CLOCKIFY_TEXT_COLUMNS, (description, project, task)):
+            self.codes[column].append(self.get_code(label))
+
+    def extend(self, entry_ids, days, hours, descriptions, projects, tasks, starts):
+        # A batch of entries at once, with day numbers, hours and start times as arrays
+        self.entry_ids.extend(entry_ids)
+        self.days.extend(days)
+        self.starts.extend(starts)
+        self.hours.extend(hours)
+        for column, labels in zip(CLOCKIFY_TEXT_COLUMNS, (descriptions, projects, tasks)):
+            self.codes[column].extend(self.get_code(label) for label in labels)
+
+    def __iter__(self):
+        labels = self.labels + [None]  # code -1 picks the trailing None
+        codes = [self.codes[column] for column in CLOCKIFY_TEXT_COLUMNS]
+        for entry_id, day, start, hours, description, project, task in zip(self.entry_ids, self.days, self.starts,
+                                                                           self.hours, *codes):
+            yield {
+                'EntryId': entry_id,
+                'Date': datetime.fromordinal(day + EPOCH_ORDINAL).date(),
+                'Start': None if start < 0 else start,
+                'ClockifyHours': hours,
+                'ClockifyDescription': labels[description],
+                'Project': labels[project],
+                'Task': labels[task]
+            }
+
+    def to_frame(self):
+        # Entry-level frame with the text columns as categoricals sharing the interned labels
+        import numpy as np
+        import pandas as pd
+        
+        df = pd.DataFrame({
+            'EntryId': self.entry_ids,
+            'Date': from_day_numbers(pd.Series(np.frombuffer(self.days, dtype=np.intc))),
+            'ClockifyHours': np.frombuffer(self.hours, dtype=np.float64)
+        })
+        categories = pd.Index(self.labels, dtype=object)
+        for column in CLOCKIFY_TEXT_COLUMNS:
+            df[column] = pd.Categorical.from_codes(np.frombuffer(self.codes[column], dtype=np.intc), categories=categories)
+        return df
+
+def get_entry_names(entry, project_names, task_names):
+    # Project and task names from the cached listings, falling back to the entry itself
+    project_name = "No project"
+    task_name = "No task"
+    project_id = get_entry_ref(entry, 'project')
+    if project_id:
+        project_name = project_names.get(project_id) or (entry.get('project') or {}).get('name') or "No project"
+        task_id = get_entry_ref(entry, 'task')
+        if task_id:
+            task_name = task_names.get(project_id, {}).get(task_id) or (entry.get('task') or {}).get('name') or "No task"
+    return project_name, task_name
+
+def fetch_clockify_entries(client, workspace_id, user_id, start_date, end_date, time_zone=None):
+    # Entries are processed page by page as they are downloaded, so only the current pages of JSON
+    # are ever held; names are resolved when a page refers to a project or task not seen before.
+    # Start times and durations are parsed a whole page at a time.
+    entries = ClockifyEntries()
+    parser = ClockifyTimeParser(time_zone)
+    project_names, task_names = {}, {}
+    seen_refs = set()
+    for page in client.iter_time_entries(workspace_id, user_id, start_date, end_date, time_zone):
+        task_refs = {}
+        for entry in page:
+            project_id = get_entry_ref(entry, 'project')
+            if project_id:
+                task_id = get_entry_ref(entry, 'task')
+                if (project_id, task_id) not in seen_refs:
+                    seen_refs.add((project_id, task_id))
+                    task_refs.setdefault(project_id, set())
+                    if task_id:
+                        task_refs[project_id].add(task_id)
+        if task_refs:
+            project_names, task_names = get_clockify_names(client, workspace_id, task_refs)
+        
+        # Running entries have no duration yet
+        finished = [entry for entry in page if entry['timeInterval']['duration']]
+        if not finished:
+            continue
+        names = [get_entry_names(entry, project_names, task_names) for entry in finished]
+        days, hours, starts = parser.parse([entry['timeInterval']['start'] for entry in finished],
+                                           [entry['timeInterval']['duration'] for entry in finished])
+        entries.extend(
+            [entry['id'] for entry in finished],
+            days,
+            hours,
+            [entry.get('description', '') for entry in finished],
+            [project_name for project_name, _ in names],
+            [task_name for _, task_name in names],
+            starts
+        )
+    
+    return entries
+
+class ClockifyDays:
+    # Clockify entries grouped per day, without a Python list per day: frame has one row per day
+    # (Date, the summed ClockifyHours and the EntryStart:EntryStop range of that day's rows in
+    # entries), and entries holds the text columns of every entry, sorted by day. With
+    # ClockifyEntries input these are categoricals over its interned labels.
+    def __init__(self, frame, entries):
+        self.frame = frame
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.frame)
+
+def group_clockify_entries(data):
+    import numpy as np
+    import pandas as pd
+    
+    if data is None or len(data) == 0:
+        return None
+    
+    # ClockifyEntries, a list of its rows, or a frame with the same columns
+    if isinstance(data, ClockifyEntries):
+        df = data.to_frame()
+    else:
+        df = pd.DataFrame(data)
+        df['Date'] = pd.to_datetime(df['Date'])
+    
+    # Per-day hours are summed over the day-sorted entries in one pass. The sort is stable so
+    # every day keeps its entries in the order they came in.
+    df = df.sort_values('Date', kind='stable')
+    dates = df['Date'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    frame = pd.DataFrame({
+        'Date': dates[starts],
+        'ClockifyHours': np.add.reduceat(df['ClockifyHours'].to_numpy(dtype=np.float64), starts),
+        'EntryStart': starts,
+        'EntryStop': np.r_[starts[1:], len(dates)]
+    })
+    return ClockifyDays(frame, df[list(CLOCKIFY_TEXT_COLUMNS)].reset_index(drop=True))
+
+def get_clockify_data(api_key, workspace_id, user_id=None, client=None, start_date=None, end_date=None,
+                      time_zone=None):
     if not api_key or not workspace_id:
         return None
-        
-    base_url = "https://api.clockify.me/api/v1"
-    headers = {
-        "X-Api-Key": api_key,
-        "Content-Type": "application/json"
-    }
+    
+    if client is None:
+        with ClockifyClient(api_key) as client:
+            return get_clockify_data(api_key, workspace_id, user_id, client, start_date, end_date, time_zone)
     
     # If user_id is not provided, get it from the current user endpoint
     if not user_id:
         try:
-            user_response = requests.get(f"{base_url}/user", headers=headers)
-            user_response.raise_for_status()
-            user_id = user_response.json()["id"]
+            user_id = client.get_user_id()
         except Exception as e:
             print(f"Error getting user ID from Clockify: {e}")
             return None
     
-    # Get time entries for the last 30 days
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    
-    params = {
-        "start": start_date.isoformat() + "Z",
-        "end": end_date.isoformat() + "Z",
-        "page-size": 1000
-    }
+    # Default to time entries for the last CLOCKIFY_INITIAL_DAYS days
+    end_date = end_date or datetime.now()
+    start_date = start_date or end_date - timedelta(days=CLOCKIFY_INITIAL_DAYS)
     
     try:
-        entries_response = requests.get(
-            f"{base_url}/workspaces/{workspace_id}/user/{user_id}/time-entries",
-            headers=headers,
-            params=params
-        )
-        entries_response.raise_for_status()
-        entries = entries_response.json()
-        
-        # Process entries into a DataFrame
-        data = []
-        for entry in entries:
-            if entry['timeInterval']['duration']:
-                start = datetime.fromisoformat(entry['timeInterval']['start'][:-1])
-                duration = entry['timeInterval']['duration']
-                
-                # Parse ISO 8601 duration
-                hours = 0
-                if 'H' in duration:
-                    hours_part = duration.split('H')[0]
-                    if 'T' in hours_part:
-                        hours = float(hours_part.split('T')[-1])
-                    else:
-                        hours = float(hours_part)
-                
-                # Handle case where duration is just minutes (PT48M)
-                if 'M' in duration and 'H' not in duration:
-                    minutes_part = duration.split('M')[0]
-                    if 'T' in minutes_part:
-                        minutes = float(minutes_part.split('T')[-1])
-                    else:
-                        minutes = float(minutes_part)
-                    hours = minutes / 60
-                elif 'M' in duration:  # Case where both H and M are present (PT8H30M)
-                    minutes_part = duration.split('M')[0].split('H')[-1]
-                    minutes = float(minutes_part) if minutes_part else 0
-                    hours += minutes / 60
-                
-                # Get project name if available
-                project_name = "No project"
-                if 'project' in entry and entry['project']:
-                    try:
-                        project_response = requests.get(
-                            f"{base_url}/workspaces/{workspace_id}/projects/{entry['project']['id']}",
-                            headers=headers
-                        )
-                        project_response.raise_for_status()
-                        project_name = project_response.json()['name']
-                    except:
-                        project_name = entry['project']['name'] if 'name' in entry['project'] else "No project"
-                
-                # Get task name if available
-                task_name = "No task"
-                if 'task' in entry and entry['task']:
-                    try:
-                        task_response = requests.get(
-                            f"{base_url}/workspaces/{workspace_id}/projects/{entry['project']['id']}/tasks/{entry['task']['id']}",
-                            headers=headers
-                        )
-                        task_response.raise_for_status()
-                        task_name = task_response.json()['name']
-                    except:
-                        task_name = entry['task']['name'] if 'name' in entry['task'] else "No task"
-                
-                data.append({
-                    'Date': start.date(),
-                    'ClockifyHours': hours,
-                    'ClockifyDescription': entry.get('description', ''),
-                    'Project': project_name,
-                    'Task': task_name
-                })
-        
-        if data:
-            df = pd.DataFrame(data)
-            df['Date'] = pd.to_datetime(df['Date'])
-            
-            # Group by date and collect all tasks/projects/descriptions
-            grouped = df.groupby('Date').agg({
-                'ClockifyHours': 'sum',
-                'ClockifyDescription': lambda x: list(x),
-                'Project': lambda x: list(x),
-                'Task': lambda x: list(x)
-            }).reset_index()
-            
-            return grouped
-            
-        return None
+        data = fetch_clockify_entries(client, workspace_id, user_id, start_date, end_date, time_zone)
+        return group_clockify_entries(data)
         
     except Exception as e:
         print(f"Error getting time entries from Clockify: {e}")
         return None   
 
 def configure_selenium_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    
     options = webdriver.ChromeOptions()
     options.add_argument('--headless')
     options.add_argument('--disable-gpu')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
     options.add_argument('--log-level=3')
+    # Hand control back at DOMContentLoaded; readiness of the elements we need is awaited explicitly
+    options.page_load_strategy = 'eager'
     service = Service(log_path=os.devnull)
     service.creation_flags = 0x08000000
-    driver = webdriver.Chrome(service=service, options=options)
+    with stage('browser_startup'):
+        driver = webdriver.Chrome(service=service, options=options)
     return driver
 
-def login_and_get_timesheet(id_number, save_html=True, filename='timesheet.html'):
-    driver = configure_selenium_driver()
+SDMATACLICK_URL = 'https://www.sdmataclick.com/m/default.aspx'
+
+DEFAULT_STEP_TIMEOUTS = {
+    'navigate': 15,
+    'login': 10,
+    'name_render': 10,
+    'timesheet_render': 10,
+    'extract': 5
+}
+
+def get_step_timeouts(timeouts=None):
+    return {**DEFAULT_STEP_TIMEOUTS, **(timeouts or {})}
+
+def get_form_fields(form):
+    # Collect what a browser would post for the form: the hidden ASP.NET state
+    # (__VIEWSTATE, __EVENTVALIDATION, ...) plus the current value of every field
+    fields = {}
+    for element in form.find_all(['input', 'select', 'textarea']):
+        name = element.get('name')
+        if not name:
+            continue
+        if element.name == 'input':
+            input_type = (element.get('type') or 'text').lower()
+            if input_type in ('submit', 'button', 'image', 'reset', 'file'):
+                continue
+            if input_type in ('checkbox', 'radio') and not element.has_attr('checked'):
+                continue
+            fields[name] = element.get('value', '')
+        elif element.name == 'select':
+            option = element.find('option', selected=True) or element.find('option')
+            if option is not None:
+                fields[name] = option.get('value', option.text)
+        else:
+            fields[name] = element.text
+    return fields
+
+def post_back(session, url, html, control_id, values=None, timeout=30):
+    # Replay a click on control_id: submit buttons post their own name/value, LinkButtons
+    # go through __doPostBack (__EVENTTARGET/__EVENTARGUMENT) and plain links are followed
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    control = soup.find(id=control_id)
+    if control is None:
+        raise ValueError(f"Element '{control_id}' not found on {url}")
+    form = control.find_parent('form') or soup.find('form') or soup
+    action = urljoin(url, form.get('action') or url) if form is not soup else url
+    fields = get_form_fields(form)
+    for element_id, value in (values or {}).items():
+        element = soup.find(id=element_id)
+        if element is None:
+            raise ValueError(f"Element '{element_id}' not found on {url}")
+        fields[element.get('name', element_id)] = value
+    
+    href = control.get('href', '')
+    postback = re.search(r"__doPostBack\('([^']*)',\s*'([^']*)'\)", href + control.get('onclick', ''))
+    if control.name == 'a' and href and not postback and not href.startswith('javascript:'):
+        response = session.get(urljoin(url, href), timeout=timeout)
+    else:
+        if postback:
+            fields['__EVENTTARGET'], fields['__EVENTARGUMENT'] = postback.groups()
+        elif control.name in ('input', 'button') and control.get('name'):
+            fields[control['name']] = control.get('value', '')
+        else:
+            fields['__EVENTTARGET'] = control.get('name', control_id)
+            fields['__EVENTARGUMENT'] = ''
+        response = session.post(action, data=fields, timeout=timeout)
+    response.raise_for_status()
+    return response.url, response.text
+
+def fetch_timesheet_http(id_number, url=SDMATACLICK_URL, session=None, timeouts=None):
+    # Same steps as the browser (enter ID, submit, open the timesheet) as plain form posts
+    import requests
+    from bs4 import BeautifulSoup
+    
+    if session is None:
+        with requests.Session() as session:
+            return fetch_timesheet_http(id_number, url, session, timeouts)
+    
+    timeouts = get_step_timeouts(timeouts)
+    metrics = StepMetrics('scrape_timesheet', backend='http', id_number=id_number)
+    session.headers.setdefault('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                                             '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
     
     try:
-        driver.get('https://www.sdmataclick.com/m/default.aspx')
+        with metrics.step('navigate'):
+            response = session.get(url, timeout=timeouts['navigate'])
+            response.raise_for_status()
         
-        # Wait for the ID input field to be present and enter the ID
-        id_input = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, 'txtIdNumber'))
-        )
-        id_input.send_keys(id_number)
+        with metrics.step('login'):
+            page_url, page_html = post_back(session, response.url, response.text, 'btnSubmit',
+                                            {'txtIdNumber': id_number}, timeouts['login'])
         
-        # Click the login button
-        login_button = driver.find_element(By.ID, 'btnSubmit')
-        login_button.click()
+        with metrics.step('name_render'):
+            name_element = BeautifulSoup(page_html, 'html.parser').find(id='Me')
+            if name_element is None or not name_element.get_text().strip():
+                raise ValueError("Login failed: user name not found on the response page")
+            name_parts = re.split(r'<br\s*/?>', name_element.decode_contents(), maxsplit=1)
+            name_text = BeautifulSoup(name_parts[0], 'html.parser').get_text().strip().split('\n')[0]
+            name_text = ' '.join(name_text.split())
         
-        # Wait for the Me span to be present AND contain non-whitespace text
-        def name_is_present(driver):
-            try:
-                element = driver.find_element(By.ID, 'Me')
-                # Try different methods to get the text
-                text = element.get_attribute('textContent') or element.text
-                return bool(text and text.strip())
-            except:
-                return False
+        with metrics.step('timesheet_render'):
+            page_url, page_html = post_back(session, page_url, page_html, 'btnTimesheet',
+                                            timeout=timeouts['timesheet_render'])
         
-        WebDriverWait(driver, 10).until(name_is_present)
+        with metrics.step('extract'):
+            table_element = BeautifulSoup(page_html, 'html.parser').find(id='mygrid')
+            if table_element is None:
+                raise ValueError("Timesheet table 'mygrid' not found on the response page")
+            table_html = str(table_element)
+    except Exception as e:
+        metrics.emit(get_error_status(e))
+        raise
+    
+    metrics.emit()
+    return table_html, name_text
 
-        name_element = driver.find_element(By.ID, 'Me')
-        name_html = name_element.get_attribute('innerHTML')
-        name_text = name_html.split('<br>')[0].strip() if '<br>' in name_html else name_element.text.split('\n')[0].strip()
-        name_text = ' '.join(name_text.split())
-        
-        # Navigate to the timesheet page
-        timesheet_link = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, 'btnTimesheet'))
-        )
-        timesheet_link.click()
-        
-        # Wait for the timesheet to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, 'mygrid'))
-        )
+# Resolves as soon as the element exists (and optionally has text / is clickable), using a
+# MutationObserver instead of polling, or resolves false when the timeout runs out
+WAIT_FOR_ELEMENT_SCRIPT = """
+const [elementId, needsText, needsClickable, timeoutMs, done] = arguments;
+function ready() {
+    const el = document.getElementById(elementId);
+    if (!el) return false;
+    if (needsText && !(el.textContent || '').trim()) return false;
+    if (needsClickable && (el.disabled || el.offsetParent === null)) return false;
+    return true;
+}
+if (ready()) { done(true); return; }
+const observer = new MutationObserver(() => {
+    if (ready()) { observer.disconnect(); clearTimeout(timer); done(true); }
+});
+observer.observe(document, {childList: true, subtree: true, characterData: true, attributes: true});
+const timer = setTimeout(() => { observer.disconnect(); done(false); }, timeoutMs);
+"""
+
+def wait_for_element(driver, element_id, timeout, needs_text=False, needs_clickable=False):
+    # A postback replaces the document while the observer is waiting, which aborts the script;
+    # in that case it is simply re-armed on the new page until the deadline
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutException(f"Timed out after {timeout}s waiting for '{element_id}'")
+        driver.set_script_timeout(remaining + 5)
+        try:
+            if driver.execute_async_script(WAIT_FOR_ELEMENT_SCRIPT, element_id, needs_text,
+                                           needs_clickable, int(remaining * 1000)):
+                return driver.find_element(By.ID, element_id)
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            time.sleep(0.05)
+
+def scrape_timesheet(driver, id_number, url=SDMATACLICK_URL, timeouts=None):
+    timeouts = get_step_timeouts(timeouts)
+    metrics = StepMetrics('scrape_timesheet', backend='selenium', id_number=id_number)
+    
+    try:
+        # Load the login page and wait for the ID input field
+        with metrics.step('navigate'):
+            driver.set_page_load_timeout(timeouts['navigate'])
+            driver.get(url)
+            id_input = wait_for_element(driver, 'txtIdNumber', timeouts['navigate'])
         
-        # Find and extract the table
-        table_element = driver.find_element(By.ID, 'mygrid')
-        table_html = table_element.get_attribute('outerHTML')
+        # Enter the ID and click the login button
+        with metrics.step('login'):
+            id_input.send_keys(id_number)
+            wait_for_element(driver, 'btnSubmit', timeouts['login'], needs_clickable=True).click()
         
-        if save_html:
-            with open(filename, 'w', encoding='utf-8') as file:
-                file.write(table_html)
+        # Wait for the Me span to be present AND contain non-whitespace text
+        with metrics.step('name_render'):
+            name_element = wait_for_element(driver, 'Me', timeouts['name_render'], needs_text=True)
+            name_html = name_element.get_attribute('innerHTML')
+            name_text = name_html.split('<br>')[0].strip() if '<br>' in name_html else name_element.text.split('\n')[0].strip()
+            name_text = ' '.join(name_text.split())
         
-        return table_html, name_text
+        # Navigate to the timesheet page and wait for the table
+        with metrics.step('timesheet_render'):
+            wait_for_element(driver, 'btnTimesheet', timeouts['timesheet_render'], needs_clickable=True).click()
+            table_element = wait_for_element(driver, 'mygrid', timeouts['timesheet_render'])
         
+        # Extract the table
+        with metrics.step('extract'):
+            driver.set_script_timeout(timeouts['extract'])
+            table_html = table_element.get_attribute('outerHTML')
     except Exception as e:
-        print(f"Error during web automation: {str(e)}")
-        return None, None
+        metrics.emit(get_error_status(e))
+        raise
+    
+    metrics.emit()
+    return table_html, name_text
+
+def fetch_timesheet_selenium(id_number, url=SDMATACLICK_URL, driver=None, timeouts=None):
+    # Use the given (pooled) driver as is, otherwise launch a browser just for this call
+    if driver is not None:
+        return scrape_timesheet(driver, id_number, url, timeouts)
+    
+    driver = configure_selenium_driver()
+    try:
+        return scrape_timesheet(driver, id_number, url, timeouts)
     finally:
         driver.quit()
+
+class DriverPool:
+    # Up to `size` warm headless Chrome instances shared between users. Browsers are only
+    # launched when first needed, and a released browser has its cookies and storage cleared
+    # so the next user starts logged out instead of paying for a relaunch.
+    def __init__(self, size=2):
+        self.size = size
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if len(self._drivers) < self.size:
+                    driver = configure_selenium_driver()
+                    self._drivers.append(driver)
+                    return driver
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def release(self, driver):
+        try:
+            driver.delete_all_cookies()
+            driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+            driver.get('about:blank')
+        except Exception:
+            # A browser that cannot be reset is replaced on the next acquire
+            self.discard(driver)
+            return
+        self._idle.put(driver)
+
+    def discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+def fetch_timesheet_pooled(pool, id_number, backend='auto', timeouts=None, session=None):
+    if backend in ('auto', 'http'):
+        try:
+            return fetch_timesheet_http(id_number, session=session, timeouts=timeouts)
+        except Exception as e:
+            print(f"Error during HTTP retrieval for {id_number}: {str(e)}")
+            if backend == 'http':
+                return None, None
+    
+    driver = pool.acquire()
+    try:
+        result = scrape_timesheet(driver, id_number, timeouts=timeouts)
+    except Exception as e:
+        print(f"Error during web automation for {id_number}: {str(e)}")
+        pool.discard(driver)
+        return None, None
+    pool.release(driver)
+    return result
+
+class RateLimiter:
+    # Spaces calls at least min_interval seconds apart across all threads
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_call_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_call_at - now
+            self._next_call_at = max(now, self._next_call_at) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+def batch_get_timesheets(id_numbers, pool_size=2, backend='auto', timeouts=None):
+    # Retrieve several users' timesheets concurrently, one worker per pooled browser
+    results = {}
+    with DriverPool(pool_size) as pool, ThreadPoolExecutor(max_workers=pool_size) as executor:
+        futures = {executor.submit(fetch_timesheet_pooled, pool, id_number, backend, timeouts): id_number for id_number in id_numbers}
+        for future, id_number in futures.items():
+            results[id_number] = future.result()
+    return results
+
+def login_and_get_timesheet(id_number, save_html=True, filename='timesheet.html', backend='auto', timeouts=None):
+    # backend: 'http' replays the form posts without a browser, 'selenium' drives headless
+    # Chrome, and 'auto' tries HTTP first and falls back to the browser if that fails
+    table_html, name_text = None, None
+    
+    if backend in ('auto', 'http'):
+        try:
+            table_html, name_text = fetch_timesheet_http(id_number, timeouts=timeouts)
+        except Exception as e:
+            print(f"Error during HTTP retrieval: {str(e)}")
+            if backend == 'auto':
+                print("Falling back to browser automation...")
+    
+    if table_html is None and backend in ('auto', 'selenium'):
+        try:
+            table_html, name_text = fetch_timesheet_selenium(id_number, timeouts=timeouts)
+        except Exception as e:
+            print(f"Error during web automation: {str(e)}")
+    
+    if table_html is None:
+        return None, None
+    
+    if save_html:
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(table_html)
+    
+    return table_html, name_text
         
-def parse_timesheet(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    rows = soup.find_all('tr')[1:]  # Skip header row
+TIMESHEET_COLUMNS = ['Date', 'FirstIn', 'LastOut', 'ClockIn', 'ClockOut', 'Hours']
+PARSER_BACKENDS = ['selectolax', 'lxml', 'bs4']
+
+def get_parser_backend(backend='auto'):
+    # 'auto' picks the fastest installed parser, falling back to BeautifulSoup's html.parser
+    if backend != 'auto':
+        return backend
+    for name in PARSER_BACKENDS[:-1]:
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return 'bs4'
+
+def iter_timesheet_cells(html_content, backend):
+    # Yield the stripped cell texts of every table row after the header row
+    if backend == 'selectolax':
+        from selectolax.lexbor import LexborHTMLParser
+        for row in LexborHTMLParser(html_content).css('tr')[1:]:
+            yield [col.text().strip() for col in row.css('td')]
+    elif backend == 'lxml':
+        from lxml import etree
+        # iterparse hands over each <tr> as soon as it is complete, and finished rows are
+        # dropped from the tree, so memory stays flat however long the table is
+        source = io.BytesIO(html_content.encode('utf-8'))
+        header = True
+        for _, row in etree.iterparse(source, events=('end',), tag='tr', html=True, encoding='utf-8'):
+            if header:
+                header = False
+            else:
+                yield [''.join(col.itertext()).strip() for col in row.iterchildren('td')]
+            row.clear(keep_tail=True)
+            while row.getprevious() is not None:
+                del row.getparent()[0]
+    elif backend == 'bs4':
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for row in soup.find_all('tr')[1:]:  # Skip header row
+            yield [col.text.strip() for col in row.find_all('td')]
+    else:
+        raise ValueError(f"Unknown parser backend '{backend}'")
 
-    data = []
-    for row in rows:
-        cols = row.find_all('td')
-        date = cols[0].text.strip()
-        first_in = cols[1].text.strip()
-        last_out = cols[2].text.strip()
-        ts_in = cols[3].text.strip()
-        ts_out = cols[4].text.strip()
-        total_hours = cols[5].text.strip()
+def iter_timesheet_rows(html_content, backend='auto'):
+    # Streaming mode: yields (Date, FirstIn, LastOut, ClockIn, ClockOut, Hours) tuples
+    for cols in iter_timesheet_cells(html_content, get_parser_backend(backend)):
+        date, first_in, last_out, ts_in, ts_out, total_hours = cols[:6]
         
         # Clean data
         first_in = first_in if first_in and first_in != '     ' else None
@@ -265,613 +1144,2993 @@ def parse_timesheet(html_content):
         ts_out = ts_out if ts_out != '00:00' else None
         total_hours = float(total_hours) if total_hours else 0.0
         
-        data.append({
-            'Date': date,
-            'FirstIn': first_in,
-            'LastOut': last_out,
-            'ClockIn': ts_in,
-            'ClockOut': ts_out,
-            'Hours': total_hours
-        })
+        yield date, first_in, last_out, ts_in, ts_out, total_hours
+
+def parse_timesheet(html_content, backend='auto'):
+    # Fill one list per column straight from the row stream instead of building a dict per row
+    import pandas as pd
+    
+    columns = [[] for _ in TIMESHEET_COLUMNS]
+    appenders = [column.append for column in columns]
+    for row in iter_timesheet_rows(html_content, backend):
+        for append, value in zip(appenders, row):
+            append(value)
 
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(dict(zip(TIMESHEET_COLUMNS, columns)))
     df['Date'] = pd.to_datetime(df['Date'])
+    df['Hours'] = df['Hours'].astype('float64')
     df = df.sort_values('Date', ascending=False)
     return df
 
-def format_hours_minutes(hours, sign=None):
-    if pd.isna(hours):
-        return ""
-    
-    total_minutes = int(round(hours * 60))
-    h, m = divmod(total_minutes, 60)
-    
-    prefix = ""
-    if sign is not None:
-        prefix = "+" if sign >= 0 else "-"
-    
-    if h == 0:
-        return f"{prefix}{m}min"
-    elif m == 0:
-        return f"{prefix}{h}h"
-    else:
-        return f"{prefix}{h}h {m:02d}min"
+# Compact columnar form of timesheet rows for long histories: int32 day numbers (days since
+# 1970-01-01), clock times as int16 minutes since midnight (-1 when empty) and the page's
+# two-decimal hours as int16 hundredths, so the round trip is exact
+CLOCK_COLUMNS = ['FirstIn', 'LastOut', 'ClockIn', 'ClockOut']
 
-def analyze_timesheet(df, daily_target=9, clockify_df=None):
-    results = {}
-    results['daily_target'] = daily_target
-    
-    # Filter out weekends (Saturday=5, Sunday=6) and days with 0 hours
-    df = df[(df['Date'].dt.dayofweek < 5) & (df['Hours'] > 0)]
-    
-    # Initialize Clockify columns if not provided
-    if clockify_df is None:
-        df['ClockifyHours'] = 0
-        df['ClockifyDescription'] = None
-        df['Project'] = None
-        df['Task'] = None
-    else:
-        # Merge with Clockify data if available
-        df = pd.merge(df, clockify_df, on='Date', how='left')
-        df['ClockifyHours'] = df['ClockifyHours'].fillna(0)
-    
-    daily = df.groupby('Date').agg({
-        'FirstIn': 'first',
-        'LastOut': 'last',
-        'Hours': 'sum',
-        'ClockifyHours': 'first',
-        'ClockifyDescription': 'first',
-        'Project': 'first',
-        'Task': 'first'
-    }).reset_index()
-
-    daily['DayOfWeek'] = daily['Date'].dt.day_name()
-    daily['OnTrack'] = daily['Hours'].apply(lambda x: "✅" if x >= daily_target else "❌")
-    daily['Difference'] = daily['Hours'] - daily_target
-    
-    daily['HoursFormatted'] = daily['Hours'].apply(format_hours_minutes)
-    daily['ClockifyHoursFormatted'] = daily['ClockifyHours'].apply(format_hours_minutes)
-    daily['DifferenceFormatted'] = daily['Difference'].apply(lambda x: format_hours_minutes(abs(x), sign=x))
-    
-    # Create tooltip content but don't store it in the dataframe
-    results['_clockify_tooltips'] = {
-        str(row['Date'].date()): create_clockify_tooltip(row['ClockifyDescription'], row['Project'], row['Task'])
-        for _, row in daily.iterrows() if pd.notna(row['ClockifyHours']) and row['ClockifyHours'] > 0
-    }
-    
-    results['daily'] = daily
+def to_day_numbers(dates):
+    return dates.to_numpy().astype('datetime64[D]').astype('int32')
 
-    if not daily.empty:
-        daily['Week'] = daily['Date'].dt.isocalendar().week
-        weekly = daily.groupby('Week').agg({
-            'Hours': 'sum',
-            'ClockifyHours': 'sum',
-            'Date': 'nunique',
-            'OnTrack': lambda x: (x == "✅").sum()
-        }).rename(columns={'Date': 'WorkDays', 'OnTrack': 'OnTargetDays'})
-        
-        weekly['TargetHours'] = weekly['WorkDays'] * daily_target
-        weekly['WeeklyDifference'] = weekly['Hours'] - weekly['TargetHours']
-        weekly['AvgDailyHours'] = weekly['Hours'] / weekly['WorkDays']
-        weekly['OnTargetPercentage'] = (weekly['OnTargetDays'] / weekly['WorkDays']) * 100
-        
-        weekly['HoursFormatted'] = weekly['Hours'].apply(format_hours_minutes)
-        weekly['ClockifyHoursFormatted'] = weekly['ClockifyHours'].apply(format_hours_minutes)
-        weekly['TargetHoursFormatted'] = weekly['TargetHours'].apply(format_hours_minutes)
-        weekly['WeeklyDifferenceFormatted'] = weekly['WeeklyDifference'].apply(lambda x: format_hours_minutes(abs(x), sign=x))
-        weekly['AvgDailyHoursFormatted'] = weekly['AvgDailyHours'].apply(format_hours_minutes)
-        
-        results['weekly'] = weekly
+def from_day_numbers(days):
+    import pandas as pd
     
-    return results
+    return pd.to_datetime(days.to_numpy().astype('datetime64[D]').astype('datetime64[ns]'))
 
-def create_clockify_tooltip(descriptions, projects, tasks):
-    if not isinstance(descriptions, list):
-        return ""
+def to_clock_minutes(times):
+    import pandas as pd
     
-    # Create a set of unique entries to avoid duplicates
-    unique_entries = set()
-    for desc, proj, task in zip(descriptions, projects, tasks):
-        entry = []
-        if desc:
-            entry.append(f"{desc}")
-        if proj and proj != "No project":
-            entry.append(f"Project: {proj}")
-        if task and task != "No task":
-            entry.append(f"Task: {task}")
-        if entry:
-            unique_entries.add("<li>" + "<br>".join(entry) + "</li>")
-    
-    if unique_entries:
-        return "<ul>" + "".join(unique_entries) + "</ul>"
-    return "No details available"
-
-
-def generate_html_report(results, user_name=None):
-    title = "WORK TIMESHEET ANALYSIS"
-    if user_name:
-        title = f"{user_name.upper()}'S TIMESHEET ANALYSIS"
-    
-    daily_target = results['daily_target']
-    current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    parts = times.astype('str').str.extract(r'^\s*(\d{1,2}):(\d{2})')
+    minutes = pd.to_numeric(parts[0]) * 60 + pd.to_numeric(parts[1])
+    return minutes.fillna(-1).to_numpy(dtype='int16')
 
-    daily_chart_data = {
-        'labels': results['daily']['Date'].dt.strftime('%Y-%m-%d').tolist(),
-        'hours': results['daily']['Hours'].tolist(),
-        'clockify_hours': results['daily']['ClockifyHours'].tolist(),
-        'differences': results['daily']['Difference'].tolist(),
-        'target': [daily_target] * len(results['daily'])
-    }
+def from_clock_minutes(minutes):
+    import pandas as pd
     
-    weekly_chart_data = {
-        'labels': [f"Week {week}" for week in results['weekly'].index.tolist()],
-        'hours': results['weekly']['Hours'].tolist(),
-        'clockify_hours': results['weekly']['ClockifyHours'].tolist(),
-        'targets': results['weekly']['TargetHours'].tolist(),
-        'diffs': results['weekly']['WeeklyDifference'].tolist()
-    }
+    minutes = pd.Series(minutes)
+    text = ((minutes // 60).astype('str').str.zfill(2) + ':' + (minutes % 60).astype('str').str.zfill(2))
+    return text.astype(object).where(minutes >= 0, None)
 
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Work Timesheet Analysis</title>
-        <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 1200px;
-                margin: 0 auto;
-                padding: 20px;
-            }}
-            h1, h2 {{
-                color: #2c3e50;
-            }}
-            h1 {{
-                border-bottom: 2px solid #3498db;
-                padding-bottom: 10px;
-            }}
-            h2 {{
-                border-bottom: 1px solid #eee;
-                padding-bottom: 5px;
-                margin-top: 30px;
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin: 20px 0;
-            }}
-            th, td {{
-                padding: 10px;
-                text-align: left;
-                border-bottom: 1px solid #ddd;
-            }}
-            th {{
-                background-color: #f2f2f2;
-                font-weight: bold;
-            }}
-            tr:hover {{
-                background-color: #f5f5f5;
-            }}
-            .positive {{
-                color: green;
-                font-weight: bold;
-            }}
-            .negative {{
-                color: red;
-                font-weight: bold;
-            }}
-            .chart-container {{
-                display: flex;
-                flex-wrap: wrap;
-                gap: 20px;
-                margin: 30px 0;
-            }}
-            .chart {{
-                flex: 1;
-                min-width: 400px;
-                height: 400px;
-                background: white;
-                border-radius: 8px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                padding: 15px;
-            }}
-            .footer {{
-                margin-top: 30px;
-                font-size: 0.8em;
-                color: #777;
-                text-align: center;
-            }}
-            .note {{
-                font-style: italic;
-                color: #666;
-                margin: 10px 0;
-            }}
-            .hours-cell {{
-                font-family: monospace;
-            }}
-            .tooltip {{
-                position: relative;
-                display: inline-block;
-                cursor: pointer;
-            }}
-            .tooltip .tooltiptext {{
-                visibility: hidden;
-                width: 300px;
-                background-color: #555;
-                color: #fff;
-                text-align: left;
-                border-radius: 6px;
-                padding: 10px;
-                position: absolute;
-                z-index: 1;
-                bottom: 125%;
-                left: 50%;
-                margin-left: -150px;
-                opacity: 0;
-                transition: opacity 0.3s;
-            }}
-            .tooltip .tooltiptext::after {{
-                content: "";
-                position: absolute;
-                top: 100%;
-                left: 50%;
-                margin-left: -5px;
-                border-width: 5px;
-                border-style: solid;
-                border-color: #555 transparent transparent transparent;
-            }}
-            .tooltip:hover .tooltiptext {{
-                visibility: visible;
-                opacity: 1;
-            }}
-            .tooltip-content ul {{
-                margin: 0;
-                padding-left: 20px;
-            }}
-            .tooltip-content li {{
-                margin-bottom: 8px;
-            }}
-        </style>
-    </head>
-    <body>
-        <h1>{title}</h1>
-        <p><strong>Generated on:</strong> {current_date}</p>
-        <p><strong>Daily Target:</strong> {format_hours_minutes(daily_target)} (Weekdays Only)</p>
-        <p class="note">Note: Days with 0 hours worked are excluded from analysis</p>
-    """
-    if not results['daily'].empty:
-        html += """
-        <h2>DAILY SUMMARY</h2>
-        <div class="chart-container">
-            <div class="chart">
-                <canvas id="dailyChart"></canvas>
-            </div>
-            <div class="chart">
-                <canvas id="dailyDiffChart"></canvas>
-            </div>
-        </div>
-        """
-        
-        daily_df = results['daily'][['Date', 'DayOfWeek', 'FirstIn', 'LastOut', 'HoursFormatted', 'ClockifyHoursFormatted', 'DifferenceFormatted']]
-        daily_df = daily_df.rename(columns={
-            'DayOfWeek': 'Day of Week',
-            'FirstIn': 'Arrival Time',
-            'LastOut': 'Leaving Time',
-            'HoursFormatted': 'Hours Clocked In',
-            'ClockifyHoursFormatted': 'Clockify Hours',
-            'DifferenceFormatted': 'Difference'
-        })
-        
-        # Format Clockify Hours with tooltip from the results dict
-        daily_df['Clockify Hours'] = daily_df.apply(
-            lambda row: f'<div class="tooltip">{row["Clockify Hours"]}<span class="tooltiptext tooltip-content">{results["_clockify_tooltips"].get(str(row["Date"].date()), "")}</span></div>' 
-            if str(row["Date"].date()) in results["_clockify_tooltips"] else row["Clockify Hours"], axis=1)
-        
-        daily_df['Date'] = daily_df['Date'].dt.strftime('%Y-%m-%d')
-        daily_df['Difference'] = daily_df['Difference'].apply(lambda x: f'<span class="{"positive" if x.startswith("+") else "negative"}">{x}</span>')
-        # Sort by date descending (most recent first)
-        daily_df = daily_df.sort_values('Date', ascending=False)
-        html += daily_df.to_html(index=False, escape=False, classes='dataframe')
-        
-        html += f"""
-        <script>
-            // Daily Hours Chart
-            const dailyCtx = document.getElementById('dailyChart').getContext('2d');
-            new Chart(dailyCtx, {{
-                type: 'bar',
-                data: {{
-                    labels: {daily_chart_data['labels']},
-                    datasets: [
-                        {{
-                            label: 'Hours Clocked In',
-                            data: {daily_chart_data['hours']},
-                            backgroundColor: 'rgba(54, 162, 235, 0.7)',
-                            borderColor: 'rgba(54, 162, 235, 1)',
-                            borderWidth: 1
-                        }},
-                        {{
-                            label: 'Clockify Hours',
-                            data: {daily_chart_data['clockify_hours']},
-                            backgroundColor: 'rgba(153, 102, 255, 0.7)',
-                            borderColor: 'rgba(153, 102, 255, 1)',
-                            borderWidth: 1
-                        }},
-                        {{
-                            label: 'Daily Target',
-                            data: {daily_chart_data['target']},
-                            type: 'line',
-                            borderColor: 'rgba(255, 99, 132, 1)',
-                            borderWidth: 2,
-                            fill: false,
-                            pointRadius: 0
-                        }}
-                    ]
-                }},
-                options: {{
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    scales: {{
-                        y: {{
-                            beginAtZero: true,
-                            title: {{
-                                display: true,
-                                text: 'Hours'
-                            }}
-                        }}
-                    }},
-                    plugins: {{
-                        title: {{
-                            display: true,
-                            text: 'Daily Hours vs Target'
-                        }},
-                        tooltip: {{
-                            callbacks: {{
-                                label: function(context) {{
-                                    return context.dataset.label + ': ' + context.parsed.y.toFixed(2) + ' hours';
-                                }}
-                            }}
-                        }}
-                    }}
-                }}
-            }});
-
-            // Daily Difference Chart
-            const dailyDiffCtx = document.getElementById('dailyDiffChart').getContext('2d');
-            new Chart(dailyDiffCtx, {{
-                type: 'bar',
-                data: {{
-                    labels: {daily_chart_data['labels']},
-                    datasets: [{{
-                        label: 'Difference from Target',
-                        data: {daily_chart_data['differences']},
-                        backgroundColor: function(context) {{
-                            const value = context.raw;
-                            return value >= 0 ? 'rgba(75, 192, 192, 0.7)' : 'rgba(255, 99, 132, 0.7)';
-                        }},
-                        borderColor: function(context) {{
-                            const value = context.raw;
-                            return value >= 0 ? 'rgba(75, 192, 192, 1)' : 'rgba(255, 99, 132, 1)';
-                        }},
-                        borderWidth: 1
-                    }}]
-                }},
-                options: {{
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    scales: {{
-                        y: {{
-                            beginAtZero: false,
-                            title: {{
-                                display: true,
-                                text: 'Hours Difference'
-                            }}
-                        }}
-                    }},
-                    plugins: {{
-                        title: {{
-                            display: true,
-                            text: 'Daily Difference from Target'
-                        }},
-                        tooltip: {{
-                            callbacks: {{
-                                label: function(context) {{
-                                    return context.dataset.label + ': ' + context.parsed.y.toFixed(2) + ' hours';
-                                }}
-                            }}
-                        }}
-                    }}
-                }}
-            }});
-        </script>
-        """
-    else:
-        html += "<p>No workday data found in the timesheet</p>"
-    
-    if 'weekly' in results and not results['weekly'].empty:
-        html += """
-        <h2>WEEKLY SUMMARY</h2>
-        <div class="chart-container">
-            <div class="chart">
-                <canvas id="weeklyChart"></canvas>
-            </div>
-            <div class="chart">
-                <canvas id="weeklyDiffChart"></canvas>
-            </div>
-        </div>
-        """
-        
-        weekly_df = results['weekly'][['WorkDays', 'OnTargetDays', 'OnTargetPercentage', 'TargetHoursFormatted', 'HoursFormatted', 
-                                    'ClockifyHoursFormatted', 'AvgDailyHoursFormatted', 'WeeklyDifferenceFormatted']]
-        weekly_df = weekly_df.rename(columns={
-            'WorkDays': 'Days',
-            'OnTargetDays': 'Met Target',
-            'HoursFormatted': 'Hours Clocked In',
-            'ClockifyHoursFormatted': 'Clockify Hours',
-            'TargetHoursFormatted': 'Target',
-            'WeeklyDifferenceFormatted': 'Difference',
-            'AvgDailyHoursFormatted': 'Avg/Day',
-            'OnTargetPercentage': '% On Target'
-        })
-        weekly_df['Difference'] = weekly_df['Difference'].apply(lambda x: f'<span class="{"positive" if x.startswith("+") else "negative"}">{x}</span>')
-        weekly_df['% On Target'] = weekly_df['% On Target'].apply(lambda x: f"{x:.1f}%")
-        # Sort by week descending (most recent first)
-        weekly_df = weekly_df.sort_index(ascending=False)
-        html += weekly_df.to_html(escape=False)
-        
-        html += f"""
-        <script>
-            // Weekly Hours Chart
-            const weeklyCtx = document.getElementById('weeklyChart').getContext('2d');
-            new Chart(weeklyCtx, {{
-                type: 'bar',
-                data: {{
-                    labels: {weekly_chart_data['labels']},
-                    datasets: [
-                        {{
-                            label: 'Hours Clocked In',
-                            data: {weekly_chart_data['hours']},
-                            backgroundColor: 'rgba(54, 162, 235, 0.7)',
-                            borderColor: 'rgba(54, 162, 235, 1)',
-                            borderWidth: 1
-                        }},
-                        {{
-                            label: 'Clockify Hours',
-                            data: {weekly_chart_data['clockify_hours']},
-                            backgroundColor: 'rgba(153, 102, 255, 0.7)',
-                            borderColor: 'rgba(153, 102, 255, 1)',
-                            borderWidth: 1
-                        }},
-                        {{
-                            label: 'Weekly Target',
-                            data: {weekly_chart_data['targets']},
-                            backgroundColor: 'rgba(255, 99, 132, 0.7)',
-                            borderColor: 'rgba(255, 99, 132, 1)',
-                            borderWidth: 1
-                        }}
-                    ]
-                }},
-                options: {{
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    scales: {{
-                        y: {{
-                            beginAtZero: true,
-                            title: {{
-                                display: true,
-                                text: 'Hours'
-                            }}
-                        }}
-                    }},
-                    plugins: {{
-                        title: {{
-                            display: true,
-                            text: 'Weekly Hours vs Target'
-                        }},
-                        tooltip: {{
-                            callbacks: {{
-                                label: function(context) {{
-                                    return context.dataset.label + ': ' + context.parsed.y.toFixed(2) + ' hours';
-                                }}
-                            }}
-                        }}
-                    }}
-                }}
-            }});
-
-            // Weekly Difference Chart
-            const weeklyDiffCtx = document.getElementById('weeklyDiffChart').getContext('2d');
-            new Chart(weeklyDiffCtx, {{
-                type: 'bar',
-                data: {{
-                    labels: {weekly_chart_data['labels']},
-                    datasets: [{{
-                        label: 'Difference from Target',
-                        data: {weekly_chart_data['diffs']},
-                        backgroundColor: function(context) {{
-                            const value = context.raw;
-                            return value >= 0 ? 'rgba(75, 192, 192, 0.7)' : 'rgba(255, 99, 132, 0.7)';
-                        }},
-                        borderColor: function(context) {{
-                            const value = context.raw;
-                            return value >= 0 ? 'rgba(75, 192, 192, 1)' : 'rgba(255, 99, 132, 1)';
-                        }},
-                        borderWidth: 1
-                    }}]
-                }},
-                options: {{
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    scales: {{
-                        y: {{
-                            beginAtZero: false,
-                            title: {{
-                                display: true,
-                                text: 'Hours Difference'
-                            }}
-                        }}
-                    }},
-                    plugins: {{
-                        title: {{
-                            display: true,
-                            text: 'Weekly Difference from Target'
-                        }},
-                        tooltip: {{
-                            callbacks: {{
-                                label: function(context) {{
-                                    return context.dataset.label + ': ' + context.parsed.y.toFixed(2) + ' hours';
-                                }}
-                            }}
-                        }}
-                    }}
-                }}
-            }});
-        </script>
-        """
-        
-    html += f"""
-    <div class="footer">
-        Report generated on {current_date} | Written and designed by Lee Kaplan (and ChatGPT) | V1.3
-    </div>
-    </body>
-    </html>
-    """
+def compact_timesheet(df):
+    # parse_timesheet/load_timesheet frame (optionally with an IdNumber column) to compact form
+    import numpy as np
+    import pandas as pd
     
-    return html
+    # A RangeIndex instead of the source index, which would cost 8 bytes per row
+    compact = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    if 'IdNumber' in df.columns:
+        compact['IdNumber'] = pd.Categorical(df['IdNumber'])
+    compact['Day'] = to_day_numbers(df['Date'])
+    for column in CLOCK_COLUMNS:
+        compact[column] = to_clock_minutes(df[column])
+    compact['CentiHours'] = np.round(df['Hours'].astype('float64').fillna(0).to_numpy() * 100).astype('int16')
+    return compact
 
-def main():
-    daily_target_hours = 9
-    report_filename = 'timesheet_report.html'
-    report_path = os.path.abspath(report_filename)          
-    config = get_config_values()
+def expand_timesheet(compact):
+    # Back to the parse_timesheet columns that analyze_timesheet works on
+    import pandas as pd
     
+    df = pd.DataFrame(index=compact.index)
+    if 'IdNumber' in compact.columns:
+        df['IdNumber'] = compact['IdNumber'].astype('str')
+    df['Date'] = from_day_numbers(compact['Day']).to_numpy()
+    for column in CLOCK_COLUMNS:
+        df[column] = from_clock_minutes(compact[column]).to_numpy()
+    df['Hours'] = compact['CentiHours'].to_numpy() / 100
+    return df
+
+def compact_clockify_entries(df):
+    # Clockify entries (load_team_clockify_entries columns) with day numbers, float32 hours and
+    # the repetitive text columns as categoricals
+    compact = df.drop(columns=['Date']).assign(
+        Day=to_day_numbers(df['Date']),
+        ClockifyHours=df['ClockifyHours'].astype('float32')
+    )
+    for column in ('IdNumber', 'ClockifyDescription', 'Project', 'Task'):
+        if column in compact.columns:
+            compact[column] = compact[column].astype('category')
+    return compact
+
+def expand_clockify_entries(compact):
+    df = compact.drop(columns=['Day']).assign(
+        Date=from_day_numbers(compact['Day']),
+        ClockifyHours=compact['ClockifyHours'].astype('float64')
+    )
+    for column in ('IdNumber', 'ClockifyDescription', 'Project', 'Task'):
+        if column in df.columns:
+            df[column] = df[column].astype(object).where(df[column].notna(), None)
+    return df
+
+STORE_FILE = 'timesheet_store.db'
+DEFAULT_RECHECK_DAYS = 7  # Days before the high-water mark that are re-fetched to pick up edits
+
+def open_store(path=STORE_FILE):
+    conn = sqlite3.connect(path)
+    has_punches = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'timesheet_punches'").fetchone()
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS timesheet_days (
+            id_number TEXT NOT NULL,
+            date TEXT NOT NULL,
+            first_in TEXT,
+            last_out TEXT,
+            clock_in TEXT,
+            clock_out TEXT,
+            hours REAL NOT NULL,
+            PRIMARY KEY (id_number, date)
+        );
+        CREATE TABLE IF NOT EXISTS timesheet_punches (
+            id_number TEXT NOT NULL,
+            date TEXT NOT NULL,
+            clock_in TEXT NOT NULL,
+            clock_out TEXT NOT NULL,
+            PRIMARY KEY (id_number, date, clock_in)
+        );
+        CREATE TABLE IF NOT EXISTS clockify_entries (
+            id_number TEXT NOT NULL,
+            entry_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            hours REAL NOT NULL,
+            description TEXT,
+            project TEXT,
+            task TEXT,
+            start_seconds INTEGER,
+            PRIMARY KEY (id_number, entry_id)
+        );
+        CREATE INDEX IF NOT EXISTS clockify_entries_date ON clockify_entries (id_number, date);
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id_number TEXT NOT NULL,
+            source TEXT NOT NULL,
+            high_water TEXT,
+            synced_at REAL,
+            PRIMARY KEY (id_number, source)
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            id_number TEXT PRIMARY KEY,
+            name TEXT
+        );
+        CREATE TABLE IF NOT EXISTS clockify_backfill (
+            id_number TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            fetched_at REAL,
+            PRIMARY KEY (id_number, start_date, end_date)
+        );
+        CREATE TABLE IF NOT EXISTS store_changes (
+            id_number TEXT NOT NULL,
+            since TEXT NOT NULL,
+            revision INTEGER NOT NULL,
+            PRIMARY KEY (id_number, since)
+        );
+    """)
+    # Stores from before interval data: Clockify start times are filled in as entries are fetched
+    # again, and every stored day's punch pair seeds timesheet_punches
+    if 'start_seconds' not in {row[1] for row in conn.execute("PRAGMA table_info(clockify_entries)")}:
+        with conn:
+            conn.execute("ALTER TABLE clockify_entries ADD COLUMN start_seconds INTEGER")
+    if not has_punches:
+        with conn:
+            conn.execute("""
+                INSERT OR IGNORE INTO timesheet_punches (id_number, date, clock_in, clock_out)
+                SELECT id_number, date,
+                       CASE WHEN clock_in IS NOT NULL AND clock_out IS NOT NULL THEN clock_in ELSE first_in END,
+                       CASE WHEN clock_in IS NOT NULL AND clock_out IS NOT NULL THEN clock_out ELSE last_out END
+                FROM timesheet_days
+                WHERE (clock_in IS NOT NULL AND clock_out IS NOT NULL) OR (first_in IS NOT NULL AND last_out IS NOT NULL)
+            """)
+    return conn
+
+def get_high_water(conn, id_number, source):
+    row = conn.execute(
+        "SELECT high_water FROM sync_state WHERE id_number = ? AND source = ?", (id_number, source)
+    ).fetchone()
+    return datetime.strptime(row[0], '%Y-%m-%d') if row and row[0] else None
+
+def set_high_water(conn, id_number, source, high_water):
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_state (id_number, source, high_water, synced_at) VALUES (?, ?, ?, ?)",
+        (id_number, source, high_water.strftime('%Y-%m-%d'), time.time())
+    )
+
+def record_store_change(conn, id_number, since):
+    # Called in the transaction of every write to a user's days, with the earliest day written,
+    # so totals kept between syncs can tell which days to re-read (see update_period_balances).
+    # Revisions count up across the whole store; one row per start day keeps the table small.
+    conn.execute(
+        "INSERT OR REPLACE INTO store_changes (id_number, since, revision) "
+        "SELECT ?, ?, COALESCE(MAX(revision), 0) + 1 FROM store_changes",
+        (id_number, since)
+    )
+
+def get_store_changes(conn, id_number, revision=0):
+    # The user's latest revision, and the earliest day written after `revision` (None if nothing was)
+    latest, since = conn.execute(
+        "SELECT MAX(revision), MIN(since) FROM store_changes WHERE id_number = ? AND revision > ?",
+        (id_number, revision)
+    ).fetchone()
+    return latest or revision, since
+
+def get_recheck_start(conn, id_number, source, recheck_days=DEFAULT_RECHECK_DAYS):
+    high_water = get_high_water(conn, id_number, source)
+    if high_water is None:
+        return None
+    return high_water - timedelta(days=recheck_days)
+
+def save_user_name(conn, id_number, name):
+    if name:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO users (id_number, name) VALUES (?, ?)", (id_number, name))
+
+def load_user_name(conn, id_number):
+    row = conn.execute("SELECT name FROM users WHERE id_number = ?", (id_number,)).fetchone()
+    return row[0] if row else None
+
+def get_punch(first_in, last_out, clock_in, clock_out):
+    # A row's badge interval: its In/Out pair, or First In/Last Out when the pair is incomplete.
+    # Missing times are None or NaN depending on the frame the row came from.
+    if isinstance(clock_in, str) and isinstance(clock_out, str):
+        return clock_in, clock_out
+    if isinstance(first_in, str) and isinstance(last_out, str):
+        return first_in, last_out
+    return None
+
+def get_clock_minutes(text):
+    match = re.match(r'\s*(\d{1,2}):(\d{2})', text) if isinstance(text, str) else None
+    return int(match[1]) * 60 + int(match[2]) if match else None
+
+def group_rows_by_day(page_rows):
+    days = {}
+    for row in page_rows:
+        days.setdefault(row[1], []).append(row)
+    return days
+
+def get_timesheet_day(day_rows):
+    # (first_in, last_out, clock_in, clock_out, hours) of one day's page rows: the hours added up
+    # as analyze_timesheet does, with the earliest In and the latest Out whatever the row order
+    def pick(column, latest):
+        times = [(get_clock_minutes(row[column]), row[column]) for row in day_rows]
+        times = [time for time in times if time[0] is not None]
+        if not times:
+            return None
+        return (max if latest else min)(times)[1]
+    
+    hours = sum(row[6] for row in day_rows if isinstance(row[6], (int, float)) and not math.isnan(row[6]))
+    return pick(2, False), pick(3, True), pick(4, False), pick(5, True), hours
+
+def store_timesheet(conn, id_number, df, recheck_days=DEFAULT_RECHECK_DAYS):
+    # Merge parsed rows newer than the high-water mark (minus the re-check window) into the store.
+    # The portal page only shows recent days, so older stored rows are left untouched.
+    if df.empty:
+        return 0
+    since = get_recheck_start(conn, id_number, 'timesheet', recheck_days)
+    if since is not None:
+        df = df[df['Date'] >= since]
+    page_rows = [
+        (id_number, row.Date.strftime('%Y-%m-%d'), row.FirstIn, row.LastOut, row.ClockIn, row.ClockOut, row.Hours)
+        for row in df.itertuples(index=False)
+    ]
+    # The page has a row per In/Out pair, so a day can span several rows. Rows are keyed like
+    # timesheet_punches, and timesheet_days gets the totals of the same rows (see get_timesheet_day),
+    # so a day always adds up its stored punches: a pair listed twice is one punch and counts once.
+    punch_rows = {}
+    for row in page_rows:
+        punch = get_punch(*row[2:6])
+        punch_rows[(row[1], punch[0]) if punch else row] = punch, row
+    rows = [(id_number, day, *get_timesheet_day(day_rows))
+            for day, day_rows in group_rows_by_day(row for _, row in punch_rows.values()).items()]
+    punches = [(id_number, row[1], *punch) for punch, row in punch_rows.values() if punch]
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO timesheet_days (id_number, date, first_in, last_out, clock_in, clock_out, hours) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.executemany("DELETE FROM timesheet_punches WHERE id_number = ? AND date = ?",
+                         sorted({row[:2] for row in rows}))
+        conn.executemany(
+            "INSERT OR REPLACE INTO timesheet_punches (id_number, date, clock_in, clock_out) VALUES (?, ?, ?, ?)",
+            punches
+        )
+        if rows:
+            set_high_water(conn, id_number, 'timesheet', datetime.strptime(max(row[1] for row in rows), '%Y-%m-%d'))
+            record_store_change(conn, id_number, min(row[1] for row in rows))
+    return len(rows)
+
+def load_timesheet(conn, id_number):
+    import pandas as pd
+    
+    df = pd.read_sql_query(
+        "SELECT date AS Date, first_in AS FirstIn, last_out AS LastOut, clock_in AS ClockIn, "
+        "clock_out AS ClockOut, hours AS Hours FROM timesheet_days WHERE id_number = ?",
+        conn, params=(id_number,)
+    )
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df.sort_values('Date', ascending=False)
+    return df
+
+TEAM_LOAD_CHUNK_SIZE = 50000
+
+def load_team_timesheets(conn, id_numbers=None, compact=False):
+    # All stored timesheet rows in long format (one row per user and day) in a single query.
+    # With compact=True the rows are converted chunk by chunk (see compact_timesheet), so the
+    # string columns of the whole history are never in memory at once.
+    import pandas as pd
+    
+    query = ("SELECT id_number AS IdNumber, date AS Date, first_in AS FirstIn, last_out AS LastOut, "
+             "clock_in AS ClockIn, clock_out AS ClockOut, hours AS Hours FROM timesheet_days")
+    params = ()
+    if id_numbers:
+        query += f" WHERE id_number IN ({', '.join('?' * len(id_numbers))})"
+        params = tuple(id_numbers)
+    if not compact:
+        df = pd.read_sql_query(query, conn, params=params)
+        df['Date'] = pd.to_datetime(df['Date'])
+        return df
+    
+    chunks = []
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=TEAM_LOAD_CHUNK_SIZE):
+        chunk['Date'] = pd.to_datetime(chunk['Date'])
+        chunks.append(compact_timesheet(chunk))
+    if not chunks:
+        chunk = pd.read_sql_query(query + " LIMIT 0", conn, params=params)
+        chunk['Date'] = pd.to_datetime(chunk['Date'])
+        chunks.append(compact_timesheet(chunk))
+    df = pd.concat(chunks, ignore_index=True)
+    df['IdNumber'] = df['IdNumber'].astype('category')
+    return df
+
+def load_team_clockify_hours(conn, id_numbers=None):
+    # Clockify hours per user and day, summed in SQLite
+    import pandas as pd
+    
+    query = "SELECT id_number AS IdNumber, date AS Date, SUM(hours) AS ClockifyHours FROM clockify_entries"
+    params = ()
+    if id_numbers:
+        query += f" WHERE id_number IN ({', '.join('?' * len(id_numbers))})"
+        params = tuple(id_numbers)
+    df = pd.read_sql_query(query + " GROUP BY id_number, date", conn, params=params)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def load_team_clockify_entries(conn, id_numbers=None):
+    # Every stored Clockify entry in long format, as compact columns (see compact_clockify_entries)
+    import pandas as pd
+    
+    query = ("SELECT id_number AS IdNumber, entry_id AS EntryId, date AS Date, hours AS ClockifyHours, "
+             "description AS ClockifyDescription, project AS Project, task AS Task FROM clockify_entries")
+    params = ()
+    if id_numbers:
+        query += f" WHERE id_number IN ({', '.join('?' * len(id_numbers))})"
+        params = tuple(id_numbers)
+    df = pd.read_sql_query(query + " ORDER BY id_number, date, rowid", conn, params=params)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return compact_clockify_entries(df)
+
+def load_team_intervals(conn, id_numbers=None):
+    # Badge punches and timed Clockify entries as [Start, End) intervals in local wall-clock seconds
+    # since 1970-01-01, one frame each with IdNumber, Start and End. Clockify entries stored before
+    # start times were recorded have none and are left out.
+    import numpy as np
+    import pandas as pd
+    
+    where, params = "", ()
+    if id_numbers:
+        where = f" AND id_number IN ({', '.join('?' * len(id_numbers))})"
+        params = tuple(id_numbers)
+    
+    punches = pd.read_sql_query(
+        "SELECT id_number AS IdNumber, date AS Date, clock_in AS ClockIn, clock_out AS ClockOut "
+        "FROM timesheet_punches WHERE 1 = 1" + where, conn, params=params
+    )
+    midnight = to_day_numbers(pd.to_datetime(punches['Date'])).astype(np.int64) * 86400
+    clock_in = to_clock_minutes(punches['ClockIn']).astype(np.int64) * 60
+    clock_out = to_clock_minutes(punches['ClockOut']).astype(np.int64) * 60
+    valid = (clock_in >= 0) & (clock_out >= 0)
+    # A punch out before the punch in is past midnight
+    clock_out = np.where(clock_out < clock_in, clock_out + 86400, clock_out)
+    punches = pd.DataFrame({'IdNumber': punches['IdNumber'], 'Start': midnight + clock_in,
+                            'End': midnight + clock_out})[valid].reset_index(drop=True)
+    
+    entries = pd.read_sql_query(
+        "SELECT id_number AS IdNumber, entry_id AS EntryId, start_seconds AS Start, hours AS ClockifyHours, "
+        "description AS ClockifyDescription, project AS Project FROM clockify_entries "
+        "WHERE start_seconds IS NOT NULL" + where, conn, params=params
+    )
+    entries['Start'] = entries['Start'].astype(np.int64)
+    entries['End'] = entries['Start'] + np.round(entries['ClockifyHours'].to_numpy() * 3600).astype(np.int64)
+    return punches, entries
+
+def store_clockify_entries(conn, id_number, data, start_date, end_date, high_water=True):
+    # Entries inside the fetched window replace whatever was stored for it, so entries
+    # deleted in Clockify since the last run disappear as well. Windows fetched out of order
+    # (backfill chunks) leave the high-water mark alone.
+    rows = (
+        (id_number, row['EntryId'], row['Date'].strftime('%Y-%m-%d'), row['ClockifyHours'],
+         row['ClockifyDescription'], row['Project'], row['Task'], row.get('Start'))
+        for row in data
+    )
+    with conn:
+        conn.execute(
+            "DELETE FROM clockify_entries WHERE id_number = ? AND date BETWEEN ? AND ?",
+            (id_number, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO clockify_entries (id_number, entry_id, date, hours, description, project, task, "
+            "start_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        record_store_change(conn, id_number, start_date.strftime('%Y-%m-%d'))
+        if high_water:
+            set_high_water(conn, id_number, 'clockify', end_date)
+
+def load_clockify_entries(conn, id_number):
+    # Read straight from the cursor into ClockifyEntries, without a list of every row first
+    rows = conn.execute(
+        "SELECT entry_id, date, hours, description, project, task, start_seconds FROM clockify_entries "
+        "WHERE id_number = ? ORDER BY date, rowid",
+        (id_number,)
+    )
+    entries = ClockifyEntries()
+    for entry_id, date, hours, description, project, task, start in rows:
+        entries.add(entry_id, datetime.fromisoformat(date).date(), hours, description, project, task, start)
+    return entries
+
+HISTORY_TIMESHEET_TABLE = 'timesheet_days'
+HISTORY_CLOCKIFY_TABLE = 'clockify_entries'
+
+def get_history_path(history_dir, table, id_number):
+    # One file per table and user (history/timesheet_days/id_number=123/timesheet_days.parquet),
+    # so a fetch only rewrites that user's files
+    return os.path.join(history_dir, table, f"id_number={id_number}", f"{table}.parquet")
+
+def write_parquet_atomic(df, path):
+    # Write next to the target and swap it in, so readers never see a half-written file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    try:
+        df.to_parquet(temp_path, index=False, compression='zstd')
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def save_history(conn, history_dir, id_numbers=None):
+    # Columnar copy of the store in compact form (see compact_timesheet), as zstd-compressed
+    # Parquet files that keep the int16/int32/float32 and dictionary-encoded columns. Only the
+    # users in id_numbers are rewritten, or everyone in the store without it.
+    if importlib.util.find_spec('pyarrow') is None:
+        print("Warning: Saving the history as Parquet needs pyarrow (pip install pyarrow), continuing without saving")
+        return False
+    if not id_numbers:
+        id_numbers = [row[0] for row in conn.execute(
+            "SELECT DISTINCT id_number FROM timesheet_days ORDER BY id_number")]
+    for id_number in id_numbers:
+        write_parquet_atomic(load_team_timesheets(conn, [id_number], compact=True),
+                             get_history_path(history_dir, HISTORY_TIMESHEET_TABLE, id_number))
+        write_parquet_atomic(load_team_clockify_entries(conn, [id_number]),
+                             get_history_path(history_dir, HISTORY_CLOCKIFY_TABLE, id_number))
+    return True
+
+def load_history(history_dir, id_number=None):
+    # Compact timesheet and Clockify frames from save_history, for one user or everyone saved
+    import glob
+    import pandas as pd
+    
+    def read_table(table):
+        if id_number:
+            paths = [get_history_path(history_dir, table, id_number)]
+        else:
+            paths = sorted(glob.glob(get_history_path(history_dir, table, '*')))
+        frames = [pd.read_parquet(path) for path in paths if os.path.exists(path)]
+        if not frames:
+            return None
+        # The per-user IdNumber categories differ, so they are merged as text
+        return frames[0] if len(frames) == 1 else pd.concat(
+            [frame.astype({'IdNumber': 'str'}) for frame in frames], ignore_index=True).astype({'IdNumber': 'category'})
+    
+    timesheet = read_table(HISTORY_TIMESHEET_TABLE)
+    if timesheet is None:
+        raise FileNotFoundError(f"No saved history in {history_dir}" + (f" for {id_number}" if id_number else ""))
+    return timesheet, read_table(HISTORY_CLOCKIFY_TABLE)
+
+def get_clockify_sync_window(conn, id_number, recheck_days=DEFAULT_RECHECK_DAYS, initial_days=CLOCKIFY_INITIAL_DAYS):
+    # From the last sync (less the recheck days), or the last initial_days days on a first sync, until now
+    end_date = datetime.now()
+    start_date = get_recheck_start(conn, id_number, 'clockify', recheck_days) or end_date - timedelta(days=initial_days)
+    return start_date.replace(hour=0, minute=0, second=0, microsecond=0), end_date
+
+def load_period_balances(conn, id_number, daily_target, balances=None, since=None):
+    # A user's PeriodBalances from the stored work days. Given the balances kept from an earlier
+    # call and the earliest day written since, only the days from since onwards are re-read and
+    # applied with set_day, so the update costs the same however long the history is.
+    import pandas as pd
+    
+    query = ("SELECT date, hours, (SELECT SUM(c.hours) FROM clockify_entries c "
+             "WHERE c.id_number = t.id_number AND c.date = t.date) FROM timesheet_days t WHERE id_number = ?")
+    if balances is not None and since is not None:
+        for day, hours, clockify_hours in conn.execute(query + " AND date >= ?", (id_number, since)):
+            balances.set_day(datetime.fromisoformat(day).date(), hours or 0.0, clockify_hours or 0.0)
+        return balances
+    
+    daily = pd.DataFrame(conn.execute(query, (id_number,)).fetchall(), columns=['Date', 'Hours', 'ClockifyHours'])
+    daily = daily.astype({'Date': 'datetime64[ns]', 'Hours': 'float64', 'ClockifyHours': 'float64'}).fillna(0.0)
+    return PeriodBalances.from_daily(daily[(daily['Date'].dt.dayofweek < 5) & (daily['Hours'] > 0)], daily_target)
+
+def update_period_balances(conn, id_number, daily_target, kept=None):
+    # kept is the (balances, revision) pair returned by the previous call. Every write since then is
+    # in store_changes, whichever command made it (this sync, a manual run re-storing its re-check
+    # window, a Clockify backfill of older days), so the balances follow all of them. The changes
+    # are read before the days: a write in between is re-read again on the next call.
+    revision, since = get_store_changes(conn, id_number, kept[1] if kept else 0)
+    if kept is None:
+        return load_period_balances(conn, id_number, daily_target), revision
+    if since is None:
+        return kept
+    return load_period_balances(conn, id_number, daily_target, kept[0], since), revision
+
+def download_clockify_entries(client, workspace_id, start_date, end_date, time_zone=None):
+    # Network only, no store access, so it can run on another thread
+    user_id = client.get_user_id()
+    return fetch_clockify_entries(client, workspace_id, user_id, start_date, end_date, time_zone)
+
+def sync_clockify(conn, id_number, api_key, workspace_id, recheck_days=DEFAULT_RECHECK_DAYS, client=None,
+                  time_zone=None, initial_days=CLOCKIFY_INITIAL_DAYS):
+    # Only fetch entries from the last sync onwards (re-checking a few days for edits),
+    # then return the grouped history from the store
+    if not api_key or not workspace_id:
+        return None
+    
+    if client is None:
+        with ClockifyClient(api_key) as client:
+            return sync_clockify(conn, id_number, api_key, workspace_id, recheck_days, client, time_zone,
+                                 initial_days)
+    
+    start_date, end_date = get_clockify_sync_window(conn, id_number, recheck_days, initial_days)
+    try:
+        data = download_clockify_entries(client, workspace_id, start_date, end_date, time_zone)
+        store_clockify_entries(conn, id_number, data, start_date, end_date)
+    except Exception as e:
+        print(f"Error getting time entries from Clockify: {e}")
+        print("Using previously stored Clockify entries")
+    
+    return group_clockify_entries(load_clockify_entries(conn, id_number))
+
+BACKFILL_DAYS = 365
+BACKFILL_CHUNK_DAYS = 30
+BACKFILL_WORKERS = 4
+
+def get_backfill_chunks(start_date, end_date, chunk_days=BACKFILL_CHUNK_DAYS):
+    # Consecutive (first day, last day) date pairs covering start_date..end_date
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+def get_backfilled_chunks(conn, id_number):
+    rows = conn.execute(
+        "SELECT start_date, end_date FROM clockify_backfill WHERE id_number = ?", (id_number,)
+    ).fetchall()
+    return {(datetime.strptime(start, '%Y-%m-%d').date(), datetime.strptime(end, '%Y-%m-%d').date())
+            for start, end in rows}
+
+def backfill_clockify(conn, id_number, api_key, workspace_id, start_date, end_date,
+                      chunk_days=BACKFILL_CHUNK_DAYS, workers=BACKFILL_WORKERS, time_zone=None, restart=False):
+    # Fetch Clockify entries for start_date..end_date (dates) in chunks of chunk_days, up to
+    # `workers` chunks at a time. A chunk's checkpoint row is only written once its entries are
+    # stored, so an interrupted backfill resumes with the chunks that are still missing (storing
+    # a chunk twice is harmless). Returns the number of chunks left to fetch.
+    from concurrent.futures import as_completed
+    
+    chunks = get_backfill_chunks(start_date, end_date, chunk_days)
+    if restart:
+        with conn:
+            conn.execute("DELETE FROM clockify_backfill WHERE id_number = ?", (id_number,))
+    done = get_backfilled_chunks(conn, id_number)
+    pending = [chunk for chunk in chunks if chunk not in done]
+    print(f"Backfilling Clockify entries from {start_date} to {end_date}: "
+          f"{len(pending)} of {len(chunks)} chunks of {chunk_days} days left")
+    if not pending:
+        return 0
+    
+    def download(chunk):
+        with stage('clockify', mode='backfill'):
+            return download_clockify_entries(client, workspace_id, datetime.combine(chunk[0], datetime.min.time()),
+                                             datetime.combine(chunk[1], datetime.max.time()), time_zone)
+    
+    # The chunks are the parallelism: each one pages through its entries in order, so at most
+    # `workers` requests are in flight
+    client = ClockifyClient(api_key, max_workers=1, pool_size=workers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    remaining = len(pending)
+    try:
+        futures = {executor.submit(download, chunk): chunk for chunk in pending}
+        # Stored on this thread as the chunks arrive, in whatever order they finish
+        for future in as_completed(futures):
+            chunk_start, chunk_end = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"Error getting Clockify entries for {chunk_start} to {chunk_end}: {e}")
+                continue
+            with stage('store', source='clockify'):
+                store_clockify_entries(conn, id_number, data, chunk_start, chunk_end, high_water=False)
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO clockify_backfill (id_number, start_date, end_date, fetched_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (id_number, chunk_start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d'), time.time())
+                    )
+            remaining -= 1
+            print(f"  {chunk_start} to {chunk_end}: {len(data)} entries ({remaining} chunks left)")
+    finally:
+        # On Ctrl+C, stop the downloads still running; their chunks are fetched on the next run
+        client.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        client.close()
+    return remaining
+
+def format_hours_minutes(hours, sign=None):
+    import pandas as pd
+    
+    if pd.isna(hours):
+        return ""
+    
+    total_minutes = int(round(hours * 60))
+    h, m = divmod(total_minutes, 60)
+    
+    prefix = ""
+    if sign is not None:
+        prefix = "+" if sign >= 0 else "-"
+    
+    if h == 0:
+        return f"{prefix}{m}min"
+    elif m == 0:
+        return f"{prefix}{h}h"
+    else:
+        return f"{prefix}{h}h {m:02d}min"
+
+def format_hours_minutes_series(hours, signed=False):
+    # Vectorized format_hours_minutes for a whole Series; with signed=True each value is
+    # formatted like format_hours_minutes(abs(x), sign=x)
+    import numpy as np
+    import pandas as pd
+    
+    values = hours.astype('float64')
+    missing = values.isna().to_numpy()
+    values = values.fillna(0).to_numpy()
+    
+    total_minutes = np.round((np.abs(values) if signed else values) * 60).astype('int64')
+    h, m = np.divmod(total_minutes, 60)
+    h_text = h.astype(str).astype(object)
+    m_text = m.astype(str).astype(object)
+    m_padded = np.where(m < 10, '0' + m_text, m_text)
+    
+    prefix = np.where(values >= 0, '+', '-').astype(object) if signed else ''
+    text = np.where(h == 0, prefix + m_text + 'min',
+                    np.where(m == 0, prefix + h_text + 'h', prefix + h_text + 'h ' + m_padded + 'min'))
+    text[missing] = ''
+    return pd.Series(text, index=hours.index, dtype='str')
+
+def build_clockify_tooltips(daily, clockify_days=None):
+    # One row per Clockify entry of the shown days, taken from the day offsets into
+    # clockify_days.entries, rendered as <li> items, de-duplicated and concatenated per day with
+    # a single reduceat instead of looping over the days
+    import numpy as np
+    import pandas as pd
+    
+    if clockify_days is None:
+        return {}
+    days = daily.loc[daily['ClockifyHours'].notna() & (daily['ClockifyHours'] > 0), ['Date', 'EntryStart', 'EntryStop']]
+    if days.empty:
+        return {}
+    
+    starts = days['EntryStart'].to_numpy(dtype=np.int64)
+    counts = days['EntryStop'].to_numpy(dtype=np.int64) - starts
+    rows = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+    entries = clockify_days.entries.iloc[rows].reset_index(drop=True)
+    description, project, task = (entries[column].astype(object).fillna('').astype(str)
+                                  for column in CLOCKIFY_TEXT_COLUMNS)
+    
+    parts = (('<br>' + description).where(description != '', '')
+             + ('<br>Project: ' + project).where((project != '') & (project != 'No project'), '')
+             + ('<br>Task: ' + task).where((task != '') & (task != 'No task'), ''))
+    items = pd.DataFrame({
+        'Date': np.repeat(days['Date'].dt.strftime('%Y-%m-%d').to_numpy(dtype=object), counts),
+        'Item': '<li>' + parts.str.slice(4) + '</li>'
+    })[parts != ''].drop_duplicates()
+    
+    tooltips = dict.fromkeys(days['Date'].dt.strftime('%Y-%m-%d'), "No details available")
+    if not items.empty:
+        # Each day's items are contiguous, so every day is one reduceat segment
+        dates = items['Date'].to_numpy(dtype=object)
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        joined = np.add.reduceat(items['Item'].to_numpy(dtype=object), starts)
+        tooltips.update(zip(dates[starts], '<ul>' + joined + '</ul>'))
+    return tooltips
+
+def format_daily(daily):
+    daily['HoursFormatted'] = format_hours_minutes_series(daily['Hours'])
+    daily['ClockifyHoursFormatted'] = format_hours_minutes_series(daily['ClockifyHours'])
+    daily['DifferenceFormatted'] = format_hours_minutes_series(daily['Difference'], signed=True)
+    return daily
+
+def format_weekly(weekly):
+    weekly['HoursFormatted'] = format_hours_minutes_series(weekly['Hours'])
+    weekly['ClockifyHoursFormatted'] = format_hours_minutes_series(weekly['ClockifyHours'])
+    weekly['TargetHoursFormatted'] = format_hours_minutes_series(weekly['TargetHours'])
+    weekly['WeeklyDifferenceFormatted'] = format_hours_minutes_series(weekly['WeeklyDifference'], signed=True)
+    weekly['AvgDailyHoursFormatted'] = format_hours_minutes_series(weekly['AvgDailyHours'])
+    weekly['Avg4WeeksFormatted'] = format_hours_minutes_series(weekly['Avg4Weeks'])
+    weekly['Avg12WeeksFormatted'] = format_hours_minutes_series(weekly['Avg12Weeks'])
+    weekly['BalanceFormatted'] = format_hours_minutes_series(weekly['Balance'], signed=True)
+    return weekly
+
+def format_monthly(monthly):
+    monthly['HoursFormatted'] = format_hours_minutes_series(monthly['Hours'])
+    monthly['ClockifyHoursFormatted'] = format_hours_minutes_series(monthly['ClockifyHours'])
+    monthly['TargetHoursFormatted'] = format_hours_minutes_series(monthly['TargetHours'])
+    monthly['DifferenceFormatted'] = format_hours_minutes_series(monthly['Difference'], signed=True)
+    monthly['BalanceFormatted'] = format_hours_minutes_series(monthly['Balance'], signed=True)
+    return monthly
+
+def format_results(results):
+    # Adds the *Formatted display columns to results from analyze_timesheet(formatted=False)
+    if 'HoursFormatted' not in results['daily'].columns:
+        format_daily(results['daily'])
+    weekly = results.get('weekly')
+    if weekly is not None and 'HoursFormatted' not in weekly.columns:
+        format_weekly(weekly)
+    monthly = results.get('monthly')
+    if monthly is not None and 'HoursFormatted' not in monthly.columns:
+        format_monthly(monthly)
+    return results
+
+def get_week_label(iso_year, week):
+    return f"{iso_year}-W{week:02d}"
+
+PERIOD_KEYS = {'weekly': ['IsoYear', 'Week'], 'monthly': ['Year', 'Month']}
+PERIOD_FIELDS = ['Hours', 'ClockifyHours', 'WorkDays', 'OnTargetDays']
+
+class PeriodBalances:
+    # Hour totals per ISO week (IsoYear, Week) and calendar month (Year, Month), kept up to date a
+    # day at a time: setting or removing a day adjusts its week, its month and the overall totals,
+    # so an update costs the same however long the history is. The per-period frames, with the
+    # running balance against the target and the rolling averages, are derived from the totals.
+    def __init__(self, daily_target):
+        self.daily_target = daily_target
+        self.days = {}
+        self.periods = {period: {} for period in PERIOD_KEYS}
+        self.totals = [0.0, 0.0, 0, 0]
+
+    @classmethod
+    def from_daily(cls, daily, daily_target):
+        # Bulk load of analyze_timesheet's daily frame (work days only), one groupby per period
+        import pandas as pd
+        
+        balances = cls(daily_target)
+        iso = daily['Date'].dt.isocalendar()
+        frame = pd.DataFrame({
+            'Hours': daily['Hours'].astype('float64'),
+            'ClockifyHours': daily['ClockifyHours'].astype('float64'),
+            'WorkDays': 1,
+            'OnTargetDays': (daily['Hours'] >= daily_target).astype('int64'),
+            'IsoYear': iso['year'].astype('int64'),
+            'Week': iso['week'].astype('int64'),
+            'Year': daily['Date'].dt.year,
+            'Month': daily['Date'].dt.month
+        })
+        values = frame[PERIOD_FIELDS].to_numpy(dtype=object).tolist()
+        balances.days = dict(zip(daily['Date'].dt.date, map(tuple, values)))
+        for period, keys in PERIOD_KEYS.items():
+            sums = frame.groupby(keys)[PERIOD_FIELDS].sum()
+            balances.periods[period] = dict(zip(map(tuple, sums.index.tolist()), sums.to_numpy(dtype=object).tolist()))
+        balances.totals = frame[PERIOD_FIELDS].sum().tolist()
+        return balances
+
+    def _apply(self, date, values, sign):
+        iso_year, week, _ = date.isocalendar()
+        for period, key in (('weekly', (iso_year, week)), ('monthly', (date.year, date.month))):
+            totals = self.periods[period].setdefault(key, [0.0, 0.0, 0, 0])
+            for i, value in enumerate(values):
+                totals[i] += sign * value
+            if totals[2] == 0:
+                del self.periods[period][key]
+        for i, value in enumerate(values):
+            self.totals[i] += sign * value
+
+    def set_day(self, date, hours, clockify_hours=0.0):
+        # Add a day or replace what was recorded for it. Weekends and days without hours are not
+        # work days, so for those this only removes the earlier values.
+        self.remove_day(date)
+        if date.weekday() < 5 and hours > 0:
+            values = (hours, clockify_hours, 1, int(hours >= self.daily_target))
+            self.days[date] = values
+            self._apply(date, values, 1)
+
+    def remove_day(self, date):
+        values = self.days.pop(date, None)
+        if values is not None:
+            self._apply(date, values, -1)
+
+    @property
+    def balance(self):
+        # Overtime (positive) or deficit (negative) over the whole history
+        hours, _, work_days, _ = self.totals
+        return hours - work_days * self.daily_target
+
+    def get_frame(self, period):
+        import pandas as pd
+        
+        buckets = self.periods[period]
+        index = pd.MultiIndex.from_tuples(sorted(buckets), names=PERIOD_KEYS[period])
+        frame = pd.DataFrame([buckets[key] for key in index], index=index, columns=PERIOD_FIELDS)
+        frame = frame.astype({'Hours': 'float64', 'ClockifyHours': 'float64', 'WorkDays': 'int64', 'OnTargetDays': 'int64'})
+        frame['TargetHours'] = frame['WorkDays'] * self.daily_target
+        frame['Difference'] = frame['Hours'] - frame['TargetHours']
+        frame['AvgDailyHours'] = frame['Hours'] / frame['WorkDays']
+        frame['OnTargetPercentage'] = (frame['OnTargetDays'] / frame['WorkDays']) * 100
+        # Cumulative overtime (positive) or deficit (negative) up to and including the period
+        frame['Balance'] = frame['Difference'].cumsum()
+        return frame
+
+    def get_weekly(self):
+        import pandas as pd
+        
+        weekly = self.get_frame('weekly').rename(columns={'Difference': 'WeeklyDifference'})
+        # Average hours of the weeks worked within the last 4 and 12 calendar weeks
+        mondays = pd.DatetimeIndex([datetime.fromisocalendar(iso_year, week, 1) for iso_year, week in weekly.index])
+        hours = pd.Series(weekly['Hours'].to_numpy(), index=mondays)
+        weekly['Avg4Weeks'] = hours.rolling('28D').mean().to_numpy()
+        weekly['Avg12Weeks'] = hours.rolling('84D').mean().to_numpy()
+        return weekly
+
+    def get_monthly(self):
+        return self.get_frame('monthly')
+
+def analyze_timesheet(df, daily_target=9, clockify_days=None, formatted=True, balances=None):
+    # formatted=False leaves out the *Formatted string columns, which are only needed for
+    # display; the report renders from the numbers and format_results adds them when wanted.
+    # balances is a PeriodBalances kept up to date with the same days, used instead of regrouping them.
+    import numpy as np
+    import pandas as pd
+    
+    results = {}
+    results['daily_target'] = daily_target
+    
+    # Filter out weekends (Saturday=5, Sunday=6) and days with 0 hours
+    df = df[(df['Date'].dt.dayofweek < 5) & (df['Hours'] > 0)]
+    
+    # Initialize Clockify columns if not provided
+    aggregations = {'FirstIn': 'first', 'LastOut': 'last', 'Hours': 'sum', 'ClockifyHours': 'first'}
+    if clockify_days is None:
+        df['ClockifyHours'] = 0
+    else:
+        # Merge with Clockify data if available; the entry offsets are only kept for the tooltips
+        df = pd.merge(df, clockify_days.frame, on='Date', how='left')
+        df['ClockifyHours'] = df['ClockifyHours'].fillna(0)
+        aggregations.update(EntryStart='first', EntryStop='first')
+    
+    daily = df.groupby('Date').agg(aggregations).reset_index()
+
+    daily['DayOfWeek'] = daily['Date'].dt.day_name().astype('category')
+    daily['OnTrack'] = pd.Categorical(np.where(daily['Hours'] >= daily_target, "✅", "❌"))
+    daily['Difference'] = daily['Hours'] - daily_target
+    
+    if formatted:
+        format_daily(daily)
+    
+    # Create tooltip content but don't store it in the dataframe
+    results['_clockify_tooltips'] = build_clockify_tooltips(daily, clockify_days)
+    daily = daily.drop(columns=['EntryStart', 'EntryStop'], errors='ignore')
+    
+    results['daily'] = daily
+
+    if not daily.empty:
+        # Keyed by ISO year and week, so week 1 of one year never merges with week 1 of another
+        iso = daily['Date'].dt.isocalendar()
+        daily['IsoYear'] = iso['year']
+        daily['Week'] = iso['week']
+        if balances is None:
+            balances = PeriodBalances.from_daily(daily, daily_target)
+        weekly = balances.get_weekly()
+        monthly = balances.get_monthly()
+        
+        if formatted:
+            format_weekly(weekly)
+            format_monthly(monthly)
+        
+        results['weekly'] = weekly
+        results['monthly'] = monthly
+        results['balance'] = balances.balance
+    
+    return results
+
+TEAM_PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+def summarize_periods(daily, keys, daily_target):
+    # Shared weekly/monthly aggregation over any grouping keys, one groupby pass for all users
+    periods = daily.groupby(keys).agg(
+        Hours=('Hours', 'sum'),
+        ClockifyHours=('ClockifyHours', 'sum'),
+        WorkDays=('Date', 'nunique'),
+        OnTargetDays=('OnTarget', 'sum')
+    )
+    periods['TargetHours'] = periods['WorkDays'] * daily_target
+    periods['Difference'] = periods['Hours'] - periods['TargetHours']
+    periods['AvgDailyHours'] = periods['Hours'] / periods['WorkDays']
+    periods['OnTargetPercentage'] = (periods['OnTargetDays'] / periods['WorkDays']) * 100
+    return periods
+
+def get_percentiles(grouped):
+    percentiles = grouped.quantile(TEAM_PERCENTILES).unstack()
+    percentiles.columns = [f"P{int(q * 100)}" for q in TEAM_PERCENTILES]
+    return percentiles
+
+def analyze_team(df, daily_target=9, clockify_df=None):
+    # Team version of analyze_timesheet. df is long format with an IdNumber column next to
+    # the parse_timesheet columns; clockify_df (optional) has IdNumber, Date and ClockifyHours.
+    # Every aggregate is a single groupby over all users, so there is no per-user loop.
+    import pandas as pd
+    
+    results = {'daily_target': daily_target}
+    
+    if 'Day' in df.columns:
+        # Compact input (see load_team_timesheets(compact=True)): FirstIn/LastOut stay as minutes
+        df = df.assign(IdNumber=df['IdNumber'].astype('str'), Date=from_day_numbers(df['Day']),
+                       Hours=df['CentiHours'] / 100)
+    
+    # Filter out weekends (Saturday=5, Sunday=6) and days with 0 hours
+    df = df[(df['Date'].dt.dayofweek < 5) & (df['Hours'] > 0)]
+    
+    daily = df.groupby(['IdNumber', 'Date']).agg(
+        FirstIn=('FirstIn', 'first'),
+        LastOut=('LastOut', 'last'),
+        Hours=('Hours', 'sum')
+    ).reset_index()
+    if clockify_df is not None and not clockify_df.empty:
+        clockify_daily = clockify_df.groupby(['IdNumber', 'Date'], as_index=False)['ClockifyHours'].sum()
+        daily = daily.merge(clockify_daily, on=['IdNumber', 'Date'], how='left')
+        daily['ClockifyHours'] = daily['ClockifyHours'].fillna(0)
+    else:
+        daily['ClockifyHours'] = 0.0
+    
+    daily['Difference'] = daily['Hours'] - daily_target
+    daily['OnTarget'] = daily['Hours'] >= daily_target
+    iso = daily['Date'].dt.isocalendar()
+    daily['IsoYear'] = iso['year']
+    daily['Week'] = iso['week']
+    daily['Year'] = daily['Date'].dt.year
+    daily['Month'] = daily['Date'].dt.month
+    results['daily'] = daily
+    
+    if daily.empty:
+        # Nobody has a work day (e.g. every fetch of a first team run failed): empty aggregates
+        for key in ('weekly', 'monthly', 'users', 'team_daily', 'team_weekly', 'team_monthly'):
+            results[key] = pd.DataFrame()
+        return results
+    
+    # Per-user aggregates
+    results['weekly'] = summarize_periods(daily, ['IdNumber', 'IsoYear', 'Week'], daily_target)
+    results['monthly'] = summarize_periods(daily, ['IdNumber', 'Year', 'Month'], daily_target)
+    users = summarize_periods(daily, ['IdNumber'], daily_target)
+    users['FirstDate'] = daily.groupby('IdNumber')['Date'].min()
+    users['LastDate'] = daily.groupby('IdNumber')['Date'].max()
+    results['users'] = users
+    
+    # Team rollups: distribution of hours across users and the share of days on target
+    team_daily = daily.groupby('Date').agg(
+        Users=('IdNumber', 'nunique'),
+        MeanHours=('Hours', 'mean'),
+        OnTargetRate=('OnTarget', 'mean')
+    )
+    results['team_daily'] = team_daily.join(get_percentiles(daily.groupby('Date')['Hours']))
+    
+    for period, keys in (('weekly', ['IsoYear', 'Week']), ('monthly', ['Year', 'Month'])):
+        per_user = results[period].reset_index()
+        per_user['OnTargetRate'] = per_user['OnTargetDays'] / per_user['WorkDays']
+        team = per_user.groupby(keys).agg(
+            Users=('IdNumber', 'nunique'),
+            TotalHours=('Hours', 'sum'),
+            MeanHours=('Hours', 'mean'),
+            OnTargetRate=('OnTargetRate', 'mean'),
+            TotalDifference=('Difference', 'sum')
+        )
+        results[f'team_{period}'] = team.join(get_percentiles(per_user.groupby(keys)['Hours']))
+    
+    return results
+
+INTERVAL_GROUP_SPAN = 2 ** 34  # Seconds each group gets on IntervalIndex's shared axis, past any local time
+RECONCILE_TOLERANCE_MINUTES = 5  # Badge punches are to the minute, so an entry only counts as out of hours past this
+
+class IntervalIndex:
+    # The union of any number of [start, end) intervals per group (a user), as sorted disjoint blocks.
+    # Groups are laid end to end on one axis (group * INTERVAL_GROUP_SPAN + seconds), so queries for a
+    # whole team are one searchsorted over one array: O((n + m) log n) for n intervals and m queries,
+    # with no comparison per pair of intervals.
+    def __init__(self, groups, starts, ends):
+        import numpy as np
+        
+        offsets = np.asarray(groups, dtype=np.int64) * INTERVAL_GROUP_SPAN
+        starts = offsets + np.asarray(starts, dtype=np.int64)
+        ends = offsets + np.asarray(ends, dtype=np.int64)
+        order = np.argsort(starts, kind='stable')
+        starts, ends = starts[order], ends[order]
+        if len(starts):
+            # A new block begins wherever an interval starts after everything before it has ended
+            reach = np.maximum.accumulate(ends)
+            first = np.flatnonzero(np.r_[True, starts[1:] > reach[:-1]])
+            starts, ends = starts[first], np.maximum.reduceat(ends, first)
+        self.starts = starts
+        self.ends = ends
+        # Covered time before each block
+        self.covered = np.r_[0, np.cumsum(ends - starts)]
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def groups(self):
+        return self.starts // INTERVAL_GROUP_SPAN
+
+    def covered_before(self, points):
+        # Covered time before each point on the shared axis
+        import numpy as np
+        
+        if not len(self.starts):
+            return np.zeros(len(points), dtype=np.int64)
+        block = np.searchsorted(self.starts, points, side='right') - 1
+        inside = block >= 0
+        block = np.maximum(block, 0)
+        partial = np.clip(points - self.starts[block], 0, self.ends[block] - self.starts[block])
+        return np.where(inside, self.covered[block] + partial, 0)
+
+    def overlap(self, groups, starts, ends):
+        # Covered time within each query interval [start, end) of the given group
+        import numpy as np
+        
+        offsets = np.asarray(groups, dtype=np.int64) * INTERVAL_GROUP_SPAN
+        return (self.covered_before(offsets + np.asarray(ends, dtype=np.int64)) -
+                self.covered_before(offsets + np.asarray(starts, dtype=np.int64)))
+
+def reconcile_intervals(punches, entries, tolerance_minutes=RECONCILE_TOLERANCE_MINUTES):
+    # Clockify time against time on site (the union of badge punches), per user and day: how much
+    # logged time falls on site (OverlapHours), on-site time with nothing logged (GapHours) and
+    # logging outside it (OutOfHoursHours, and OutOfHoursEntries past the tolerance). Entries count
+    # on the day they started, on-site blocks on the day they began. punches and entries come from
+    # load_team_intervals; entries comes back with OverlapHours and OutOfHoursHours per entry.
+    import numpy as np
+    import pandas as pd
+    
+    users = pd.Index(pd.concat([punches['IdNumber'], entries['IdNumber']]).unique())
+    punch_groups = users.get_indexer(punches['IdNumber'])
+    entry_groups = users.get_indexer(entries['IdNumber'])
+    on_site = IntervalIndex(punch_groups, punches['Start'], punches['End'])
+    logged = IntervalIndex(entry_groups, entries['Start'], entries['End'])
+    
+    # Per entry: the part on site, the rest is out of hours
+    entry_starts, entry_ends = entries['Start'].to_numpy(dtype=np.int64), entries['End'].to_numpy(dtype=np.int64)
+    entry_overlap = on_site.overlap(entry_groups, entry_starts, entry_ends)
+    out_of_hours = entry_ends - entry_starts - entry_overlap
+    entries = entries.assign(Date=from_day_numbers(pd.Series(entry_starts // 86400)),
+                             OverlapHours=entry_overlap / 3600, OutOfHoursHours=out_of_hours / 3600,
+                             OutOfHours=out_of_hours > tolerance_minutes * 60)
+    
+    # Per on-site block: the part with any Clockify time logged against it, the rest is a gap
+    block_groups = on_site.groups
+    block_starts = on_site.starts - block_groups * INTERVAL_GROUP_SPAN
+    block_ends = on_site.ends - block_groups * INTERVAL_GROUP_SPAN
+    block_logged = logged.overlap(block_groups, block_starts, block_ends)
+    blocks = pd.DataFrame({
+        'IdNumber': users[block_groups],
+        'Date': from_day_numbers(pd.Series(block_starts // 86400)),
+        'OnSiteHours': (block_ends - block_starts) / 3600,
+        'GapHours': (block_ends - block_starts - block_logged) / 3600
+    })
+    
+    daily = blocks.groupby(['IdNumber', 'Date']).sum().join(
+        entries.groupby(['IdNumber', 'Date']).agg(
+            ClockifyHours=('ClockifyHours', 'sum'),
+            OverlapHours=('OverlapHours', 'sum'),
+            OutOfHoursHours=('OutOfHoursHours', 'sum'),
+            OutOfHoursEntries=('OutOfHours', 'sum')
+        ),
+        how='outer'
+    ).fillna(0)
+    daily['OutOfHoursEntries'] = daily['OutOfHoursEntries'].astype('int64')
+    daily = daily[['OnSiteHours', 'ClockifyHours', 'OverlapHours', 'GapHours', 'OutOfHoursHours', 'OutOfHoursEntries']]
+    return {'daily': daily, 'entries': entries.drop(columns=['OutOfHours'])}
+
+REPORT_PAGE_SIZE = 31  # Daily table rows per page
+CHART_JS_CDN = 'https://cdn.jsdelivr.net/npm/chart.js'
+CHART_JS_FILE = 'chart.umd.min.js'  # Inlined into the report when present, so it works offline
+
+REPORT_STYLE = """
+        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 1200px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        h1, h2 {
+            color: #2c3e50;
+        }
+        h1 {
+            border-bottom: 2px solid #3498db;
+            padding-bottom: 10px;
+        }
+        h2 {
+            border-bottom: 1px solid #eee;
+            padding-bottom: 5px;
+            margin-top: 30px;
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+            margin: 20px 0;
+        }
+        th, td {
+            padding: 10px;
+            text-align: left;
+            border-bottom: 1px solid #ddd;
+        }
+        th {
+            background-color: #f2f2f2;
+            font-weight: bold;
+        }
+        tr:hover {
+            background-color: #f5f5f5;
+        }
+        .positive {
+            color: green;
+            font-weight: bold;
+        }
+        .negative {
+            color: red;
+            font-weight: bold;
+        }
+        .chart-container {
+            display: flex;
+            flex-wrap: wrap;
+            gap: 20px;
+            margin: 30px 0;
+        }
+        .chart {
+            flex: 1;
+            min-width: 400px;
+            height: 400px;
+            background: white;
+            border-radius: 8px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+            padding: 15px;
+        }
+        .footer {
+            margin-top: 30px;
+            font-size: 0.8em;
+            color: #777;
+            text-align: center;
+        }
+        .note {
+            font-style: italic;
+            color: #666;
+            margin: 10px 0;
+        }
+        .hours-cell {
+            font-family: monospace;
+        }
+        .pager {
+            display: flex;
+            gap: 10px;
+            align-items: center;
+        }
+        .tooltip {
+            position: relative;
+            display: inline-block;
+            cursor: pointer;
+        }
+        .tooltip .tooltiptext {
+            visibility: hidden;
+            width: 300px;
+            background-color: #555;
+            color: #fff;
+            text-align: left;
+            border-radius: 6px;
+            padding: 10px;
+            position: absolute;
+            z-index: 1;
+            bottom: 125%;
+            left: 50%;
+            margin-left: -150px;
+            opacity: 0;
+            transition: opacity 0.3s;
+        }
+        .tooltip .tooltiptext::after {
+            content: "";
+            position: absolute;
+            top: 100%;
+            left: 50%;
+            margin-left: -5px;
+            border-width: 5px;
+            border-style: solid;
+            border-color: #555 transparent transparent transparent;
+        }
+        .tooltip:hover .tooltiptext {
+            visibility: visible;
+            opacity: 1;
+        }
+        .tooltip-content ul {
+            margin: 0;
+            padding-left: 20px;
+        }
+        .tooltip-content li {
+            margin-bottom: 8px;
+        }
+"""
+
+REPORT_HEADER = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Work Timesheet Analysis</title>
+    <style>$style</style>
+</head>
+<body>
+    <h1>$title</h1>
+    <p><strong>Generated on:</strong> <span id="generated">$generated</span></p>
+    <p><strong>Daily Target:</strong> $target (Weekdays Only)</p>
+    <p class="note">Note: Days with 0 hours worked are excluded from analysis</p>
+""")
+
+REPORT_DAILY_SECTION = """
+    <h2>DAILY SUMMARY</h2>
+    <div class="chart-container">
+        <div class="chart">
+            <canvas id="dailyChart"></canvas>
+        </div>
+        <div class="chart">
+            <canvas id="dailyDiffChart"></canvas>
+        </div>
+    </div>
+    <table class="dataframe">
+        <thead>
+            <tr><th>Date</th><th>Day of Week</th><th>Arrival Time</th><th>Leaving Time</th><th>Hours Clocked In</th><th>Clockify Hours</th><th>Difference</th></tr>
+        </thead>
+        <tbody id="dailyRows"></tbody>
+    </table>
+    <div class="pager">
+        <button id="dailyPrev">&laquo; Newer</button>
+        <span id="dailyPage"></span>
+        <button id="dailyNext">Older &raquo;</button>
+    </div>
+"""
+
+REPORT_WEEKLY_SECTION = """
+    <h2>WEEKLY SUMMARY</h2>
+    <div class="chart-container">
+        <div class="chart">
+            <canvas id="weeklyChart"></canvas>
+        </div>
+        <div class="chart">
+            <canvas id="weeklyDiffChart"></canvas>
+        </div>
+    </div>
+    <table class="dataframe">
+        <thead>
+            <tr><th>Week</th><th>Days</th><th>Met Target</th><th>% On Target</th><th>Target</th><th>Hours Clocked In</th><th>Clockify Hours</th><th>Avg/Day</th><th>Difference</th><th>4-Week Avg</th><th>12-Week Avg</th><th>Balance</th></tr>
+        </thead>
+        <tbody id="weeklyRows">
+"""
+
+# Static client code: everything it needs comes from the single REPORT_DATA JSON block
+# (durations as whole minutes, columnar), so the page holds each value exactly once
+REPORT_SCRIPT = """
+<script>
+(function () {
+    const data = JSON.parse(document.getElementById('reportData').textContent);
+
+    function formatMinutes(total, signed) {
+        const prefix = signed ? (total >= 0 ? '+' : '-') : '';
+        total = Math.abs(total);
+        const h = Math.floor(total / 60), m = total % 60;
+        if (h === 0) return prefix + m + 'min';
+        if (m === 0) return prefix + h + 'h';
+        return prefix + h + 'h ' + String(m).padStart(2, '0') + 'min';
+    }
+    function toHours(minutes) {
+        return minutes.map(function (m) { return m / 60; });
+    }
+    function differenceCell(minutes) {
+        return '<span class="' + (minutes >= 0 ? 'positive' : 'negative') + '">' + formatMinutes(minutes, true) + '</span>';
+    }
+    function barColors(values, alpha) {
+        return values.map(function (v) { return v >= 0 ? 'rgba(75, 192, 192, ' + alpha + ')' : 'rgba(255, 99, 132, ' + alpha + ')'; });
+    }
+    function chartOptions(title, yTitle, beginAtZero) {
+        return {
+            responsive: true,
+            maintainAspectRatio: false,
+            scales: { y: { beginAtZero: beginAtZero, title: { display: true, text: yTitle } } },
+            plugins: {
+                title: { display: true, text: title },
+                tooltip: { callbacks: { label: function (context) {
+                    return context.dataset.label + ': ' + context.parsed.y.toFixed(2) + ' hours';
+                } } }
+            }
+        };
+    }
+    const charts = {};
+    function hoursChart(id, labels, hours, clockify, target, targetLabel, targetAsLine, title) {
+        if (charts[id]) charts[id].destroy();
+        charts[id] = new Chart(document.getElementById(id).getContext('2d'), {
+            type: 'bar',
+            data: {
+                labels: labels,
+                datasets: [
+                    { label: 'Hours Clocked In', data: hours, backgroundColor: 'rgba(54, 162, 235, 0.7)', borderColor: 'rgba(54, 162, 235, 1)', borderWidth: 1 },
+                    { label: 'Clockify Hours', data: clockify, backgroundColor: 'rgba(153, 102, 255, 0.7)', borderColor: 'rgba(153, 102, 255, 1)', borderWidth: 1 },
+                    targetAsLine
+                        ? { label: targetLabel, data: target, type: 'line', borderColor: 'rgba(255, 99, 132, 1)', borderWidth: 2, fill: false, pointRadius: 0 }
+                        : { label: targetLabel, data: target, backgroundColor: 'rgba(255, 99, 132, 0.7)', borderColor: 'rgba(255, 99, 132, 1)', borderWidth: 1 }
+                ]
+            },
+            options: chartOptions(title, 'Hours', true)
+        });
+    }
+    function differenceChart(id, labels, diffs, title) {
+        if (charts[id]) charts[id].destroy();
+        charts[id] = new Chart(document.getElementById(id).getContext('2d'), {
+            type: 'bar',
+            data: {
+                labels: labels,
+                datasets: [{ label: 'Difference from Target', data: diffs, backgroundColor: barColors(diffs, 0.7), borderColor: barColors(diffs, 1), borderWidth: 1 }]
+            },
+            options: chartOptions(title, 'Hours Difference', false)
+        });
+    }
+
+    const dayNames = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
+    let page = 0;
+
+    // Only the rows of the current page are in the DOM, most recent first
+    function renderDaily() {
+        const daily = data.daily;
+        const pages = Math.max(1, Math.ceil(daily.date.length / data.pageSize));
+        page = Math.min(page, pages - 1);
+        const rows = [];
+        const last = daily.date.length - 1 - page * data.pageSize;
+        for (let i = last; i > last - data.pageSize && i >= 0; i--) {
+            const date = daily.date[i];
+            let clockify = formatMinutes(daily.clockify[i]);
+            if (date in daily.tooltips) {
+                clockify = '<div class="tooltip">' + clockify + '<span class="tooltiptext tooltip-content">' + daily.tooltips[date] + '</span></div>';
+            }
+            rows.push('<tr><td>' + date + '</td><td>' + dayNames[new Date(date + 'T00:00:00').getDay()] +
+                      '</td><td>' + (daily.firstIn[i] || '') + '</td><td>' + (daily.lastOut[i] || '') +
+                      '</td><td>' + formatMinutes(daily.hours[i]) + '</td><td>' + clockify +
+                      '</td><td>' + differenceCell(daily.diff[i]) + '</td></tr>');
+        }
+        document.getElementById('dailyRows').innerHTML = rows.join('');
+        document.getElementById('dailyPage').textContent = 'Page ' + (page + 1) + ' of ' + pages;
+        document.getElementById('dailyPrev').disabled = page === 0;
+        document.getElementById('dailyNext').disabled = page >= pages - 1;
+    }
+    function drawDailyCharts() {
+        const daily = data.daily;
+        if (!window.Chart) return;
+        const target = daily.date.map(function () { return data.target / 60; });
+        hoursChart('dailyChart', daily.date, toHours(daily.hours), toHours(daily.clockify), target,
+                   'Daily Target', true, 'Daily Hours vs Target');
+        differenceChart('dailyDiffChart', daily.date, toHours(daily.diff), 'Daily Difference from Target');
+    }
+    function drawWeeklyCharts() {
+        const weekly = data.weekly;
+        if (!window.Chart) return;
+        hoursChart('weeklyChart', weekly.labels, toHours(weekly.hours), toHours(weekly.clockify), toHours(weekly.target),
+                   'Weekly Target', false, 'Weekly Hours vs Target');
+        differenceChart('weeklyDiffChart', weekly.labels, toHours(weekly.diff), 'Weekly Difference from Target');
+    }
+
+    if (data.daily) {
+        document.getElementById('dailyPrev').onclick = function () { page = Math.max(0, page - 1); renderDaily(); };
+        document.getElementById('dailyNext').onclick = function () { page += 1; renderDaily(); };
+        renderDaily();
+        drawDailyCharts();
+    }
+    if (data.weekly) {
+        drawWeeklyCharts();
+    }
+
+    // Partial updates pushed by `main.py serve`: changed days replace or add rows by date,
+    // removed days are dropped, and the weekly block is replaced as a whole
+    const dailyColumns = ['firstIn', 'lastOut', 'hours', 'clockify', 'diff'];
+    window.applyReportUpdate = function (update) {
+        if ((update.daily && !data.daily) || (update.weekly && !data.weekly)) {
+            // The section is not on the page yet
+            location.reload();
+            return;
+        }
+        if (update.daily || update.removed) {
+            const daily = data.daily;
+            const rows = {};
+            function collect(block) {
+                block.date.forEach(function (date, i) {
+                    rows[date] = dailyColumns.map(function (column) { return block[column][i]; });
+                });
+            }
+            collect(daily);
+            (update.removed || []).forEach(function (date) {
+                delete rows[date];
+                delete daily.tooltips[date];
+            });
+            if (update.daily) {
+                collect(update.daily);
+                update.daily.date.forEach(function (date) {
+                    if (date in update.daily.tooltips) daily.tooltips[date] = update.daily.tooltips[date];
+                    else delete daily.tooltips[date];
+                });
+            }
+            daily.date = Object.keys(rows).sort();
+            dailyColumns.forEach(function (column, k) {
+                daily[column] = daily.date.map(function (date) { return rows[date][k]; });
+            });
+            renderDaily();
+            drawDailyCharts();
+        }
+        if (update.weekly) {
+            data.weekly = update.weekly;
+            document.getElementById('weeklyRows').innerHTML = update.weeklyRows;
+            drawWeeklyCharts();
+        }
+        if (update.generated) {
+            document.getElementById('generated').textContent = update.generated;
+        }
+    };
+})();
+</script>
+"""
+
+# Appended when the report is served by `main.py serve`
+REPORT_LIVE_SCRIPT = """
+<script>
+(function () {
+    if (!window.EventSource || !window.applyReportUpdate) return;
+    const events = new EventSource('/events');
+    events.addEventListener('update', function (event) {
+        window.applyReportUpdate(JSON.parse(event.data));
+    });
+})();
+</script>
+"""
+
+def to_minutes(values):
+    import numpy as np
+    
+    return np.round(values.astype('float64').fillna(0).to_numpy() * 60).astype('int64').tolist()
+
+def to_signed_minutes(values):
+    # Matches format_hours_minutes(abs(x), sign=x): minutes are rounded on the absolute value
+    import numpy as np
+    
+    values = values.astype('float64').fillna(0).to_numpy()
+    return (np.sign(values) * np.round(np.abs(values) * 60)).astype('int64').tolist()
+
+def get_report_data(results, page_size=REPORT_PAGE_SIZE):
+    # Everything the charts and the daily table need, columnar and in whole minutes
+    data = {'target': int(round(results['daily_target'] * 60)), 'pageSize': page_size}
+    
+    daily = results['daily']
+    if not daily.empty:
+        data['daily'] = {
+            'date': daily['Date'].dt.strftime('%Y-%m-%d').tolist(),
+            'firstIn': daily['FirstIn'].astype(object).where(daily['FirstIn'].notna(), None).tolist(),
+            'lastOut': daily['LastOut'].astype(object).where(daily['LastOut'].notna(), None).tolist(),
+            'hours': to_minutes(daily['Hours']),
+            'clockify': to_minutes(daily['ClockifyHours']),
+            'diff': to_signed_minutes(daily['Difference']),
+            'tooltips': results.get('_clockify_tooltips', {})
+        }
+    
+    weekly = results.get('weekly')
+    if weekly is not None and not weekly.empty:
+        data['weekly'] = {
+            'labels': [get_week_label(iso_year, week) for iso_year, week in weekly.index.tolist()],
+            'hours': to_minutes(weekly['Hours']),
+            'clockify': to_minutes(weekly['ClockifyHours']),
+            'target': to_minutes(weekly['TargetHours']),
+            'diff': to_signed_minutes(weekly['WeeklyDifference'])
+        }
+    
+    return data
+
+def write_json_script(out, element_id, data):
+    # Stream compact JSON into a non-executed script block; '</' is escaped so no value can
+    # close the element early
+    out.write(f'<script type="application/json" id="{element_id}">')
+    for chunk in json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).iterencode(data):
+        out.write(chunk.replace('</', '<\\/'))
+    out.write('</script>\n')
+
+def write_chart_library(out, chart_js=None):
+    # Inline a local copy of Chart.js when one is available, otherwise load it from the CDN
+    chart_js = chart_js or os.path.join(os.path.dirname(os.path.abspath(__file__)), CHART_JS_FILE)
+    if os.path.exists(chart_js):
+        out.write('<script>\n')
+        with open(chart_js, 'r', encoding='utf-8') as f:
+            shutil.copyfileobj(f, out)
+        out.write('\n</script>\n')
+    else:
+        out.write(f'<script src="{CHART_JS_CDN}"></script>\n')
+
+def write_weekly_rows(out, weekly):
+    # Most recent week first
+    weekly = weekly.sort_index(ascending=False)
+    if 'HoursFormatted' not in weekly.columns:
+        weekly = format_weekly(weekly)
+    for (iso_year, week), row in zip(weekly.index, weekly.itertuples(index=False)):
+        difference_class = "positive" if row.WeeklyDifferenceFormatted.startswith("+") else "negative"
+        balance_class = "positive" if row.BalanceFormatted.startswith("+") else "negative"
+        out.write(
+            f'            <tr><th>{get_week_label(iso_year, week)}</th><td>{row.WorkDays}</td><td>{row.OnTargetDays}</td>'
+            f'<td>{row.OnTargetPercentage:.1f}%</td><td>{row.TargetHoursFormatted}</td><td>{row.HoursFormatted}</td>'
+            f'<td>{row.ClockifyHoursFormatted}</td><td>{row.AvgDailyHoursFormatted}</td>'
+            f'<td><span class="{difference_class}">{row.WeeklyDifferenceFormatted}</span></td>'
+            f'<td>{row.Avg4WeeksFormatted}</td><td>{row.Avg12WeeksFormatted}</td>'
+            f'<td><span class="{balance_class}">{row.BalanceFormatted}</span></td></tr>\n'
+        )
+
+def write_html_report(results, out, user_name=None, chart_js=None, page_size=REPORT_PAGE_SIZE, live=False):
+    # Stream the report to a file-like object section by section instead of building one string
+    title = "WORK TIMESHEET ANALYSIS"
+    if user_name:
+        title = f"{user_name.upper()}'S TIMESHEET ANALYSIS"
+    current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    out.write(REPORT_HEADER.substitute(
+        style=REPORT_STYLE,
+        title=title,
+        generated=current_date,
+        target=format_hours_minutes(results['daily_target'])
+    ))
+    
+    if not results['daily'].empty:
+        out.write(REPORT_DAILY_SECTION)
+    else:
+        out.write("    <p>No workday data found in the timesheet</p>\n")
+    
+    weekly = results.get('weekly')
+    if weekly is not None and not weekly.empty:
+        out.write(REPORT_WEEKLY_SECTION)
+        write_weekly_rows(out, weekly)
+        out.write("        </tbody>\n    </table>\n")
+    
+    write_json_script(out, 'reportData', get_report_data(results, page_size))
+    write_chart_library(out, chart_js)
+    out.write(REPORT_SCRIPT)
+    if live:
+        out.write(REPORT_LIVE_SCRIPT)
+    out.write(f"""
+    <div class="footer">
+        Report generated on {current_date} | Written and designed by Lee Kaplan (and ChatGPT) | V1.4
+    </div>
+</body>
+</html>
+""")
+
+def generate_html_report(results, user_name=None, chart_js=None, page_size=REPORT_PAGE_SIZE, live=False):
+    out = io.StringIO()
+    write_html_report(results, out, user_name, chart_js, page_size, live)
+    return out.getvalue()
+
+def save_html_report(results, report_path, user_name=None, chart_js=None, page_size=REPORT_PAGE_SIZE):
+    with open(report_path, 'w', encoding='utf-8') as f:
+        write_html_report(results, f, user_name, chart_js, page_size)
+
+TIMESHEET_HTML_FILE = 'timesheet.html'
+SNAPSHOT_FILE = 'report_snapshot.json'
+REPORT_CACHE_FILE = 'report_cache.json'
+
+def save_snapshot(user_name, clockify_entries, snapshot_file=SNAPSHOT_FILE):
+    # Everything besides the saved table HTML that a report needs, so it can be re-rendered offline
+    snapshot = {
+        'user_name': user_name,
+        'clockify_entries': [{**entry, 'Date': entry['Date'].isoformat()} for entry in clockify_entries]
+    }
+    try:
+        with open(snapshot_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+    except Exception as e:
+        print(f"Warning: Could not save report snapshot ({e}), continuing without saving")
+
+def load_snapshot(snapshot_file=SNAPSHOT_FILE):
+    if not os.path.exists(snapshot_file):
+        return {'user_name': None, 'clockify_entries': []}
+    with open(snapshot_file, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    for entry in snapshot['clockify_entries']:
+        entry['Date'] = datetime.strptime(entry['Date'], '%Y-%m-%d').date()
+    return snapshot
+
+def get_report_settings(config, daily_target_hours):
+    chart_js = config.get('chart_js_file') or os.path.join(os.path.dirname(os.path.abspath(__file__)), CHART_JS_FILE)
+    return {
+        'daily_target': daily_target_hours,
+        'page_size': config.get('report_page_size', REPORT_PAGE_SIZE),
+        'chart_js': chart_js,
+        'chart_js_mtime': os.path.getmtime(chart_js) if os.path.exists(chart_js) else None
+    }
+
+def hash_report_inputs(*parts):
+    # Content hash of everything a report depends on. The source of this file is included,
+    # so changing the analysis or the layout also invalidates previously rendered reports.
+    digest = hashlib.sha256()
+    with open(os.path.abspath(__file__), 'rb') as f:
+        digest.update(f.read())
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        elif not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'little'))
+        digest.update(part)
+    return digest.hexdigest()
+
+def get_store_fingerprint(store, id_number):
+    # Hash of the stored rows for one user, read straight from SQLite (no pandas needed)
+    digest = hashlib.sha256()
+    for query in ("SELECT date, first_in, last_out, clock_in, clock_out, hours FROM timesheet_days "
+                  "WHERE id_number = ? ORDER BY date",
+                  "SELECT entry_id, date, hours, description, project, task FROM clockify_entries "
+                  "WHERE id_number = ? ORDER BY date, rowid"):
+        for row in store.execute(query, (id_number,)):
+            digest.update(repr(row).encode('utf-8'))
+        digest.update(b'|')
+    return digest.hexdigest()
+
+def is_report_current(report_path, input_hash, cache_file=REPORT_CACHE_FILE):
+    if not os.path.exists(report_path) or not os.path.exists(cache_file):
+        return False
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f).get(report_path) == input_hash
+    except Exception:
+        return False
+
+def remember_report(report_path, input_hash, cache_file=REPORT_CACHE_FILE):
+    remember_reports({report_path: input_hash}, cache_file)
+
+def remember_reports(input_hashes, cache_file=REPORT_CACHE_FILE):
+    # One read and write of the cache for any number of reports
+    cache = {}
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                cache = json.load(f)
+        except Exception:
+            pass
+    cache.update(input_hashes)
+    try:
+        with open(cache_file, 'w') as f:
+            json.dump(cache, f)
+    except Exception as e:
+        print(f"Warning: Could not save report cache ({e}), continuing without saving")
+
+def render_report_if_changed(config, report_path, input_hash, load_results, user_name, force=False):
+    # Skip parsing, analysis and rendering entirely when the report was already rendered from
+    # identical inputs; load_results is only called when a new report is needed
+    if not force and is_report_current(report_path, input_hash):
+        print(f"Report is up to date: {report_path}")
+        return False
+    results = load_results()
+    with stage('render'):
+        save_html_report(results, report_path, user_name, config.get('chart_js_file'),
+                         config.get('report_page_size', REPORT_PAGE_SIZE))
+    remember_report(report_path, input_hash)
+    print(f"HTML report saved to: {report_path}")
+    return True
+
+def write_snapshot_report(config, report_path, daily_target_hours=DEFAULT_DAILY_TARGET,
+                          html_file=TIMESHEET_HTML_FILE, snapshot_file=SNAPSHOT_FILE, force=False):
+    # Report straight from the saved timesheet.html and Clockify snapshot: no store, browser or network
+    with open(html_file, 'r', encoding='utf-8') as f:
+        table_html = f.read()
+    snapshot = load_snapshot(snapshot_file)
+    input_hash = hash_report_inputs(table_html, snapshot, get_report_settings(config, daily_target_hours))
+    
+    def load_results():
+        with stage('parse'):
+            df = parse_timesheet(table_html)
+        with stage('analyze'):
+            clockify_days = group_clockify_entries(snapshot['clockify_entries'])
+            return analyze_timesheet(df, daily_target_hours, clockify_days, formatted=False)
+    
+    return render_report_if_changed(config, report_path, input_hash, load_results, snapshot['user_name'], force)
+
+def run_batch(config, daily_target_hours=DEFAULT_DAILY_TARGET, write_reports=True):
+    # Team mode: every ID in config['id_numbers'] is fetched through a shared browser pool
+    # and gets its own report file
+    id_numbers = config['id_numbers']
+    recheck_days = config.get('recheck_days', DEFAULT_RECHECK_DAYS)
+    
+    print(f"Retrieving timesheets for {len(id_numbers)} users...")
+    with stage('fetch', mode='batch'):
+        timesheets = batch_get_timesheets(id_numbers, config.get('browser_pool_size', 2),
+                                          config.get('fetch_backend', 'auto'), config.get('step_timeouts'))
+    
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        for id_number, (html_content, user_name) in timesheets.items():
+            if html_content is None:
+                print(f"Failed to retrieve timesheet data for {id_number}")
+                continue
+            
+            with stage('parse'):
+                df = parse_timesheet(html_content)
+            with stage('store'):
+                store_timesheet(store, id_number, df, recheck_days)
+                save_user_name(store, id_number, user_name)
+        
+        if write_reports:
+            team_results = render_team_reports(config, store, id_numbers, '.', daily_target_hours,
+                                               config.get('report_workers'))
+        else:
+            team_results = load_team_analysis(store, id_numbers, daily_target_hours)
+        if team_results is not None:
+            print_team_summary(team_results)
+        if config.get('history_dir'):
+            with stage('write'):
+                save_history(store, config['history_dir'], id_numbers)
+    finally:
+        store.close()
+
+def load_team_analysis(store, id_numbers, daily_target_hours=DEFAULT_DAILY_TARGET):
+    with stage('team_analyze'):
+        return analyze_team(load_team_timesheets(store, id_numbers, compact=True), daily_target_hours,
+                            load_team_clockify_hours(store, id_numbers))
+
+TEAM_INDEX_FILE = 'timesheet_report_index.html'
+
+TEAM_INDEX_HEADER = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Team Timesheet Analysis</title>
+    <style>$style</style>
+</head>
+<body>
+    <h1>TEAM TIMESHEET ANALYSIS</h1>
+    <p><strong>Generated on:</strong> $generated</p>
+    <p><strong>Daily Target:</strong> $target (Weekdays Only)</p>
+""")
+
+# Per-process state of the report workers, set up once per process by init_report_worker
+_report_worker = {}
+
+def init_report_worker(config, daily_target_hours):
+    _report_worker['config'] = config
+    _report_worker['daily_target'] = daily_target_hours
+    _report_worker['store'] = open_store(config.get('store_file', STORE_FILE))
+
+def render_member_report(id_number, report_path, force=False):
+    # One user's report with the report worker's store: the same up-to-date check as
+    # write_user_report, but the new hash (None if unchanged) is returned so the cache is written once
+    config, store, daily_target_hours = _report_worker['config'], _report_worker['store'], _report_worker['daily_target']
+    user_name = load_user_name(store, id_number)
+    input_hash = hash_report_inputs(get_store_fingerprint(store, id_number), user_name,
+                                    get_report_settings(config, daily_target_hours))
+    if not force and is_report_current(report_path, input_hash):
+        return user_name, None
+    results = load_user_analysis(store, id_number, daily_target_hours, formatted=False)
+    with stage('render'):
+        save_html_report(results, report_path, user_name, config.get('chart_js_file'),
+                         config.get('report_page_size', REPORT_PAGE_SIZE))
+    return user_name, input_hash
+
+def render_member_report_in_pool(id_number, report_path, force=False):
+    # Also returns the worker process's stage totals for this report, for run_metrics.merge
+    run_metrics.stages.clear()
+    return (*render_member_report(id_number, report_path, force), run_metrics.snapshot())
+
+def render_team_reports(config, store, id_numbers, report_dir='.', daily_target_hours=DEFAULT_DAILY_TARGET,
+                        workers=None, force=False):
+    # Analysis and rendering are CPU-bound, so each user's report is rendered in a process pool
+    # (one process per CPU by default) that reads the store on its own connection. The team
+    # index is written last from one team-wide analysis; returns that analysis, or None when none
+    # of the users has stored data. Users without stored data, or whose report failed to render,
+    # are left out of the index.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    
+    stored = {row[0] for row in store.execute(
+        f"SELECT DISTINCT id_number FROM timesheet_days WHERE id_number IN ({', '.join('?' * len(id_numbers))})",
+        tuple(id_numbers))}
+    for id_number in id_numbers:
+        if id_number not in stored:
+            print(f"No stored timesheet data for {id_number}, skipping its report")
+    id_numbers = [id_number for id_number in id_numbers if id_number in stored]
+    if not id_numbers:
+        print("No stored timesheet data to report on")
+        return None
+    
+    os.makedirs(report_dir, exist_ok=True)
+    report_paths = {id_number: os.path.abspath(os.path.join(report_dir, f'timesheet_report_{id_number}.html'))
+                    for id_number in id_numbers}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(id_numbers)))
+    user_names, input_hashes, failed = {}, {}, set()
+    
+    def record(id_number, user_name, input_hash):
+        user_names[id_number] = user_name
+        if input_hash is None:
+            print(f"Report is up to date: {report_paths[id_number]}")
+            return
+        input_hashes[report_paths[id_number]] = input_hash
+        print(f"HTML report for {user_name or id_number} saved to: {report_paths[id_number]}")
+    
+    print(f"Rendering {len(id_numbers)} reports with {workers} worker{'s' if workers > 1 else ''}...")
+    with stage('render', mode='team'):
+        if workers == 1:
+            init_report_worker(config, daily_target_hours)
+            try:
+                for id_number in id_numbers:
+                    try:
+                        user_name, input_hash = render_member_report(id_number, report_paths[id_number], force)
+                    except Exception as e:
+                        print(f"Failed to render the report for {id_number}: {e}")
+                        failed.add(id_number)
+                        continue
+                    record(id_number, user_name, input_hash)
+            finally:
+                _report_worker.pop('store').close()
+        else:
+            with ProcessPoolExecutor(workers, initializer=init_report_worker,
+                                     initargs=(config, daily_target_hours)) as executor:
+                futures = {executor.submit(render_member_report_in_pool, id_number, report_paths[id_number], force): id_number
+                           for id_number in id_numbers}
+                for future in as_completed(futures):
+                    try:
+                        user_name, input_hash, stages = future.result()
+                    except Exception as e:
+                        print(f"Failed to render the report for {futures[future]}: {e}")
+                        failed.add(futures[future])
+                        continue
+                    run_metrics.merge(stages)
+                    record(futures[future], user_name, input_hash)
+        remember_reports(input_hashes)
+    
+    team_results = load_team_analysis(store, id_numbers, daily_target_hours)
+    index_path = os.path.abspath(os.path.join(report_dir, TEAM_INDEX_FILE))
+    with stage('render', mode='index'):
+        with open(index_path, 'w', encoding='utf-8') as f:
+            write_team_index(f, team_results, {id_number: path for id_number, path in report_paths.items()
+                                               if id_number not in failed}, user_names)
+    print(f"Team index saved to: {index_path}")
+    return team_results
+
+def write_team_index(out, team_results, report_paths, user_names):
+    # Summary row per user linking to their report, plus the latest weekly team rollup
+    import html
+    
+    current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    out.write(TEAM_INDEX_HEADER.substitute(
+        style=REPORT_STYLE,
+        generated=current_date,
+        target=format_hours_minutes(team_results['daily_target'])
+    ))
+    
+    team_weekly = team_results['team_weekly']
+    if not team_weekly.empty:
+        (iso_year, week), latest = next(team_weekly.iloc[::-1].iterrows())
+        out.write(f"    <p><strong>{get_week_label(iso_year, week)}:</strong> {int(latest['Users'])} users, "
+                  f"median {format_hours_minutes(latest['P50'])}, "
+                  f"{latest['OnTargetRate'] * 100:.1f}% of days on target</p>\n")
+    
+    out.write("""
+    <h2>USERS</h2>
+    <table class="dataframe">
+        <thead>
+            <tr><th>User</th><th>ID Number</th><th>First Day</th><th>Last Day</th><th>Work Days</th><th>Days On Target</th><th>Hours Clocked In</th><th>Clockify Hours</th><th>Avg Daily Hours</th><th>Balance</th></tr>
+        </thead>
+        <tbody>
+""")
+    users = team_results['users']
+    for id_number, report_path in report_paths.items():
+        name = html.escape(user_names.get(id_number) or str(id_number))
+        link = f'<a href="{html.escape(os.path.basename(report_path))}">{name}</a>'
+        if id_number not in users.index:
+            out.write(f'            <tr><td>{link}</td><td>{html.escape(str(id_number))}</td>'
+                      f'<td colspan="8">No workday data</td></tr>\n')
+            continue
+        row = users.loc[id_number]
+        balance_class = 'positive' if row['Difference'] >= 0 else 'negative'
+        out.write(
+            f'            <tr><td>{link}</td><td>{html.escape(str(id_number))}</td>'
+            f'<td>{row["FirstDate"]:%Y-%m-%d}</td><td>{row["LastDate"]:%Y-%m-%d}</td><td>{row["WorkDays"]}</td>'
+            f'<td>{row["OnTargetPercentage"]:.1f}%</td><td>{format_hours_minutes(row["Hours"])}</td>'
+            f'<td>{format_hours_minutes(row["ClockifyHours"])}</td><td>{format_hours_minutes(row["AvgDailyHours"])}</td>'
+            f'<td><span class="{balance_class}">{format_hours_minutes(abs(row["Difference"]), sign=row["Difference"])}</span></td></tr>\n'
+        )
+    out.write(f"""        </tbody>
+    </table>
+    <div class="footer">
+        Report generated on {current_date} | Written and designed by Lee Kaplan (and ChatGPT) | V1.4
+    </div>
+</body>
+</html>
+""")
+
+def print_team_summary(team_results):
+    users = team_results['users']
+    if users.empty:
+        return
+    print(f"Team summary ({len(users)} users):")
+    for id_number, row in users.iterrows():
+        print(f"  {id_number}: {row['WorkDays']} days, avg {format_hours_minutes(row['AvgDailyHours'])}/day, "
+              f"{row['OnTargetPercentage']:.1f}% on target, balance {format_hours_minutes(abs(row['Difference']), sign=row['Difference'])}")
+    if not team_results['team_weekly'].empty:
+        (iso_year, week), latest = next(team_results['team_weekly'].iloc[::-1].iterrows())
+        print(f"  Week {iso_year}-W{week:02d}: median {format_hours_minutes(latest['P50'])}, "
+              f"{latest['OnTargetRate'] * 100:.1f}% of days on target")
+
+DEFAULT_FETCH_TIMEOUT = 180  # Seconds the fetch phase (timesheet and Clockify together) may take
+
+def fetch_and_parse_timesheet(id_number, backend='auto', timeouts=None):
+    with stage('fetch'):
+        html_content, user_name = login_and_get_timesheet(id_number, backend=backend, timeouts=timeouts)
+    if html_content is None:
+        return None, None
+    with stage('parse'):
+        return parse_timesheet(html_content), user_name
+
+def fetch_user_data(config, store):
+    # Retrieve the timesheet and Clockify entries for config['id_number'] into the store.
+    # Returns the user's name, or None when the timesheet could not be retrieved.
+    #
+    # Both sources are fetched at the same time on worker threads, so the timesheet is parsed
+    # while Clockify is still downloading; only the store is written from this thread. The whole
+    # phase shares one deadline (fetch_timeout). A timesheet that fails or misses it fails the run;
+    # a Clockify download that fails or misses it falls back to the stored entries. Either way a
+    # download still running is cancelled.
+    from concurrent.futures import TimeoutError as FuturesTimeout
+    
+    id_number = config['id_number']
+    recheck_days = config.get('recheck_days', DEFAULT_RECHECK_DAYS)
+    deadline = time.monotonic() + config.get('fetch_timeout', DEFAULT_FETCH_TIMEOUT)
+    
+    client = None
+    if config.get('clockify_api_key') and config.get('clockify_workspace_id'):
+        client = ClockifyClient(config['clockify_api_key'])
+        start_date, end_date = get_clockify_sync_window(store, id_number, recheck_days,
+                                                        config.get('clockify_initial_days', CLOCKIFY_INITIAL_DAYS))
+    
+    def download():
+        with stage('clockify'):
+            return download_clockify_entries(client, config['clockify_workspace_id'], start_date, end_date,
+                                             config.get('timezone'))
+    
+    executor = ThreadPoolExecutor(max_workers=2)
+    clockify = None
     try:
         print("Logging in and retrieving timesheet...")
-        html_content, user_name = login_and_get_timesheet(config['id_number'])
+        timesheet = executor.submit(fetch_and_parse_timesheet, id_number, config.get('fetch_backend', 'auto'),
+                                    config.get('step_timeouts'))
+        if client:
+            print("Retrieving Clockify data...")
+            clockify = executor.submit(download)
         
-        if html_content is None:
+        try:
+            df, user_name = timesheet.result(timeout=max(0, deadline - time.monotonic()))
+        except FuturesTimeout:
+            print("Timed out retrieving the timesheet (fetch_timeout)")
+            df = None
+        if df is None:
             print("Failed to retrieve timesheet data")
+            return None
+        
+        with stage('store'):
+            store_timesheet(store, id_number, df, recheck_days)
+            save_user_name(store, id_number, user_name)
+        
+        if clockify:
+            try:
+                data = clockify.result(timeout=max(0, deadline - time.monotonic()))
+                with stage('store', source='clockify'):
+                    store_clockify_entries(store, id_number, data, start_date, end_date)
+            except FuturesTimeout:
+                print("Timed out getting time entries from Clockify (fetch_timeout)")
+                print("Using previously stored Clockify entries")
+            except Exception as e:
+                print(f"Error getting time entries from Clockify: {e}")
+                print("Using previously stored Clockify entries")
+    finally:
+        # Return without waiting for a fetch that missed the deadline or was no longer needed.
+        # The worker threads are not daemons, so the interpreter still joins them on exit: a
+        # cancelled Clockify download stops at its next request or retry wait, and a timesheet
+        # fetch runs until its step timeouts at most.
+        if client:
+            if clockify is None or not clockify.done():
+                client.cancel()
+            # The session is closed once the download thread is done with it, not under it
+            if clockify is None:
+                client.close()
+            else:
+                clockify.add_done_callback(lambda _: client.close())
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    with stage('write'):
+        save_snapshot(user_name, load_clockify_entries(store, id_number))
+        if config.get('history_dir'):
+            save_history(store, config['history_dir'], [id_number])
+    return user_name
+
+def load_user_analysis(store, id_number, daily_target_hours=DEFAULT_DAILY_TARGET, formatted=True, balances=None):
+    # Analysis of everything stored for one user; no network access. balances, when given, is the
+    # user's up-to-date PeriodBalances (see load_period_balances)
+    with stage('load'):
+        df = load_timesheet(store, id_number)
+        clockify_days = group_clockify_entries(load_clockify_entries(store, id_number))
+    with stage('analyze'):
+        return analyze_timesheet(df, daily_target_hours, clockify_days, formatted, balances)
+
+def load_history_analysis(history_dir, id_number, daily_target_hours=DEFAULT_DAILY_TARGET, formatted=True):
+    # Same as load_user_analysis, from the Parquet history instead of the store
+    with stage('load', source='history'):
+        timesheet, clockify = load_history(history_dir, id_number)
+        df = expand_timesheet(timesheet).drop(columns=['IdNumber']).sort_values('Date', ascending=False)
+        clockify_days = None
+        if clockify is not None:
+            clockify_days = group_clockify_entries(expand_clockify_entries(clockify).drop(columns=['IdNumber', 'EntryId']))
+    with stage('analyze'):
+        return analyze_timesheet(df, daily_target_hours, clockify_days, formatted)
+
+def write_user_report(config, store, id_number, report_path, daily_target_hours=DEFAULT_DAILY_TARGET, force=False,
+                      balances=None):
+    user_name = load_user_name(store, id_number)
+    input_hash = hash_report_inputs(get_store_fingerprint(store, id_number), user_name,
+                                    get_report_settings(config, daily_target_hours))
+    return render_report_if_changed(config, report_path, input_hash,
+                                    lambda: load_user_analysis(store, id_number, daily_target_hours, False, balances),
+                                    user_name, force)
+
+EXPORT_DIR = 'export'
+EXPORT_FORMATS = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+EXPORT_TABLES = ('daily', 'weekly', 'monthly', 'timesheet')
+EXPORT_CHUNK_ROWS = 10000
+# The Clockify entry details and display columns stay in the report
+EXPORT_DAILY_COLUMNS = ['Date', 'DayOfWeek', 'FirstIn', 'LastOut', 'Hours', 'ClockifyHours', 'Difference']
+# Column types of the Parquet files, fixed per table rather than taken from the first chunk, where
+# a column that happens to be all empty would be typed null and hours would be integers for some
+# users and floats for others
+PERIOD_EXPORT_TYPES = [('Hours', 'float64'), ('ClockifyHours', 'float64'), ('WorkDays', 'int64'),
+                       ('OnTargetDays', 'int64'), ('TargetHours', 'float64')]
+EXPORT_COLUMN_TYPES = {
+    'daily': [('IdNumber', 'string'), ('Date', 'timestamp'), ('DayOfWeek', 'string'), ('FirstIn', 'string'),
+              ('LastOut', 'string'), ('Hours', 'float64'), ('ClockifyHours', 'float64'), ('Difference', 'float64'),
+              ('OnTarget', 'bool')],
+    'weekly': [('IdNumber', 'string'), ('IsoYear', 'int64'), ('Week', 'int64'), *PERIOD_EXPORT_TYPES,
+               ('WeeklyDifference', 'float64'), ('AvgDailyHours', 'float64'), ('OnTargetPercentage', 'float64'),
+               ('Balance', 'float64'), ('Avg4Weeks', 'float64'), ('Avg12Weeks', 'float64')],
+    'monthly': [('IdNumber', 'string'), ('Year', 'int64'), ('Month', 'int64'), *PERIOD_EXPORT_TYPES,
+                ('Difference', 'float64'), ('AvgDailyHours', 'float64'), ('OnTargetPercentage', 'float64'),
+                ('Balance', 'float64')],
+    'timesheet': [('IdNumber', 'string'), ('Date', 'timestamp'), ('FirstIn', 'string'), ('LastOut', 'string'),
+                  ('ClockIn', 'string'), ('ClockOut', 'string'), ('Hours', 'float64')]
+}
+
+def get_export_schema(table):
+    import pyarrow as pa
+    
+    types = {'string': pa.string(), 'timestamp': pa.timestamp('us'), 'float64': pa.float64(),
+             'int64': pa.int64(), 'bool': pa.bool_()}
+    return pa.schema([(column, types[type_name]) for column, type_name in EXPORT_COLUMN_TYPES[table]])
+
+class ExportWriter:
+    # Appends frames chunk by chunk to one CSV, JSON Lines or Parquet file. With compress=True the
+    # text formats are gzipped and Parquet uses zstd. The file is written under a temporary name
+    # and only moved into place once complete, so an interrupted export leaves no partial file.
+    # Parquet chunks are converted to the schema of the table (see EXPORT_COLUMN_TYPES).
+    def __init__(self, path, export_format='csv', compress=False, table=None):
+        self.path = path
+        self.export_format = export_format
+        self.compress = compress
+        self.table = table
+        self.temp_path = f"{path}.tmp"
+        self.file = None
+        self.parquet = None
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        self.close(discard=exc_type is not None)
+
+    def write(self, frame):
+        import gzip
+        
+        if self.export_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            if self.parquet is None:
+                schema = get_export_schema(self.table) if self.table else pa.Schema.from_pandas(frame, preserve_index=False)
+                self.parquet = pq.ParquetWriter(self.temp_path, schema, compression='zstd' if self.compress else 'snappy')
+            self.parquet.write_table(pa.Table.from_pandas(frame, schema=self.parquet.schema, preserve_index=False))
+        else:
+            # Text formats get plain YYYY-MM-DD dates
+            frame = frame.assign(**{column: frame[column].dt.strftime('%Y-%m-%d')
+                                    for column in frame.columns if str(frame[column].dtype).startswith('datetime64')})
+            if self.file is None:
+                opener = gzip.open if self.compress else open
+                self.file = opener(self.temp_path, 'wt', encoding='utf-8', newline='')
+            if self.export_format == 'csv':
+                frame.to_csv(self.file, index=False, header=self.rows == 0)
+            else:
+                frame.to_json(self.file, orient='records', lines=True, force_ascii=False)
+        self.rows += len(frame)
+
+    def close(self, discard=False):
+        for handle in (self.file, self.parquet):
+            if handle is not None:
+                handle.close()
+        self.file = self.parquet = None
+        if not os.path.exists(self.temp_path):
             return
+        if discard:
+            os.remove(self.temp_path)
+        else:
+            os.replace(self.temp_path, self.path)
+
+def get_export_path(export_dir, table, id_number, export_format='csv', compress=False):
+    # Hive-style partitions (export/daily/id_number=123/daily.csv), which pandas, pyarrow and most
+    # BI tools read back as one dataset with an id_number column
+    directory = os.path.join(export_dir, table, f"id_number={id_number}")
+    os.makedirs(directory, exist_ok=True)
+    suffix = '.gz' if compress and export_format != 'parquet' else ''
+    return os.path.join(directory, f"{table}{EXPORT_FORMATS[export_format]}{suffix}")
+
+def iter_export_chunks(store, id_number, table, results=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Frames of at most chunk_rows rows for one user's table; raw timesheet rows are read from the
+    # store cursor in chunks, the analysis tables are sliced from the user's results
+    import pandas as pd
+    
+    if table == 'timesheet':
+        query = ("SELECT date AS Date, first_in AS FirstIn, last_out AS LastOut, clock_in AS ClockIn, "
+                 "clock_out AS ClockOut, hours AS Hours FROM timesheet_days WHERE id_number = ? ORDER BY date")
+        for chunk in pd.read_sql_query(query, store, params=(id_number,), chunksize=chunk_rows):
+            chunk['Date'] = pd.to_datetime(chunk['Date'])
+            yield chunk
+        return
+    
+    frame = results.get(table)
+    if frame is None or frame.empty:
+        return
+    if table == 'daily':
+        frame = frame[EXPORT_DAILY_COLUMNS].assign(DayOfWeek=frame['DayOfWeek'].astype('str'),
+                                                   OnTarget=frame['Hours'] >= results['daily_target'])
+    else:
+        frame = frame.reset_index()
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+def export_user(store, id_number, export_dir, tables=EXPORT_TABLES, export_format='csv', compress=False,
+                daily_target_hours=DEFAULT_DAILY_TARGET, chunk_rows=EXPORT_CHUNK_ROWS):
+    # One user's tables into their partitions; returns {table: rows written}
+    results = None
+    if any(table != 'timesheet' for table in tables):
+        results = load_user_analysis(store, id_number, daily_target_hours, formatted=False)
+    
+    written = {}
+    for table in tables:
+        with stage('write', table=table, format=export_format):
+            chunks = iter_export_chunks(store, id_number, table, results, chunk_rows)
+            with ExportWriter(get_export_path(export_dir, table, id_number, export_format, compress),
+                              export_format, compress, table) as writer:
+                for chunk in chunks:
+                    chunk = chunk.copy()
+                    chunk.insert(0, 'IdNumber', id_number)
+                    writer.write(chunk)
+            written[table] = writer.rows
+    return written
+
+def export_team(store, id_numbers, export_dir=EXPORT_DIR, tables=EXPORT_TABLES, export_format='csv',
+                compress=False, daily_target_hours=DEFAULT_DAILY_TARGET, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Users are exported one after another, so only one user's history is in memory at a time
+    if export_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        print("Exporting Parquet needs pyarrow (pip install pyarrow)")
+        return False
+    for id_number in id_numbers:
+        written = export_user(store, id_number, export_dir, tables, export_format, compress,
+                              daily_target_hours, chunk_rows)
+        print(f"{id_number}: " + ", ".join(f"{rows} {table} rows" for table, rows in written.items()))
+    print(f"Exported {len(id_numbers)} users to {os.path.abspath(export_dir)}")
+    return True
+
+def open_report(report_path):
+    import webbrowser
+    print("Opening report in browser...")
+    webbrowser.open_new_tab(f'file://{report_path}')
+
+def command_run(args, config, daily_target_hours):
+    # Default command: fetch, analyse, write the report and open it
+    config = get_config_values(args.config)
+    
+    if config.get('id_numbers'):
+        run_batch(config, daily_target_hours)
+        return
+    
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        if fetch_user_data(config, store) is None:
+            return
+        report_path = os.path.abspath(args.output)
+        write_user_report(config, store, config['id_number'], report_path, daily_target_hours)
+    finally:
+        store.close()
+    open_report(report_path)
+
+def command_reports(args, config, daily_target_hours):
+    # Re-render every user's report from the store in parallel, with the team index
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        id_numbers = args.ids or config.get('id_numbers') or [row[0] for row in store.execute(
+            "SELECT DISTINCT id_number FROM timesheet_days ORDER BY id_number")]
+        if not id_numbers:
+            print("No stored timesheet data to report on")
+            return
+        render_team_reports(config, store, id_numbers, args.dir, daily_target_hours,
+                            args.workers or config.get('report_workers'), args.force)
+    finally:
+        store.close()
+    if args.open:
+        open_report(os.path.abspath(os.path.join(args.dir, TEAM_INDEX_FILE)))
+
+def command_fetch(args, config, daily_target_hours):
+    config = get_config_values(args.config)
+    
+    if args.ids or config.get('id_numbers'):
+        run_batch({**config, 'id_numbers': args.ids or config['id_numbers']}, daily_target_hours, write_reports=False)
+        return
+    
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        fetch_user_data(config, store)
+    finally:
+        store.close()
+
+def command_analyze(args, config, daily_target_hours):
+    if args.history:
+        results = load_history_analysis(args.history, args.id, daily_target_hours)
+    else:
+        store = open_store(config.get('store_file', STORE_FILE))
+        try:
+            results = load_user_analysis(store, args.id, daily_target_hours)
+        finally:
+            store.close()
+    
+    daily = results['daily']
+    if daily.empty:
+        print(f"No stored timesheet data for {args.id}")
+        return
+    print(daily[['Date', 'DayOfWeek', 'FirstIn', 'LastOut', 'HoursFormatted', 'ClockifyHoursFormatted',
+                 'DifferenceFormatted']].tail(args.days).to_string(index=False))
+    print()
+    print(results['weekly'][['WorkDays', 'OnTargetDays', 'HoursFormatted', 'ClockifyHoursFormatted',
+                             'WeeklyDifferenceFormatted', 'Avg4WeeksFormatted', 'BalanceFormatted']].tail(args.weeks).to_string())
+    print()
+    print(results['monthly'][['WorkDays', 'HoursFormatted', 'TargetHoursFormatted', 'DifferenceFormatted',
+                              'BalanceFormatted']].tail(args.months).to_string())
+    print()
+    print(f"Balance over all stored days: {format_hours_minutes(abs(results['balance']), sign=results['balance'])}")
+
+def command_reconcile(args, config, daily_target_hours):
+    # Clockify logging against badge time, per user: totals over the stored history, then the most
+    # recent days
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        # Default: the configured users, or everyone in the store
+        id_numbers = args.ids or config.get('id_numbers') or ([config['id_number']] if config.get('id_number') else None)
+        with stage('load'):
+            punches, entries = load_team_intervals(store, id_numbers)
+    finally:
+        store.close()
+    if punches.empty and entries.empty:
+        print("No stored punches or timed Clockify entries to reconcile")
+        return
+    with stage('analyze'):
+        results = reconcile_intervals(punches, entries, args.tolerance)
+    
+    daily = results['daily']
+    hour_columns = ['OnSiteHours', 'ClockifyHours', 'OverlapHours', 'GapHours', 'OutOfHoursHours']
+    totals = daily.groupby(level='IdNumber').sum()
+    print(totals[hour_columns].apply(format_hours_minutes_series).assign(
+        OutOfHoursEntries=totals['OutOfHoursEntries']).to_string())
+    for id_number, user_daily in daily.groupby(level='IdNumber'):
+        print()
+        print(f"{id_number}:")
+        recent = user_daily.droplevel('IdNumber').tail(args.days)
+        print(recent[hour_columns].apply(format_hours_minutes_series).assign(
+            OutOfHoursEntries=recent['OutOfHoursEntries']).to_string())
+
+def command_report(args, config, daily_target_hours):
+    # Re-render the report from the local store (or the saved snapshot files), without a
+    # browser or network access
+    report_path = os.path.abspath(args.output)
+    if args.snapshot:
+        if not os.path.exists(args.html):
+            print(f"No saved timesheet at {args.html}; run `python main.py fetch` or `python main.py run` first "
+                  "(batch runs don't save one)")
+            return
+        write_snapshot_report(config, report_path, daily_target_hours, args.html, args.snapshot_file, args.force)
+    else:
+        store = open_store(config.get('store_file', STORE_FILE))
+        try:
+            write_user_report(config, store, args.id, report_path, daily_target_hours, args.force)
+        finally:
+            store.close()
+    if args.open:
+        open_report(report_path)
+
+SERVE_REFRESH_MINUTES = 15
+SSE_KEEPALIVE_SECONDS = 30
+DAILY_UPDATE_COLUMNS = ('firstIn', 'lastOut', 'hours', 'clockify', 'diff')
+
+def refresh_user_data(config, id_number, daily_target_hours=DEFAULT_DAILY_TARGET, fetch=True, balances=None):
+    # Runs in a worker thread, so it uses its own store connection. balances is the (PeriodBalances,
+    # revision) pair returned by the previous refresh; only the days written since are fed into it.
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        if fetch:
+            fetch_user_data({**config, 'id_number': id_number}, store)
+        balances = update_period_balances(store, id_number, daily_target_hours, balances)
+        results = load_user_analysis(store, id_number, daily_target_hours, False, balances[0])
+        return results, load_user_name(store, id_number), balances
+    finally:
+        store.close()
+
+def get_daily_rows(data):
+    daily = data.get('daily')
+    if not daily:
+        return {}
+    return {
+        date: tuple(daily[column][i] for column in DAILY_UPDATE_COLUMNS) + (daily['tooltips'].get(date),)
+        for i, date in enumerate(daily['date'])
+    }
+
+def get_report_update(old_data, new_data, old_weekly_rows, new_weekly_rows):
+    # Only what differs between two versions of the report data: the days that were added or
+    # changed, the days that are gone, and the weekly block if anything in it moved
+    update = {}
+    old_rows, new_rows = get_daily_rows(old_data), get_daily_rows(new_data)
+    changed = [i for i, (date, row) in enumerate(new_rows.items()) if old_rows.get(date) != row]
+    if changed:
+        daily = new_data['daily']
+        dates = [daily['date'][i] for i in changed]
+        update['daily'] = {column: [daily[column][i] for i in changed] for column in DAILY_UPDATE_COLUMNS}
+        update['daily']['date'] = dates
+        update['daily']['tooltips'] = {date: daily['tooltips'][date] for date in dates if date in daily['tooltips']}
+    removed = [date for date in old_rows if date not in new_rows]
+    if removed:
+        update['removed'] = removed
+    if new_data.get('weekly') != old_data.get('weekly') or new_weekly_rows != old_weekly_rows:
+        update['weekly'] = new_data.get('weekly')
+        update['weeklyRows'] = new_weekly_rows
+    return update
+
+def frame_to_json(df):
+    df = df.reset_index() if any(df.index.names) else df
+    df = df.assign(**{column: df[column].dt.strftime('%Y-%m-%d')
+                      for column in df.columns if str(df[column].dtype).startswith('datetime64')})
+    return df.to_json(orient='records', default_handler=str)
+
+class LiveReport:
+    # The latest analysis for one user, and the event streams of the pages showing it
+    def __init__(self, config, id_number, daily_target_hours=DEFAULT_DAILY_TARGET):
+        self.config = config
+        self.id_number = id_number
+        self.daily_target_hours = daily_target_hours
+        self.page_size = config.get('report_page_size', REPORT_PAGE_SIZE)
+        self.results = None
+        self.user_name = None
+        self.data = {}
+        self.weekly_rows = ''
+        self.html = None
+        self.refreshed = None
+        self.refresh_seconds = None
+        self.listeners = set()
+        self.balances = None
+    
+    async def refresh(self, fetch=True):
+        import asyncio
         
-        clockify_df = None
-        if config.get('clockify_api_key') and config.get('clockify_workspace_id'):
-            print("Retrieving Clockify data...")
-            clockify_df = get_clockify_data(config['clockify_api_key'], config['clockify_workspace_id'])
+        start = time.perf_counter()
+        try:
+            results, user_name, self.balances = await asyncio.to_thread(
+                refresh_user_data, self.config, self.id_number, self.daily_target_hours, fetch, self.balances)
+        except Exception:
+            # The store may have changed part way through, so the next refresh starts over
+            self.balances = None
+            raise
+        self.refresh_seconds = time.perf_counter() - start
+        return self.set_results(results, user_name)
+    
+    def set_results(self, results, user_name):
+        data = get_report_data(results, self.page_size)
+        weekly_rows = io.StringIO()
+        if results.get('weekly') is not None and not results['weekly'].empty:
+            write_weekly_rows(weekly_rows, results['weekly'])
+        weekly_rows = weekly_rows.getvalue()
         
-        df = parse_timesheet(html_content)
-        analysis_results = analyze_timesheet(df, daily_target_hours, clockify_df)
-        html_report = generate_html_report(analysis_results, user_name)
+        update = {}
+        if self.results is not None:
+            update = get_report_update(self.data, data, self.weekly_rows, weekly_rows)
+        self.results, self.user_name, self.data, self.weekly_rows = results, user_name, data, weekly_rows
+        self.refreshed = datetime.now()
+        if update:
+            # Rendered lazily on the next page load
+            self.html = None
+            update['generated'] = self.refreshed.strftime('%Y-%m-%d %H:%M:%S')
+            for listener in self.listeners:
+                listener.put_nowait(update)
+        return update
+    
+    def get_html(self):
+        if self.html is None:
+            self.html = generate_html_report(self.results, self.user_name, self.config.get('chart_js_file'),
+                                             self.page_size, live=True).encode('utf-8')
+        return self.html
+    
+    def get_status(self):
+        return {
+            'id_number': self.id_number,
+            'refreshed': self.refreshed.isoformat() if self.refreshed else None,
+            'refresh_seconds': self.refresh_seconds,
+            'listeners': len(self.listeners)
+        }
+
+async def send_response(writer, status, body, content_type='application/json'):
+    from http import HTTPStatus
+    
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    writer.write(
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Cache-Control: no-cache\r\n"
+        f"Connection: close\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+
+async def stream_report_events(live, writer):
+    # Server-sent events: one 'update' event per refresh that changed anything, with a
+    # comment line in between so proxies and browsers keep the connection open
+    import asyncio
+    
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                 b"Connection: keep-alive\r\n\r\n")
+    await writer.drain()
+    updates = asyncio.Queue()
+    live.listeners.add(updates)
+    try:
+        while True:
+            try:
+                update = await asyncio.wait_for(updates.get(), SSE_KEEPALIVE_SECONDS)
+                message = f"event: update\ndata: {json.dumps(update, separators=(',', ':'))}\n\n"
+            except asyncio.TimeoutError:
+                message = ": keepalive\n\n"
+            writer.write(message.encode('utf-8'))
+            await writer.drain()
+    finally:
+        # Also when the server shuts down with the page still open; the cancellation carries on
+        live.listeners.discard(updates)
 
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(html_report)
-        print(f"HTML report saved to: {report_path}")
-        print("Opening report in browser...")
-        webbrowser.open_new_tab(f'file://{report_path}')
+async def close_writer(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (ConnectionError, OSError):
+        pass
+
+async def read_request(reader):
+    # Method and path of a request; headers and any body are not needed by these servers
+    request_line = (await reader.readline()).decode('latin-1').split()
+    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+        pass
+    if len(request_line) < 2:
+        return None, None
+    return request_line[0], request_line[1].split('?', 1)[0]
+
+async def handle_report_request(live, reader, writer):
+    try:
+        method, path = await read_request(reader)
+        if method != 'GET':
+            await send_response(writer, 405, '{"error": "method not allowed"}')
+        elif path in ('/', '/index.html'):
+            await send_response(writer, 200, live.get_html(), 'text/html; charset=utf-8')
+        elif path == '/events':
+            await stream_report_events(live, writer)
+        elif path == '/api/daily':
+            await send_response(writer, 200, frame_to_json(live.results['daily']))
+        elif path == '/api/weekly':
+            weekly = live.results.get('weekly')
+            await send_response(writer, 200, '[]' if weekly is None else frame_to_json(weekly))
+        elif path == '/api/status':
+            await send_response(writer, 200, json.dumps(live.get_status()))
+        else:
+            await send_response(writer, 404, '{"error": "not found"}')
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        await close_writer(writer)
+
+async def refresh_periodically(live, interval):
+    import asyncio
+    
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            update = await live.refresh()
+            changed = len(update.get('daily', {}).get('date', [])) + len(update.get('removed', []))
+            print(f"Refreshed in {live.refresh_seconds:.1f}s: {changed} day(s) changed")
+        except Exception as e:
+            print(f"Refresh failed: {str(e)}")
+
+async def serve_live_report(live, host, port, refresh_minutes):
+    import asyncio
+    from functools import partial
+    
+    # The page is served from the stored data straight away; fresh data is fetched in the
+    # background and only the days that changed are pushed to open pages
+    await live.refresh(fetch=False)
+    server = await asyncio.start_server(partial(handle_report_request, live), host, port)
+    refresher = None
+    if refresh_minutes:
+        refresher = asyncio.create_task(refresh_periodically(live, refresh_minutes * 60))
+    print(f"Serving report at http://{host}:{port}/ (Ctrl+C to stop)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if refresher:
+            refresher.cancel()
+
+def command_serve(args, config, daily_target_hours):
+    import asyncio
+    
+    refresh_minutes = args.refresh if args.refresh is not None else config.get('serve_refresh_minutes', SERVE_REFRESH_MINUTES)
+    live = LiveReport(config, args.id, daily_target_hours)
+    try:
+        asyncio.run(serve_live_report(live, args.host, args.port, refresh_minutes))
+    except KeyboardInterrupt:
+        pass
+
+DAEMON_INTERVAL_MINUTES = 30
+DAEMON_WORKERS = 2
+SDMATACLICK_MIN_INTERVAL = 2.0
+
+class SyncDaemon:
+    # Periodic syncs for every configured ID in one long-running process. The Clockify client,
+    # an HTTP session per user (its connections, not its cookies), the browser pool and a hash of each user's last timesheet page
+    # stay alive between cycles, so a cycle only pays for the requests themselves.
+    def __init__(self, config, id_numbers, daily_target_hours=DEFAULT_DAILY_TARGET):
+        self.config = config
+        self.id_numbers = list(id_numbers)
+        self.daily_target_hours = daily_target_hours
+        self.interval = config.get('daemon_interval_minutes', DAEMON_INTERVAL_MINUTES) * 60
+        self.backend = config.get('fetch_backend', 'auto')
+        self.recheck_days = config.get('recheck_days', DEFAULT_RECHECK_DAYS)
+        self.limiter = RateLimiter(config.get('sdmataclick_min_interval', SDMATACLICK_MIN_INTERVAL))
+        self.executor = ThreadPoolExecutor(max_workers=config.get('daemon_workers', DAEMON_WORKERS))
+        self.pool = DriverPool(config.get('browser_pool_size', 2))
+        self.client = None
+        if config.get('clockify_api_key') and config.get('clockify_workspace_id'):
+            self.client = ClockifyClient(config['clockify_api_key'])
+        self.sessions = {}
+        self.page_hashes = {}
+        # (PeriodBalances, store revision) per user, fed the days written since (see update_period_balances)
+        self.balances = {}
+        self.tasks = {}
+        self.started = datetime.now()
+        self.next_cycle = None
+        self.status = {id_number: {
+            'state': 'idle',
+            'last_sync': None,
+            'last_success': None,
+            'last_latency_seconds': None,
+            'last_error': None,
+            'syncs': 0,
+            'failures': 0,
+            'coalesced': 0
+        } for id_number in self.id_numbers}
+    
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+        if self.client:
+            self.client.close()
+        for session in self.sessions.values():
+            session.close()
+    
+    def get_report_path(self, id_number):
+        if len(self.id_numbers) == 1:
+            return os.path.abspath('timesheet_report.html')
+        return os.path.abspath(f'timesheet_report_{id_number}.html')
+    
+    def sync_user(self, id_number):
+        # Runs on the worker pool; every sync gets its own store connection
+        import requests
         
+        metrics = StepMetrics('daemon_sync', id_number=id_number)
+        session = self.sessions.get(id_number)
+        if session is None:
+            session = self.sessions[id_number] = requests.Session()
+        # Only the connections are reused: every fetch logs in afresh, not with the
+        # previous cycle's ASP.NET cookies
+        session.cookies.clear()
+        
+        try:
+            with metrics.step('fetch'):
+                self.limiter.wait()
+                html_content, user_name = fetch_timesheet_pooled(self.pool, id_number, self.backend,
+                                                                 self.config.get('step_timeouts'), session)
+            if html_content is None:
+                raise RuntimeError("Failed to retrieve timesheet data")
+            
+            store = open_store(self.config.get('store_file', STORE_FILE))
+            try:
+                # The Clockify key belongs to the user in config['id_number']
+                sync_clockify_here = self.client and id_number == self.config.get('id_number')
+                
+                # An unchanged page needs no parsing or merging
+                page_hash = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+                if self.page_hashes.get(id_number) != page_hash:
+                    with metrics.step('store'):
+                        store_timesheet(store, id_number, parse_timesheet(html_content), self.recheck_days)
+                        save_user_name(store, id_number, user_name)
+                    self.page_hashes[id_number] = page_hash
+                
+                if sync_clockify_here:
+                    with metrics.step('clockify'):
+                        sync_clockify(store, id_number, self.config['clockify_api_key'],
+                                      self.config['clockify_workspace_id'], self.recheck_days, self.client,
+                                      self.config.get('timezone'),
+                                      self.config.get('clockify_initial_days', CLOCKIFY_INITIAL_DAYS))
+                
+                with metrics.step('report'):
+                    balances = self.balances[id_number] = update_period_balances(
+                        store, id_number, self.daily_target_hours, self.balances.get(id_number))
+                    write_user_report(self.config, store, id_number, self.get_report_path(id_number),
+                                      self.daily_target_hours, balances=balances[0])
+            finally:
+                store.close()
+        except Exception as e:
+            # The store may have changed part way through, so the next sync starts over
+            self.balances.pop(id_number, None)
+            metrics.emit(get_error_status(e))
+            raise
+        metrics.emit()
+    
+    def request_sync(self, id_number):
+        # Requests for a user whose sync is still running join that sync instead of
+        # starting another one
+        import asyncio
+        
+        task = self.tasks.get(id_number)
+        if task is not None and not task.done():
+            self.status[id_number]['coalesced'] += 1
+            return task
+        task = self.tasks[id_number] = asyncio.ensure_future(self.run_sync(id_number))
+        return task
+    
+    async def run_sync(self, id_number):
+        import asyncio
+        
+        status = self.status[id_number]
+        status['state'] = 'syncing'
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.sync_user, id_number)
+            status['last_success'] = datetime.now().isoformat()
+            status['last_error'] = None
+        except Exception as e:
+            status['failures'] += 1
+            status['last_error'] = str(e)
+            print(f"Sync failed for {id_number}: {str(e)}")
+        finally:
+            status['state'] = 'idle'
+            status['syncs'] += 1
+            status['last_sync'] = datetime.now().isoformat()
+            status['last_latency_seconds'] = round(time.perf_counter() - start, 3)
+    
+    async def run_schedule(self):
+        import asyncio
+        
+        while True:
+            started = time.monotonic()
+            await asyncio.gather(*(self.request_sync(id_number) for id_number in self.id_numbers))
+            # The next cycle is timed from the start of this one
+            delay = max(0, self.interval - (time.monotonic() - started))
+            self.next_cycle = (datetime.now() + timedelta(seconds=delay)).isoformat()
+            await asyncio.sleep(delay)
+    
+    def is_healthy(self):
+        # Healthy while every user has synced successfully within the last two intervals
+        # (users that have not finished a first sync yet do not count against it)
+        limit = datetime.now() - timedelta(seconds=2 * self.interval)
+        for status in self.status.values():
+            if status['syncs'] and (status['last_success'] is None
+                                    or datetime.fromisoformat(status['last_success']) < limit):
+                return False
+        return True
+    
+    def get_status(self):
+        return {
+            'healthy': self.is_healthy(),
+            'started': self.started.isoformat(),
+            'interval_seconds': self.interval,
+            'next_cycle': self.next_cycle,
+            'users': self.status
+        }
+
+async def handle_daemon_request(daemon, reader, writer):
+    try:
+        method, path = await read_request(reader)
+        if method == 'GET' and path == '/status':
+            await send_response(writer, 200, json.dumps(daemon.get_status()))
+        elif method == 'GET' and path == '/metrics':
+            await send_response(writer, 200, format_openmetrics(),
+                                'application/openmetrics-text; version=1.0.0; charset=utf-8')
+        elif method == 'GET' and path == '/health':
+            healthy = daemon.is_healthy()
+            await send_response(writer, 200 if healthy else 503, json.dumps({'healthy': healthy}))
+        elif method == 'POST' and (path == '/sync' or path.startswith('/sync/')):
+            id_numbers = [path[len('/sync/'):]] if path.startswith('/sync/') else daemon.id_numbers
+            if not all(id_number in daemon.status for id_number in id_numbers):
+                await send_response(writer, 404, '{"error": "unknown ID number"}')
+                return
+            for id_number in id_numbers:
+                daemon.request_sync(id_number)
+            await send_response(writer, 202, json.dumps({'syncing': id_numbers}))
+        elif path in ('/status', '/health', '/metrics', '/sync') or path.startswith('/sync/'):
+            await send_response(writer, 405, '{"error": "method not allowed"}')
+        else:
+            await send_response(writer, 404, '{"error": "not found"}')
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        await close_writer(writer)
+
+async def run_daemon(daemon, host, port):
+    import asyncio
+    from functools import partial
+    
+    server = await asyncio.start_server(partial(handle_daemon_request, daemon), host, port)
+    schedule = asyncio.create_task(daemon.run_schedule())
+    print(f"Syncing {len(daemon.id_numbers)} user(s) every {daemon.interval / 60:g} minutes; "
+          f"status at http://{host}:{port}/status (Ctrl+C to stop)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        schedule.cancel()
+
+def command_daemon(args, config, daily_target_hours):
+    import asyncio
+    
+    id_numbers = config.get('id_numbers') or ([config['id_number']] if config.get('id_number') else [])
+    if not id_numbers:
+        print("No ID numbers configured; set id_number or id_numbers in the config")
+        return
+    if args.interval is not None:
+        config = {**config, 'daemon_interval_minutes': args.interval}
+    
+    daemon = SyncDaemon(config, id_numbers, daily_target_hours)
+    try:
+        asyncio.run(run_daemon(daemon, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+
+def command_export(args, config, daily_target_hours):
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        # Default: every user in the store
+        id_numbers = args.ids or [row[0] for row in store.execute(
+            "SELECT DISTINCT id_number FROM timesheet_days ORDER BY id_number")]
+        if not id_numbers:
+            print("No stored timesheet data to export")
+            return
+        export_team(store, id_numbers, args.dir, args.tables or EXPORT_TABLES, args.format, args.compress,
+                    daily_target_hours)
+    finally:
+        store.close()
+
+def command_backfill(args, config, daily_target_hours):
+    # The Clockify API key belongs to the user in config['id_number']
+    if not (config.get('clockify_api_key') and config.get('clockify_workspace_id') and config.get('id_number')):
+        print("Backfill needs id_number, clockify_api_key and clockify_workspace_id in the config")
+        return
+    try:
+        end_date = datetime.strptime(args.end, '%Y-%m-%d').date() if args.end else datetime.now().date()
+        start_date = (datetime.strptime(args.start, '%Y-%m-%d').date() if args.start
+                      else end_date - timedelta(days=config.get('backfill_days', BACKFILL_DAYS) - 1))
+    except ValueError as e:
+        print(f"Invalid date: {e}")
+        return
+    if start_date > end_date:
+        print("The start date is after the end date")
+        return
+    chunk_days = args.chunk_days or config.get('backfill_chunk_days', BACKFILL_CHUNK_DAYS)
+    workers = args.workers or config.get('backfill_workers', BACKFILL_WORKERS)
+    if chunk_days < 1 or workers < 1:
+        print("--chunk-days and --workers must be at least 1")
+        return
+    
+    store = open_store(config.get('store_file', STORE_FILE))
+    try:
+        remaining = backfill_clockify(
+            store, config['id_number'], config['clockify_api_key'], config['clockify_workspace_id'],
+            start_date, end_date, chunk_days, workers, config.get('timezone'), args.restart
+        )
+        if remaining:
+            print(f"{remaining} chunks could not be fetched; run the same command again to resume")
+        elif config.get('history_dir'):
+            save_history(store, config['history_dir'], [config['id_number']])
+    except KeyboardInterrupt:
+        print("Backfill interrupted; run the same command again to resume")
+    finally:
+        store.close()
+
+COMMANDS = {
+    'run': command_run,
+    'fetch': command_fetch,
+    'analyze': command_analyze,
+    'reconcile': command_reconcile,
+    'report': command_report,
+    'reports': command_reports,
+    'serve': command_serve,
+    'daemon': command_daemon,
+    'backfill': command_backfill,
+    'export': command_export
+}
+
+def build_parser():
+    import argparse
+    
+    # The shared options are accepted before or after the command; the copies on the
+    # subcommands suppress their defaults so they do not override a value given before it
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default=argparse.SUPPRESS, help=f"config file (default: {CONFIG_FILE})")
+    common.add_argument('--target', type=float, default=argparse.SUPPRESS,
+                        help="daily target hours (default: daily_target_hours from the config, or 9)")
+    common.add_argument('--profile', default=argparse.SUPPRESS, metavar='FILE',
+                        help="profile the command with cProfile and save the stats to FILE")
+    
+    user = argparse.ArgumentParser(add_help=False)
+    user.add_argument('--id', help="ID number to use (default: id_number from the config)")
+    user.add_argument('--output', default='timesheet_report.html', help="report file (default: timesheet_report.html)")
+    
+    # For the commands that fetch from Clockify
+    clockify = argparse.ArgumentParser(add_help=False)
+    clockify.add_argument('--refresh-clockify-cache', action='store_true',
+                          help=f"forget the cached Clockify project and task names ({CLOCKIFY_CACHE_FILE}) first")
+    
+    parser = argparse.ArgumentParser(description="Retrieve and analyse SDMataClick timesheets.")
+    parser.add_argument('--config', default=CONFIG_FILE, help=f"config file (default: {CONFIG_FILE})")
+    parser.add_argument('--target', type=float, help="daily target hours (default: daily_target_hours from the config, or 9)")
+    parser.add_argument('--profile', metavar='FILE', help="profile the command with cProfile and save the stats to FILE")
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    
+    run = subparsers.add_parser('run', parents=[common, clockify], help="fetch, analyse and open the report (default)")
+    run.add_argument('--output', default='timesheet_report.html', help="report file (default: timesheet_report.html)")
+    
+    fetch = subparsers.add_parser('fetch', parents=[common, clockify], help="retrieve new timesheet and Clockify data into the local store")
+    fetch.add_argument('--ids', nargs='+', help="ID numbers to fetch as a batch (default: id_numbers or id_number from the config)")
+    
+    analyze = subparsers.add_parser('analyze', parents=[common], help="print the analysis of the stored data")
+    analyze.add_argument('--id', help="ID number to use (default: id_number from the config)")
+    analyze.add_argument('--days', type=int, default=10, help="number of recent days to print (default: 10)")
+    analyze.add_argument('--weeks', type=int, default=12, help="number of recent weeks to print (default: 12)")
+    analyze.add_argument('--months', type=int, default=12, help="number of recent months to print (default: 12)")
+    analyze.add_argument('--history', help="read the Parquet history in this directory instead of the store")
+    
+    reconcile = subparsers.add_parser('reconcile', parents=[common],
+                                      help="compare Clockify time with badge time: overlap, gaps and out-of-hours logging")
+    reconcile.add_argument('--ids', nargs='+', help="ID numbers to reconcile (default: id_numbers or id_number from the config, or every user in the store)")
+    reconcile.add_argument('--days', type=int, default=10, help="number of recent days to print per user (default: 10)")
+    reconcile.add_argument('--tolerance', type=float, default=RECONCILE_TOLERANCE_MINUTES,
+                           help=f"minutes outside badge time before an entry counts as out of hours (default: {RECONCILE_TOLERANCE_MINUTES})")
+    
+    report = subparsers.add_parser('report', parents=[common, user], help="re-render the report from the stored data")
+    report.add_argument('--open', action='store_true', help="open the report in the browser")
+    report.add_argument('--force', action='store_true', help="render even if the inputs have not changed")
+    report.add_argument('--snapshot', action='store_true',
+                        help="render from the saved table HTML and Clockify snapshot instead of the store")
+    report.add_argument('--html', default=TIMESHEET_HTML_FILE, help=f"saved table HTML (default: {TIMESHEET_HTML_FILE})")
+    report.add_argument('--snapshot-file', default=SNAPSHOT_FILE, help=f"Clockify snapshot (default: {SNAPSHOT_FILE})")
+    
+    reports = subparsers.add_parser('reports', parents=[common],
+                                    help="re-render every user's report in parallel, with a team index page")
+    reports.add_argument('--ids', nargs='+', help="ID numbers to render (default: id_numbers from the config, or every user in the store)")
+    reports.add_argument('--dir', default='.', help="directory for the reports and the index (default: current directory)")
+    reports.add_argument('--workers', type=int, help="worker processes (default: report_workers from the config, or one per CPU)")
+    reports.add_argument('--force', action='store_true', help="render even if the inputs have not changed")
+    reports.add_argument('--open', action='store_true', help="open the team index in the browser")
+    
+    serve = subparsers.add_parser('serve', parents=[common, user, clockify], help="serve a live report over HTTP")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.add_argument('--refresh', type=float,
+                       help=f"minutes between background refreshes, 0 to disable (default: {SERVE_REFRESH_MINUTES})")
+    
+    daemon = subparsers.add_parser('daemon', parents=[common, clockify], help="sync every configured ID on a schedule")
+    daemon.add_argument('--host', default='127.0.0.1')
+    daemon.add_argument('--port', type=int, default=8001)
+    daemon.add_argument('--interval', type=float,
+                        help=f"minutes between sync cycles (default: {DAEMON_INTERVAL_MINUTES})")
+    
+    backfill = subparsers.add_parser('backfill', parents=[common, clockify],
+                                     help="fetch a longer range of Clockify history into the store, resumably")
+    backfill.add_argument('--start', help=f"first day, YYYY-MM-DD (default: the {BACKFILL_DAYS} days up to --end)")
+    backfill.add_argument('--end', help="last day, YYYY-MM-DD (default: today)")
+    backfill.add_argument('--chunk-days', type=int, help=f"days fetched per request chunk (default: {BACKFILL_CHUNK_DAYS})")
+    backfill.add_argument('--workers', type=int, help=f"chunks fetched at the same time (default: {BACKFILL_WORKERS})")
+    backfill.add_argument('--restart', action='store_true', help="forget earlier progress and fetch every chunk again")
+    
+    export = subparsers.add_parser('export', parents=[common], help="write the stored data and its analysis to files")
+    export.add_argument('--ids', nargs='+', help="ID numbers to export (default: every user in the store)")
+    export.add_argument('--dir', default=EXPORT_DIR, help=f"output directory (default: {EXPORT_DIR})")
+    export.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv', help="file format (default: csv)")
+    export.add_argument('--tables', nargs='+', choices=EXPORT_TABLES, metavar='TABLE',
+                        help=f"tables to export: {', '.join(EXPORT_TABLES)} (default: all)")
+    export.add_argument('--compress', action='store_true', help="gzip CSV and JSON Lines, zstd for Parquet")
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command = args.command or 'run'
+    if command == 'run' and not hasattr(args, 'output'):
+        args.output = 'timesheet_report.html'
+    
+    started = time.perf_counter()
+    config = load_config(args.config)
+    metrics_file, metrics_format = config.get('metrics_file'), config.get('metrics_format', 'jsonl')
+    try:
+        configure_metrics(metrics_file, metrics_format, config.get('metrics_memory', False))
+    except ValueError as e:
+        print(f"Error in config: {e}")
+        return
+    # Timed by hand since metrics are only configured once the config is loaded
+    run_metrics.add('config_load', time.perf_counter() - started)
+    
+    daily_target_hours = args.target or config.get('daily_target_hours', DEFAULT_DAILY_TARGET)
+    if getattr(args, 'id', None) is None and command in ('analyze', 'report', 'serve') and not getattr(args, 'snapshot', False):
+        args.id = config.get('id_number')
+        if not args.id:
+            print("No ID number given and none saved in the config; use --id")
+            return
+    
+    if getattr(args, 'refresh_clockify_cache', False):
+        invalidate_clockify_cache(config.get('clockify_workspace_id'))
+    
+    profile_file = getattr(args, 'profile', None)
+    profiler = None
+    if profile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with stage('command', command=command):
+            COMMANDS[command](args, config, daily_target_hours)
     except Exception as e:
-        print(f"An error occurred: {str(e)}")  
+        print(f"An error occurred: {str(e)}")
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            print(f"Profile saved to {profile_file} (inspect it with: python -m pstats {profile_file})")
+        write_metrics(metrics_file, metrics_format)
         
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,121 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import main
+
+def make_daily(hours_by_date, clockify=0.0):
+    dates = pd.to_datetime(list(hours_by_date))
+    return pd.DataFrame({'Date': dates, 'Hours': list(hours_by_date.values()), 'ClockifyHours': clockify})
+
+def test_format_hours_minutes_series_matches_scalar():
+    values = pd.Series([0.0, 0.5, 1.0, 1.05, 9.99, None])
+    expected = [main.format_hours_minutes(value) for value in values]
+    assert main.format_hours_minutes_series(values).tolist() == expected
+    signed = pd.Series([-1.5, 2.25])
+    assert main.format_hours_minutes_series(signed, signed=True).tolist() == ['-1h 30min', '+2h 15min']
+
+def test_format_hours_minutes_series_empty():
+    assert main.format_hours_minutes_series(pd.Series([], dtype='float64')).tolist() == []
+    assert main.format_hours_minutes_series(pd.Series([], dtype='float64'), signed=True).tolist() == []
+
+def test_analyze_timesheet_without_work_days():
+    df = pd.DataFrame({'Date': pd.to_datetime(['2026-10-17']), 'FirstIn': ['08:00'], 'LastOut': ['17:00'],
+                       'ClockIn': [None], 'ClockOut': [None], 'Hours': [9.0]})
+    assert main.analyze_timesheet(df, 8)['daily'].empty
+
+def test_clockify_days_keep_offsets_and_build_tooltips():
+    entries = main.ClockifyEntries()
+    for entry_id, day, hours, description, project, task in [
+        ('a', date(2026, 10, 13), 1.0, 'Review', 'Web', 'No task'),
+        ('b', date(2026, 10, 12), 2.0, 'Planning', 'No project', 'No task'),
+        ('c', date(2026, 10, 13), 0.5, 'Review', 'Web', 'No task'),
+        ('d', date(2026, 10, 13), 0.5, '', 'Web', 'Bugs'),
+    ]:
+        entries.add(entry_id, day, hours, description, project, task)
+    clockify_days = main.group_clockify_entries(entries)
+    assert clockify_days.frame[['EntryStart', 'EntryStop']].values.tolist() == [[0, 1], [1, 4]]
+    assert clockify_days.frame['ClockifyHours'].tolist() == [2.0, 2.0]
+    
+    df = pd.DataFrame({'Date': pd.to_datetime(['2026-10-12', '2026-10-13', '2026-10-14']), 'FirstIn': '08:00',
+                       'LastOut': '17:00', 'ClockIn': None, 'ClockOut': None, 'Hours': 9.0})
+    results = main.analyze_timesheet(df, 8, clockify_days, formatted=False)
+    assert 'EntryStart' not in results['daily'].columns
+    assert results['_clockify_tooltips'] == {
+        '2026-10-12': '<ul><li>Planning</li></ul>',
+        '2026-10-13': '<ul><li>Review<br>Project: Web</li><li>Project: Web<br>Task: Bugs</li></ul>',
+    }
+
+def test_period_balances():
+    # Mon-Tue of ISO week 2026-W01 (in December 2025) and Monday of the next week
+    balances = main.PeriodBalances.from_daily(make_daily({'2025-12-29': 9.0, '2025-12-30': 7.0, '2026-01-05': 8.5}), 8)
+    weekly = balances.get_weekly()
+    assert weekly.index.tolist() == [(2026, 1), (2026, 2)]
+    assert weekly['WeeklyDifference'].tolist() == [0.0, 0.5]
+    assert weekly['Balance'].tolist() == [0.0, 0.5]
+    monthly = balances.get_monthly()
+    assert monthly.index.tolist() == [(2025, 12), (2026, 1)]
+    assert monthly['OnTargetDays'].tolist() == [1, 1]
+    assert balances.balance == 0.5
+    
+    balances.set_day(date(2025, 12, 30), 10.0)
+    assert balances.balance == 3.5
+    balances.remove_day(date(2026, 1, 5))
+    assert balances.get_weekly().index.tolist() == [(2026, 1)]
+    # Weekends are not work days
+    balances.set_day(date(2026, 1, 3), 5.0)
+    assert balances.balance == 3.0
+
+def assert_same_balances(balances, expected):
+    pd.testing.assert_frame_equal(balances.get_weekly(), expected.get_weekly())
+    pd.testing.assert_frame_equal(balances.get_monthly(), expected.get_monthly())
+    assert balances.balance == pytest.approx(expected.balance)
+
+def test_set_day_matches_bulk_load():
+    history = {day.strftime('%Y-%m-%d'): 6.0 + (i % 7) * 0.75
+               for i, day in enumerate(pd.bdate_range('2024-11-01', '2026-01-30'))}
+    balances = main.PeriodBalances.from_daily(make_daily(history, 1.5), 8)
+    # A changed day, a new day in a new week and month, and a day that stops being a work day
+    changes = {'2026-01-30': 9.25, '2026-02-02': 7.5, '2025-06-02': 0.0}
+    for day, hours in changes.items():
+        balances.set_day(date.fromisoformat(day), hours, 1.5)
+    
+    extended = {day: hours for day, hours in {**history, **changes}.items() if hours > 0}
+    assert_same_balances(balances, main.PeriodBalances.from_daily(make_daily(extended, 1.5), 8))
+
+def test_store_balances_follow_synced_days(tmp_path):
+    store = main.open_store(str(tmp_path / 'store.db'))
+    dates = pd.bdate_range('2026-06-01', '2026-09-30')
+    main.store_timesheet(store, '1', pd.DataFrame({'Date': dates, 'FirstIn': '08:00', 'LastOut': '17:00', 'ClockIn': '08:00',
+                                                   'ClockOut': '17:00', 'Hours': 8.5}))
+    kept = main.update_period_balances(store, '1', 8)
+    assert main.update_period_balances(store, '1', 8, kept) is kept
+    
+    main.store_timesheet(store, '1', pd.DataFrame({'Date': pd.to_datetime(['2026-09-30', '2026-10-01']), 'FirstIn': '08:00',
+                                                   'LastOut': '17:00', 'ClockIn': '08:00', 'ClockOut': '17:00',
+                                                   'Hours': [6.0, 9.0]}), 7)
+    assert main.get_store_changes(store, '1', kept[1])[1] == '2026-09-30'
+    kept = main.update_period_balances(store, '1', 8, kept)
+    assert_same_balances(kept[0], main.load_period_balances(store, '1', 8))
+    
+    # Writes to older days by other commands: a run re-storing a wider re-check window, and a
+    # Clockify backfill
+    main.store_timesheet(store, '1', pd.DataFrame({'Date': pd.to_datetime(['2026-08-03']), 'FirstIn': '08:00',
+                                                   'LastOut': '12:00', 'ClockIn': '08:00', 'ClockOut': '12:00',
+                                                   'Hours': [4.0]}), 90)
+    main.store_clockify_entries(store, '1', [{'EntryId': 'e1', 'Date': date(2026, 6, 2), 'ClockifyHours': 2.0,
+                                              'ClockifyDescription': '', 'Project': None, 'Task': None}],
+                                date(2026, 6, 1), date(2026, 6, 30), high_water=False)
+    assert main.get_store_changes(store, '1', kept[1])[1] == '2026-06-01'
+    kept = main.update_period_balances(store, '1', 8, kept)
+    assert_same_balances(kept[0], main.load_period_balances(store, '1', 8))
+    
+    results = main.load_user_analysis(store, '1', 8, False, kept[0])
+    pd.testing.assert_frame_equal(results['weekly'], main.load_user_analysis(store, '1', 8, False)['weekly'])
+
+def test_backfill_chunks_cover_the_range():
+    chunks = main.get_backfill_chunks(date(2026, 1, 1), date(2026, 3, 1), 30)
+    assert chunks == [(date(2026, 1, 1), date(2026, 1, 30)), (date(2026, 1, 31), date(2026, 3, 1))]
+    assert main.get_backfill_chunks(date(2026, 1, 1), date(2026, 1, 1), 30) == [(date(2026, 1, 1), date(2026, 1, 1))]
+    assert main.get_backfill_chunks(date(2026, 1, 2), date(2026, 1, 1), 30) == []
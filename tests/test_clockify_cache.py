@@ -0,0 +1,14 @@
+import main
+
+def test_invalidate_one_workspace_or_all(tmp_path):
+    cache_file = str(tmp_path / 'clockify_cache.json')
+    main.save_clockify_cache({'ws1': {'projects': {}}, 'ws2': {'projects': {}}}, cache_file)
+    main.invalidate_clockify_cache('ws1', cache_file)
+    assert list(main.load_clockify_cache(cache_file)) == ['ws2']
+    main.invalidate_clockify_cache(None, cache_file)
+    assert main.load_clockify_cache(cache_file) == {}
+
+def test_refresh_option_on_fetching_commands():
+    parser = main.build_parser()
+    assert parser.parse_args(['fetch', '--refresh-clockify-cache']).refresh_clockify_cache
+    assert not parser.parse_args(['run']).refresh_clockify_cache
@@ -0,0 +1,113 @@
+# ClockifyClient against a local stub that answers from a script of responses
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import main
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.attempts += 1
+            status, headers = server.script[min(server.attempts, len(server.script)) - 1]
+        body = json.dumps({'ok': True}).encode() if status == 200 else b'{}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    # stub.script is a list of (status, headers); the last entry repeats
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ScriptedHandler)
+    server.lock = threading.Lock()
+    server.attempts = 0
+    server.script = [(200, {})]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+class RecordingEvent:
+    # Stands in for the client's cancel event: records the retry waits without sleeping
+    def __init__(self):
+        self.waits = []
+        self.cancelled = False
+
+    def is_set(self):
+        return self.cancelled
+
+    def set(self):
+        self.cancelled = True
+
+    def wait(self, delay):
+        self.waits.append(delay)
+        return self.cancelled
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Rate-limit waits (time.sleep in _wait_for_slot), recorded instead of slept
+    recorded = []
+    monkeypatch.setattr(main.time, 'sleep', recorded.append)
+    return recorded
+
+def make_client(url, **kwargs):
+    client = main.ClockifyClient('key', base_url=url, requests_per_second=0, **kwargs)
+    client._cancelled = RecordingEvent()
+    return client
+
+def test_429_honours_retry_after_then_succeeds(stub, sleeps):
+    stub.script = [(429, {'Retry-After': '3'}), (200, {})]
+    with make_client(stub.url, backoff=0.5) as client:
+        assert client.get('/user') == {'ok': True}
+        # Retry-After beats the 0.5s backoff, and a 429 holds back every thread's next request
+        assert client._cancelled.waits == [3.0]
+    assert stub.attempts == 2
+    assert len(sleeps) == 1 and 2.5 < sleeps[0] <= 3.0
+
+def test_503_backs_off_exponentially_until_retries_run_out(stub, sleeps):
+    stub.script = [(503, {})]
+    with make_client(stub.url, backoff=0.5, max_retries=3) as client:
+        with pytest.raises(requests.HTTPError):
+            client.get('/user')
+        assert client._cancelled.waits == [0.5, 1.0, 2.0]
+    assert stub.attempts == 4
+    # 5xx responses only delay the failing request, not the shared rate limit
+    assert sleeps == []
+
+def test_retry_after_shorter_than_backoff_keeps_backoff(stub, sleeps):
+    stub.script = [(503, {}), (503, {'Retry-After': '0.1'}), (200, {})]
+    with make_client(stub.url, backoff=1, max_retries=2) as client:
+        assert client.get('/user') == {'ok': True}
+        assert client._cancelled.waits == [1, 2]
+    assert stub.attempts == 3
+
+def test_client_errors_are_not_retried(stub):
+    stub.script = [(404, {})]
+    with make_client(stub.url) as client:
+        with pytest.raises(requests.HTTPError):
+            client.get('/user')
+        assert client._cancelled.waits == []
+    assert stub.attempts == 1
+
+def test_cancel_stops_a_retry_wait(stub):
+    stub.script = [(503, {})]
+    with main.ClockifyClient('key', base_url=stub.url, requests_per_second=0, backoff=30) as client:
+        timer = threading.Timer(0.2, client.cancel)
+        timer.start()
+        with pytest.raises(RuntimeError, match='cancelled'):
+            client.get('/user')
+        timer.join()
+    assert stub.attempts == 1
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+import main
+
+def local_seconds(*moment):
+    return int((datetime(*moment) - datetime(1970, 1, 1)).total_seconds())
+
+@pytest.mark.parametrize('duration, hours', [
+    ('PT1H30M', 1.5),
+    ('PT45S', 45 / 3600),
+    ('PT2H0M15S', 2 + 15 / 3600),
+    ('P1DT1H', 25),
+    ('PT0.5H', 0.5),
+    ('', 0),
+    ('garbage', 0),
+])
+def test_durations(duration, hours):
+    assert main.ClockifyTimeParser('UTC').get_hours(duration) == pytest.approx(hours)
+
+def test_start_times_in_a_fixed_offset_zone():
+    days, hours, starts = main.ClockifyTimeParser('Asia/Kolkata').parse(
+        ['2026-05-01T20:00:00Z', '2026-05-01T18:29:59Z', '2026-05-01T07:30:00+02:00'], ['PT1H', 'PT1H', 'PT30M'])
+    # +05:30: 20:00Z is already the next local day, 18:29:59Z is not
+    assert list(starts) == [local_seconds(2026, 5, 2, 1, 30), local_seconds(2026, 5, 1, 23, 59, 59),
+                            local_seconds(2026, 5, 1, 11)]
+    assert list(days) == [start // 86400 for start in starts]
+    assert list(hours) == [1, 1, 0.5]
+
+def test_start_times_across_a_dst_change():
+    # New York moves from -05:00 to -04:00 at 07:00Z on 2026-03-08
+    parser = main.ClockifyTimeParser('America/New_York')
+    _, _, starts = parser.parse(['2026-03-08T06:59:59Z', '2026-03-08T07:00:00Z', '2026-03-09T03:59:00Z'],
+                                ['PT1M', 'PT1M', 'PT1M'])
+    assert list(starts) == [local_seconds(2026, 3, 8, 1, 59, 59), local_seconds(2026, 3, 8, 3),
+                            local_seconds(2026, 3, 8, 23, 59)]
+
+def test_to_clockify_time_converts_local_to_utc():
+    assert main.to_clockify_time(datetime(2026, 7, 1, 9, 0), 'America/New_York') == '2026-07-01T13:00:00Z'
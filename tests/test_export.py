@@ -0,0 +1,29 @@
+import os
+
+import pandas as pd
+import pytest
+
+import main
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+def store_days(store, id_number, clock_in, clock_out, hours):
+    dates = pd.bdate_range('2026-09-01', '2026-10-16')
+    main.store_timesheet(store, id_number, pd.DataFrame({'Date': dates, 'FirstIn': '08:00', 'LastOut': '17:00',
+                                                         'ClockIn': clock_in, 'ClockOut': clock_out, 'Hours': hours}))
+
+def test_parquet_export_uses_the_table_schema(tmp_path):
+    store = main.open_store(str(tmp_path / 'store.db'))
+    # Only the second user has In/Out pairs, so the first user's chunks have all-empty columns
+    store_days(store, '1', None, None, 8.0)
+    store_days(store, '2', '08:00', '17:00', 7.5)
+    export_dir = str(tmp_path / 'export')
+    assert main.export_team(store, ['1', '2'], export_dir, export_format='parquet', daily_target_hours=8, chunk_rows=7)
+    
+    for table in main.EXPORT_TABLES:
+        path = main.get_export_path(export_dir, table, '1', 'parquet')
+        assert pq.read_schema(path).remove_metadata() == main.get_export_schema(table)
+    timesheet = pd.read_parquet(os.path.join(export_dir, 'timesheet'))
+    assert len(timesheet) == 68 and timesheet['ClockIn'].notna().sum() == 34
+    monthly = pd.read_parquet(os.path.join(export_dir, 'monthly'))
+    assert monthly['TargetHours'].dtype == 'float64'
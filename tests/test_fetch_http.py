@@ -0,0 +1,117 @@
+# fetch_timesheet_http against SDMataClick's pages served locally. The fixtures in
+# fixtures/sdmataclick keep the parts of the real ASP.NET pages the fetch depends on: the hidden
+# view state fields, the login form, the user name block and the __doPostBack timesheet link.
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+from bs4 import BeautifulSoup
+
+import main
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'sdmataclick')
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+class SDMataClickHandler(BaseHTTPRequestHandler):
+    # Answers like the portal: each post must carry the view state of the page it came from
+    def do_GET(self):
+        if self.path != '/m/default.aspx':
+            return self.reply(404, 'Not found')
+        self.reply(200, read_fixture('login.html'))
+
+    def do_POST(self):
+        fields = {name: values[0] for name, values in
+                  parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'),
+                           keep_blank_values=True).items()}
+        self.server.posts.append((self.path, fields))
+        if (self.path == '/m/default.aspx' and fields.get('__VIEWSTATE') == '/wEPDwUKLTQ2MzE5NzA0N2RkLOGIN'
+                and fields.get('btnSubmit') == 'Enter' and fields.get('txtIdNumber') == self.server.id_number):
+            return self.reply(200, read_fixture('home.html'))
+        if (self.path == '/m/default.aspx?p=home' and fields.get('__VIEWSTATE') == '/wEPDwULLTEyNjA4NjUxMzVkZHOME'
+                and fields.get('__EVENTTARGET') == 'ctl00$btnTimesheet'):
+            return self.reply(200, read_fixture('timesheet.html'))
+        self.reply(200, read_fixture('login.html'))
+
+    def reply(self, status, text):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def portal():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SDMataClickHandler)
+    server.posts = []
+    server.id_number = '123456'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/m/default.aspx'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_fetch_returns_table_and_name(portal):
+    table_html, name = main.fetch_timesheet_http('123456', url=portal.url)
+    
+    expected = str(BeautifulSoup(read_fixture('timesheet.html'), 'html.parser').find(id='mygrid'))
+    assert (table_html, name) == (expected, 'Israel Israeli')
+    df = main.parse_timesheet(table_html, 'bs4')
+    assert df['Hours'].tolist() == [9.47, 8.53, 0.0]
+
+def test_postbacks_replay_the_forms(portal):
+    main.fetch_timesheet_http('123456', url=portal.url)
+    
+    (login_path, login), (timesheet_path, timesheet) = portal.posts
+    # Login: hidden state, the typed ID, the clicked button only, the selected option, no unchecked box
+    assert login_path == '/m/default.aspx'
+    assert login['__EVENTVALIDATION'] == '/wEdAAPLOGINVALIDATION'
+    assert login['__VIEWSTATEGENERATOR'] == 'CA0B0334'
+    assert login['txtIdNumber'] == '123456'
+    assert login['btnSubmit'] == 'Enter'
+    assert login['ddlLanguage'] == 'en'
+    assert 'btnClear' not in login and 'chkRemember' not in login
+    # Timesheet link: __doPostBack target and argument, posted to the page's own form action
+    assert timesheet_path == '/m/default.aspx?p=home'
+    assert timesheet['__EVENTTARGET'] == 'ctl00$btnTimesheet'
+    assert timesheet['__EVENTARGUMENT'] == ''
+    assert timesheet['__EVENTVALIDATION'] == '/wEdAAKHOMEVALIDATION'
+
+def test_unknown_id_fails_at_login(portal):
+    with pytest.raises(ValueError, match='user name not found'):
+        main.fetch_timesheet_http('999999', url=portal.url)
+
+def test_post_back_reports_missing_controls(portal):
+    with requests.Session() as session:
+        with pytest.raises(ValueError, match="'btnMissing' not found"):
+            main.post_back(session, portal.url, read_fixture('login.html'), 'btnMissing')
+
+def test_daemon_sessions_start_each_fetch_without_cookies(tmp_path, monkeypatch):
+    cookies_seen = []
+    
+    def fetch(pool, id_number, backend, timeouts, session):
+        cookies_seen.append(dict(session.cookies))
+        session.cookies.set('ASP.NET_SessionId', f'cycle{len(cookies_seen)}')
+        return None, None
+    
+    monkeypatch.setattr(main, 'fetch_timesheet_pooled', fetch)
+    daemon = main.SyncDaemon({'store_file': str(tmp_path / 'store.db')}, ['123456'])
+    try:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                daemon.sync_user('123456')
+        # The same session (and its connections) is reused, its cookies are not
+        assert cookies_seen == [{}, {}]
+        assert len(daemon.sessions) == 1
+    finally:
+        daemon.close()
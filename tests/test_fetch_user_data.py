@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+import main
+
+class FakeClient:
+    def __init__(self, api_key):
+        self.cancelled = threading.Event()
+        self.events = []
+
+    def cancel(self):
+        self.events.append('cancel')
+        self.cancelled.set()
+
+    def close(self):
+        self.events.append('close')
+
+@pytest.fixture
+def fetch(tmp_path, monkeypatch):
+    clients = []
+    started, finished = threading.Event(), threading.Event()
+    
+    def make_client(api_key):
+        clients.append(FakeClient(api_key))
+        return clients[-1]
+    
+    def download(client, *args):
+        # A slow download that only stops once it is cancelled
+        started.set()
+        client.cancelled.wait(5)
+        client.events.append('download done')
+        finished.set()
+        raise RuntimeError("Clockify requests were cancelled")
+    
+    monkeypatch.setattr(main, 'ClockifyClient', make_client)
+    monkeypatch.setattr(main, 'download_clockify_entries', download)
+    store = main.open_store(str(tmp_path / 'store.db'))
+    config = {'id_number': '1', 'clockify_api_key': 'key', 'clockify_workspace_id': 'ws', 'fetch_timeout': 5}
+    
+    def run(fetch_timesheet):
+        def fetch_after_download_started(*args):
+            started.wait(5)
+            return fetch_timesheet()
+        
+        monkeypatch.setattr(main, 'fetch_and_parse_timesheet', fetch_after_download_started)
+        try:
+            return main.fetch_user_data(config, store), clients[0].events
+        finally:
+            # The download only finishes early when it was cancelled
+            assert finished.wait(1)
+    return run
+
+def test_timesheet_error_cancels_the_download(fetch):
+    def fail():
+        raise ValueError("portal is down")
+    
+    with pytest.raises(ValueError):
+        fetch(fail)
+
+def test_client_is_closed_after_the_download(fetch):
+    result, events = fetch(lambda: (None, None))
+    assert result is None
+    for _ in range(100):
+        if 'close' in events:
+            break
+        threading.Event().wait(0.01)
+    assert events == ['cancel', 'download done', 'close']
@@ -0,0 +1,41 @@
+import os
+
+import pandas as pd
+import pytest
+
+import main
+
+pytest.importorskip('pyarrow')
+
+def make_timesheet(dates, hours):
+    return pd.DataFrame({'Date': pd.to_datetime(dates), 'DayOfWeek': ['Mon'] * len(dates),
+                         'FirstIn': ['08:00'] * len(dates), 'LastOut': ['17:00'] * len(dates),
+                         'ClockIn': ['08:00'] * len(dates), 'ClockOut': ['17:00'] * len(dates), 'Hours': hours})
+
+def test_history_is_saved_per_user(tmp_path):
+    store = main.open_store(str(tmp_path / 'store.db'))
+    main.store_timesheet(store, '1', make_timesheet(['2026-10-12', '2026-10-13'], [9.0, 7.5]))
+    main.store_timesheet(store, '2', make_timesheet(['2026-10-12'], [8.25]))
+    history_dir = str(tmp_path / 'history')
+    assert main.save_history(store, history_dir)
+    
+    other = main.get_history_path(history_dir, main.HISTORY_TIMESHEET_TABLE, '2')
+    mtime = os.stat(other).st_mtime_ns
+    main.store_timesheet(store, '1', make_timesheet(['2026-10-14'], [8.0]))
+    main.save_history(store, history_dir, ['1'])
+    # Only the fetched user's files are rewritten, and no temporary files are left behind
+    assert os.stat(other).st_mtime_ns == mtime
+    assert not [name for _, _, names in os.walk(history_dir) for name in names if name.endswith('.tmp')]
+    
+    timesheet, _ = main.load_history(history_dir, '1')
+    assert main.expand_timesheet(timesheet)['Hours'].tolist() == [9.0, 7.5, 8.0]
+    timesheet, clockify = main.load_history(history_dir)
+    assert sorted(timesheet['IdNumber'].astype('str')) == ['1', '1', '1', '2']
+    assert len(clockify) == 0
+    
+    results = main.load_history_analysis(history_dir, '2', 8)
+    assert results['daily']['Hours'].tolist() == [8.25]
+
+def test_missing_history_is_reported(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        main.load_history(str(tmp_path), '1')
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+import main
+
+def test_overlapping_intervals_merge_per_group():
+    index = main.IntervalIndex([0, 0, 0, 1], [100, 150, 400, 120], [200, 300, 500, 130])
+    assert len(index) == 3
+    assert index.groups.tolist() == [0, 0, 1]
+
+def test_overlap_counts_covered_time_only_within_the_group():
+    index = main.IntervalIndex([0, 0, 1], [100, 400, 0], [300, 500, 1000])
+    overlap = index.overlap([0, 0, 0, 0, 1, 2], [0, 250, 300, 0, 900, 0], [50, 450, 400, 1000, 2000, 1000])
+    assert overlap.tolist() == [0, 100, 0, 300, 100, 0]
+
+def test_empty_index():
+    index = main.IntervalIndex([], [], [])
+    assert len(index) == 0
+    assert index.overlap([0], [0], [100]).tolist() == [0]
+
+def test_reconcile_intervals_per_day():
+    day = 20000 * 86400
+    punches = pd.DataFrame({'IdNumber': ['1', '1'], 'Start': [day + 8 * 3600, day + 13 * 3600],
+                            'End': [day + 12 * 3600, day + 17 * 3600]})
+    entries = pd.DataFrame({'IdNumber': ['1', '1'], 'Start': [day + 7 * 3600, day + 13 * 3600],
+                            'End': [day + 9 * 3600, day + 14 * 3600], 'ClockifyHours': [2.0, 1.0]})
+    results = main.reconcile_intervals(punches, entries)
+    row = results['daily'].iloc[0]
+    assert (row['OnSiteHours'], row['ClockifyHours'], row['OverlapHours']) == (8, 3, 2)
+    assert (row['GapHours'], row['OutOfHoursHours'], row['OutOfHoursEntries']) == (6, 1, 1)
+    np.testing.assert_allclose(results['entries']['OutOfHoursHours'], [1, 0])
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+import main
+
+class FakeLive:
+    def __init__(self):
+        self.listeners = set()
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+def test_event_stream_cancellation_propagates_and_cleans_up():
+    live, writer = FakeLive(), FakeWriter()
+    
+    async def run():
+        task = asyncio.create_task(main.stream_report_events(live, writer))
+        while not live.listeners:
+            await asyncio.sleep(0)
+        next(iter(live.listeners)).put_nowait({'daily': {'date': ['2026-10-16']}})
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(run())
+    assert live.listeners == set()
+    assert b'event: update' in writer.data
+
+def test_request_handler_waits_for_the_connection_to_close():
+    live, writer = FakeLive(), FakeWriter()
+    
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'POST / HTTP/1.1\r\n\r\n')
+        reader.feed_eof()
+        await main.handle_report_request(live, reader, writer)
+    
+    asyncio.run(run())
+    assert writer.data.startswith(b'HTTP/1.1 405') and writer.closed
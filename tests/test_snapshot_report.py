@@ -0,0 +1,9 @@
+import main
+
+def test_missing_timesheet_html_says_to_fetch_first(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    main.main(['report', '--snapshot'])
+    output = capsys.readouterr().out
+    assert 'No saved timesheet at timesheet.html' in output and 'fetch' in output
+    assert 'An error occurred' not in output
+    assert not (tmp_path / 'timesheet_report.html').exists()
@@ -0,0 +1,24 @@
+# The CLI must start fast: heavy libraries are only imported by the commands that use them
+import os
+import subprocess
+import sys
+
+import benchmarks
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_main_loads_no_heavy_modules():
+    result = subprocess.run(
+        [sys.executable, '-c', f'import sys, main; print(",".join(m for m in {benchmarks.HEAVY_MODULES!r} if m in sys.modules))'],
+        capture_output=True, text=True, check=True, cwd=ROOT)
+    assert result.stdout.strip() == ''
+
+def test_help_within_startup_budget():
+    assert benchmarks.time_cli_ms(['--help'], ROOT) <= benchmarks.STARTUP_BUDGET_MS
+
+def test_up_to_date_report_within_startup_budget(tmp_path):
+    argv = benchmarks.prepare_current_report(str(tmp_path))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), *argv],
+                            capture_output=True, text=True, check=True, cwd=tmp_path)
+    assert 'Report is up to date' in result.stdout
+    assert benchmarks.time_cli_ms(argv, str(tmp_path)) <= benchmarks.STARTUP_BUDGET_MS
@@ -0,0 +1,38 @@
+import pandas as pd
+
+import main
+
+def test_multi_punch_day_survives_the_store(tmp_path):
+    # Two In/Out pairs on one day, in the order the page lists them (latest first)
+    df = pd.DataFrame({'Date': pd.to_datetime(['2026-10-15', '2026-10-15', '2026-10-14']),
+                       'FirstIn': ['08:00', '08:00', '09:00'], 'LastOut': ['17:00', '17:00', '18:00'],
+                       'ClockIn': ['13:00', '08:00', '09:00'], 'ClockOut': ['17:30', '12:00', '18:00'],
+                       'Hours': [4.5, 4.0, 9.0]})
+    direct = main.analyze_timesheet(df, 8)['daily'].set_index('Date')['Hours']
+    
+    store = main.open_store(str(tmp_path / 'store.db'))
+    assert main.store_timesheet(store, '1', df) == 2
+    stored = main.load_timesheet(store, '1')
+    day = stored[stored['Date'] == '2026-10-15'].iloc[0]
+    assert (day['ClockIn'], day['ClockOut'], day['Hours']) == ('08:00', '17:30', 8.5)
+    loaded = main.analyze_timesheet(stored, 8)['daily'].set_index('Date')['Hours']
+    pd.testing.assert_series_equal(loaded, direct)
+    assert loaded[pd.Timestamp('2026-10-15')] == 8.5
+    
+    # Fetching the same page again gives the same day, not double the hours
+    main.store_timesheet(store, '1', df.iloc[::-1])
+    assert main.load_timesheet(store, '1')['Hours'].tolist() == [8.5, 9.0]
+
+def test_stored_days_add_up_their_punches(tmp_path):
+    # The morning pair is listed twice: it is one punch, so its hours only count once
+    df = pd.DataFrame({'Date': pd.to_datetime(['2026-10-15'] * 3),
+                       'FirstIn': ['08:00'] * 3, 'LastOut': ['17:30'] * 3,
+                       'ClockIn': ['13:00', '08:00', '08:00'], 'ClockOut': ['17:30', '12:00', '12:00'],
+                       'Hours': [4.5, 4.0, 4.0]})
+    store = main.open_store(str(tmp_path / 'store.db'))
+    main.store_timesheet(store, '1', df)
+    
+    punches = store.execute("SELECT clock_in, clock_out FROM timesheet_punches ORDER BY clock_in").fetchall()
+    assert punches == [('08:00', '12:00'), ('13:00', '17:30')]
+    day = store.execute("SELECT clock_in, clock_out, hours FROM timesheet_days").fetchall()
+    assert day == [('08:00', '17:30', 8.5)]
@@ -0,0 +1,58 @@
+import io
+
+import pandas as pd
+
+import main
+
+def make_team(rows):
+    return pd.DataFrame(rows, columns=['IdNumber', 'Date', 'FirstIn', 'LastOut', 'ClockIn', 'ClockOut', 'Hours']).assign(
+        Date=lambda df: pd.to_datetime(df['Date']))
+
+def test_team_without_work_days_gives_empty_aggregates(tmp_path):
+    store = main.open_store(str(tmp_path / 'store.db'))
+    results = main.load_team_analysis(store, ['999'])
+    for key in ('weekly', 'monthly', 'users', 'team_daily', 'team_weekly', 'team_monthly'):
+        assert results[key].empty
+    main.print_team_summary(results)
+    out = io.StringIO()
+    main.write_team_index(out, results, {'999': str(tmp_path / 'timesheet_report_999.html')}, {})
+    assert 'No workday data' in out.getvalue()
+
+def test_weekend_only_team_is_empty():
+    results = main.analyze_team(make_team([('1', '2026-10-17', '08:00', '17:00', None, None, 9.0)]), 8)
+    assert results['daily'].empty and results['users'].empty
+
+def test_team_aggregates_per_user():
+    results = main.analyze_team(make_team([
+        ('1', '2026-10-12', '08:00', '17:00', None, None, 9.0),
+        ('1', '2026-10-13', '08:00', '15:00', None, None, 7.0),
+        ('2', '2026-10-12', '09:00', '18:00', None, None, 9.0),
+    ]), 8)
+    users = results['users']
+    assert users.loc['1', 'WorkDays'] == 2 and users.loc['1', 'Difference'] == 0
+    assert users.loc['2', 'OnTargetDays'] == 1
+    assert results['team_daily'].loc['2026-10-12', 'Users'] == 2
+
+def test_team_reports_skip_users_without_data_or_a_report(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store_file = str(tmp_path / 'store.db')
+    store = main.open_store(store_file)
+    for id_number in ('1', '3'):
+        main.store_timesheet(store, id_number, make_team([(id_number, '2026-10-12', '08:00', '17:00', None, None, 9.0)]))
+    render = main.render_member_report
+    
+    def render_or_fail(id_number, report_path, force=False):
+        if id_number == '3':
+            raise ValueError("render failed")
+        return render(id_number, report_path, force)
+    
+    monkeypatch.setattr(main, 'render_member_report', render_or_fail)
+    results = main.render_team_reports({'store_file': store_file}, store, ['1', '2', '3'], 'reports', 8, workers=1)
+    assert (tmp_path / 'reports' / 'timesheet_report_1.html').exists()
+    assert not (tmp_path / 'reports' / 'timesheet_report_2.html').exists()
+    index = (tmp_path / 'reports' / main.TEAM_INDEX_FILE).read_text(encoding='utf-8')
+    assert 'timesheet_report_1.html' in index
+    assert 'timesheet_report_2.html' not in index and 'timesheet_report_3.html' not in index
+    assert sorted(results['users'].index) == ['1', '3']
+    
+    assert main.render_team_reports({'store_file': store_file}, store, ['2'], 'reports', 8, workers=1) is None